@@ -1,173 +1,299 @@
+import functools
 import os
-import threading
-import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import logging
 import traceback
 import signal
 from datetime import datetime, timedelta
 
+import numpy as np
 from pybit.exceptions import InvalidRequestError
 from pybit.unified_trading import HTTP
 
 from Strategy.constants import TARGET_HOURS_ISRAEL, RISK_PER_POSITION_PERCENTAGE
-from Strategy.live_strategy import is_candle_doji, find_target_hour_candle, calculate_long_order_data, \
-    calculate_short_order_data, calculate_order_leverage, unix_milliseconds_to_timestamp, calculate_order_quantity
-
-from .thread_safe_session import ThreadSafeSession
-from .utils import read_api_key, read_api_secret
+from Strategy.live_strategy import calculate_long_order_data, calculate_short_order_data, calculate_order_leverage, \
+    calculate_order_quantity
+from Strategy.vectorized_strategy import are_candles_in_target_hours, are_candles_doji
+from Strategy.candles import klines_to_candles
+from Strategy.candle_store import CandleStore, CANDLE_STORE_DIRECTORY
+from Strategy.candle_resampler import evaluate_closed_candles, RESAMPLED_INTERVALS
+from Strategy.ticks import value_to_steps, values_to_steps, steps_to_float, format_steps
+
+from .clock import get_clock
+from .event_log import record_event, start_event_log, stop_event_log, EVENT_CANDLE_EVALUATED, EVENT_ORDER_PLACED, \
+    EVENT_ORDER_FILLED, EVENT_ORDER_CANCELLED, EVENT_CLEANUP
+from .instrument_cache import InstrumentCache, INSTRUMENT_CACHE_PATH
+from .latency_metrics import measure_latency, observe_latency, log_latency_summary, start_metrics_server
+from .kline_stream import KlineStream
+from .order_journal import OrderJournal, ORDER_JOURNAL_PATH
+from .order_reactor import OrderReactor, PENDING_ORDER_STATUSES
+from .order_stream import OrderUpdateStream, FILLED_ORDER_STATUSES
+from .rate_limited_session import RateLimitedSession, TokenBucket, CONNECTION_POOL_SIZE, IP_REQUESTS_PER_SECOND
+from .target_scheduler import TargetScheduler
+from .utils import read_api_key, read_api_secret, read_sub_account_names, read_sub_account_credentials
 
 
 SYMBOL_TO_TRADE = "BTCUSDT"
+# Signals are found from this account's session. Sub-accounts only place orders.
+MAIN_ACCOUNT_NAME = "Main"
 PRODUCT_TYPE = "linear"
 ACCOUNT_CURRENCY = "USDT"
 ACCOUNT_TYPE = "UNIFIED"
 ORDER_TYPE = "Market"
 CHART_INTERVAL = 3
-# Bybit limits 600 requests per IP per 5 seconds.
-POLL_ORDER_FILL_SECONDS = 0.5
-ISOLATED_TRADE_MODE = 1
 LEVERAGE_NOT_MODIFIED_ERROR_CODE = 110043
 ROUNDING_PRECISION = 6
 SECONDS_IN_MINUTE = 60
 SHOULD_USE_LEVERAGE = 1  # True
 ONE_WAY_MODE_POSITION_INDEX = 0
 CANDLES_TO_GET = 3
-POLLING_LOG_TIME_SECONDS = 30
 MARGIN_MODE = "ISOLATED_MARGIN"
+MAXIMUM_CANDLES_PER_REQUEST = 1000
+# Maximum number of linear orders in one `place_batch_order` or `cancel_batch_order` request.
+BATCH_ORDER_LIMIT = 20
+MILLISECONDS_IN_SECOND = 1000
+# The bot wakes up when a target candle closes and then waits for the exchange to finalize it: on the kline stream for
+# up to this long, then by polling `get_kline` a bounded number of times.
+KLINE_CONFIRM_TIMEOUT_SECONDS = 2
+CANDLE_CLOSE_RETRY_SECONDS = 0.2
+CANDLE_CLOSE_ATTEMPTS = 25
+# Connections are warmed up and account state is prefetched this long before the target candles close.
+PRE_CLOSE_SECONDS = 5
+# Every symbol is evaluated on its own worker when its target candle closes.
+MAXIMUM_SYMBOL_WORKERS = 16
+# History downloaded into an empty candle store.
+CANDLE_STORE_SEED_DAYS = 30
+
+# Linear perpetuals to trade, each with its own target-hour schedule and risk per position.
+SYMBOLS_TO_TRADE = {
+    SYMBOL_TO_TRADE: {"TargetHours": TARGET_HOURS_ISRAEL, "RiskPerPosition": RISK_PER_POSITION_PERCENTAGE},
+}
+
+
+def get_closed_candles(api: RateLimitedSession, symbol: str, target_start_time: int,
+                       kline_stream: KlineStream = None) -> np.ndarray:
+    """
+    Candles up to and including the one starting at `target_start_time` (UTC milliseconds), as soon as the exchange
+    finalized it. The kline stream knows once the candle's last minute is confirmed. Over REST, the exchange opening the
+    next candle is the proof.
+    """
+    close_time = target_start_time / MILLISECONDS_IN_SECOND + CHART_INTERVAL * SECONDS_IN_MINUTE
 
+    if kline_stream and kline_stream.is_connected():
+        candles = kline_stream.wait_for_close(symbol, target_start_time, CHART_INTERVAL, KLINE_CONFIRM_TIMEOUT_SECONDS)
+        if candles is not None:
+            observe_latency("candle_close_detection", get_clock().time() - close_time)
+            return candles
 
-def sleep_until_next_target_hour() -> None:
-    now = datetime.now()
-    today = now.date()
+        logging.warning(f"Kline stream didn't confirm the {symbol} candle in time. Polling REST instead.")
 
-    # Parse hours into datetime objects today.
-    target_datetimes = [
-        datetime.strptime(f"{today} {hour}", "%Y-%m-%d %H:%M:%S") for hour in TARGET_HOURS_ISRAEL
-    ]
+    for _ in range(CANDLE_CLOSE_ATTEMPTS):
+        with measure_latency("get_kline"):
+            response = api.get_kline(
+                category=PRODUCT_TYPE, symbol=symbol, interval=CHART_INTERVAL, limit=CANDLES_TO_GET
+            )
 
-    # Find the next target time that is still ahead (may also be the current candle).
-    for timestamp in reversed(target_datetimes):
-        if now - timestamp < timedelta(minutes=3) and timestamp <= now:
-            next_target = timestamp
-            break
-    else:
-        next_target = next((timestamp for timestamp in target_datetimes if timestamp >= now), None)
+        candles = klines_to_candles(response["result"]["list"])
 
-    # If there aren't any future times today, wait until the first time tomorrow.
-    if not next_target:
-        next_day = today + timedelta(days=1)
-        next_target = datetime.strptime(f"{next_day} {TARGET_HOURS_ISRAEL[0]}", "%Y-%m-%d %H:%M:%S")
+        # Everything before the newest candle is closed, but the target candle is only final once it's not the newest.
+        if len(candles) and candles["start_time"][-1] > target_start_time:
+            observe_latency("candle_close_detection", get_clock().time() - close_time)
+            return candles[candles["start_time"] <= target_start_time]
 
-    # Adding 3 minutes because we want to wait for the candle at the specified hour to close.
-    # Adding a buffer because if we're too fast, the latest candle won't be received in the API response made later.
-    next_target += timedelta(minutes=3.08)
+        get_clock().sleep(CANDLE_CLOSE_RETRY_SECONDS)
 
-    seconds_to_sleep = (next_target - now).total_seconds()
+    logging.error(f"{symbol} candle starting at {target_start_time} wasn't closed after {CANDLE_CLOSE_ATTEMPTS} tries")
+    raise RuntimeError(
+        f"{symbol} candle starting at {target_start_time} wasn't closed after {CANDLE_CLOSE_ATTEMPTS} tries"
+    )
 
-    logging.info(f"Sleeping until next target: {next_target} (in {seconds_to_sleep / SECONDS_IN_MINUTE:.1f} minutes)")
 
-    time.sleep(seconds_to_sleep)
+def download_candles_to_store(api: RateLimitedSession, candle_store: CandleStore, start_time: int) -> int:
+    """
+    Downloads every closed candle from `start_time` (UTC milliseconds) until now into the store.
+    Returns how many candles were added.
+    """
+    interval_milliseconds = candle_store.interval * SECONDS_IN_MINUTE * MILLISECONDS_IN_SECOND
+    now = int(get_clock().time() * MILLISECONDS_IN_SECOND)
+    added_candles = 0
+
+    while start_time + interval_milliseconds <= now:
+        end_time = start_time + MAXIMUM_CANDLES_PER_REQUEST * interval_milliseconds - 1
+        response = api.get_kline(
+            category=PRODUCT_TYPE, symbol=candle_store.symbol, interval=candle_store.interval, start=start_time,
+            end=end_time, limit=MAXIMUM_CANDLES_PER_REQUEST
+        )
 
-    logging.info(f"Woken up from sleep. Current time: {datetime.now()}")
+        candles = klines_to_candles(response["result"]["list"])
+        # The newest candle may still be forming.
+        candles = candles[candles["start_time"] + interval_milliseconds <= now]
 
+        added_candles += candle_store.append(candles)
+        start_time = end_time + 1
 
-def get_latest_candles(api: ThreadSafeSession) -> list:
-    response = api.get_kline(
-        category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE, interval=CHART_INTERVAL, limit=CANDLES_TO_GET
-    )
+    return added_candles
 
-    candles = response["result"]["list"]
 
-    if not candles:
-        logging.error("Failed to get candles from API.")
-        raise RuntimeError("Failed to get candles from API.")
+def get_missing_candles_start_time(candle_store: CandleStore, seed_days: float = CANDLE_STORE_SEED_DAYS) -> int:
+    """
+    Start time (UTC milliseconds) of the first candle the store is missing: the one after the newest stored candle, or
+    `seed_days` ago if the store is empty.
+    """
+    interval_milliseconds = candle_store.interval * SECONDS_IN_MINUTE * MILLISECONDS_IN_SECOND
+    last_start_time = candle_store.last_start_time()
 
-    # Index zero is the currently forming candle (it hasn't closed yet).
-    return candles[1:]
+    if last_start_time >= 0:
+        return last_start_time + interval_milliseconds
 
+    seed_start_time = int((get_clock().time() - seed_days * 24 * 60 * SECONDS_IN_MINUTE) * MILLISECONDS_IN_SECOND)
+    return seed_start_time // interval_milliseconds * interval_milliseconds
 
-def get_wallet_balance(api: ThreadSafeSession) -> float:
+
+def update_candle_store(api: RateLimitedSession, candle_store: CandleStore) -> None:
+    """
+    Fills the gap between the newest stored candle and now, or seeds an empty store with `CANDLE_STORE_SEED_DAYS` of
+    history. Failures are only logged, the store isn't critical.
+    """
+    try:
+        download_candles_to_store(api, candle_store, get_missing_candles_start_time(candle_store))
+    except Exception as e:
+        logging.warning(f"Failed to update candle store {candle_store.path}. Error: {e}")
+
+
+def store_closed_candles(api: RateLimitedSession, candle_store: CandleStore, candles: np.ndarray) -> None:
+    """
+    Appends the candles of a target to the store. The store only ever grows by contiguous candles (the backtest treats
+    them as such), so if the candles don't follow the newest stored one, the gap up to them is downloaded instead.
+    """
+    interval_milliseconds = candle_store.interval * SECONDS_IN_MINUTE * MILLISECONDS_IN_SECOND
+    last_start_time = candle_store.last_start_time()
+
+    if last_start_time < 0 or not len(candles) or candles["start_time"][0] > last_start_time + interval_milliseconds:
+        update_candle_store(api, candle_store)
+        return
+
+    try:
+        candle_store.append(candles)
+    except OSError as e:
+        logging.warning(f"Failed to append candles to {candle_store.path}. Error: {e}")
+
+
+def get_wallet_balance(api: RateLimitedSession) -> float:
     response = api.get_wallet_balance(accountType=ACCOUNT_TYPE, coin=ACCOUNT_CURRENCY)
 
     return float(response["result"]["list"][0]["totalWalletBalance"])
 
 
-def get_exchange_information(api: ThreadSafeSession) -> dict:
-    response = api.get_instruments_info(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE)
-
-    return response["result"]["list"][0]
+def get_open_position_symbols(api: RateLimitedSession) -> set:
+    positions = api.get_positions(category=PRODUCT_TYPE, settleCoin=ACCOUNT_CURRENCY)["result"]["list"]
 
+    return {position["symbol"] for position in positions if float(position["size"])}
 
-def place_order(api: ThreadSafeSession, order: dict) -> str:
-    # 1: If market price rises to trigger price. 2: If market price falls to trigger price.
-    trigger_direction = 1 if "Buy" == order['Side'] else 2
 
-    logging.info(f'''Placing order:
-        category={PRODUCT_TYPE},
-        symbol={SYMBOL_TO_TRADE},
-        isLeverage={SHOULD_USE_LEVERAGE},
-        side="{order['Side']}",
-        orderType={ORDER_TYPE},
-        qty="{order['Quantity']}",
-        price="{order['Entry']}",
-        triggerDirection={trigger_direction},
-        triggerPrice="{order['Entry']}",
-        triggerBy="LastPrice",
-        timeInForce="GTC",
-        positionIdx={ONE_WAY_MODE_POSITION_INDEX},
-        takeProfit="{order['TakeProfit']}",
-        stopLoss="{order['StopLoss']}",
-        tpTriggerBy="LastPrice",
-        slTriggerBy="LastPrice",
-        reduceOnly=False,
-        closeOnTrigger=False,
-        tpslMode="Full",
-        tpOrderType="Market",
-        slOrderType="Market"
-    ''')
+def set_leverage(api: RateLimitedSession, leverage: float, leverage_state: dict, symbol: str = SYMBOL_TO_TRADE) -> None:
+    """
+    `leverage_state` maps each symbol to the leverage we last set on it, so unchanged leverage costs no request.
+    """
+    if leverage_state.get(symbol) == leverage:
+        return
 
     try:
-        logging.info(f"Setting buy leverage and sell leverage to: {order['Leverage']}%")
-        api.set_leverage(
-            category=PRODUCT_TYPE,
-            symbol=SYMBOL_TO_TRADE,
-            buyLeverage=str(order["Leverage"]),
-            sellLeverage=str(order["Leverage"])
-        )
+        logging.info(f"Setting {symbol} buy leverage and sell leverage to: {leverage}%")
+        with measure_latency("set_leverage"):
+            api.set_leverage(
+                category=PRODUCT_TYPE,
+                symbol=symbol,
+                buyLeverage=str(leverage),
+                sellLeverage=str(leverage)
+            )
     except InvalidRequestError as e:
         if LEVERAGE_NOT_MODIFIED_ERROR_CODE != e.status_code:
+            leverage_state.pop(symbol, None)
             raise e
 
-    response = api.place_order(
-        category=PRODUCT_TYPE,
-        symbol=SYMBOL_TO_TRADE,
-        isLeverage=SHOULD_USE_LEVERAGE,
-        side=order["Side"],
-        orderType=ORDER_TYPE,
-        qty=str(order['Quantity']),
-        price=str(order["Entry"]),
-        triggerDirection=trigger_direction,
-        triggerPrice=str(order["Entry"]),
-        triggerBy="LastPrice",
-        timeInForce="GTC",
-        positionIdx=ONE_WAY_MODE_POSITION_INDEX,
-        takeProfit=str(order["TakeProfit"]),
-        stopLoss=str(order["StopLoss"]),
-        tpTriggerBy="LastPrice",
-        slTriggerBy="LastPrice",
-        reduceOnly=False,
-        closeOnTrigger=False,
-        tpslMode="Full",
-        tpOrderType="Market",
-        slOrderType="Market"
-    )
+    leverage_state[symbol] = leverage
 
-    return response["result"]["orderId"]
 
+def place_order_pair(api: RateLimitedSession, long_order: dict, short_order: dict, leverage_state: dict,
+                     symbol: str = SYMBOL_TO_TRADE) -> tuple:
+    """
+    Sends both legs in one batch request. Bybit accepts or rejects each leg on its own, so if only one leg was accepted,
+    it's cancelled before raising.
+    Returns the long order ID and the short order ID.
+    """
+    # Leverage belongs to the symbol and not to the order, so both legs must share it.
+    set_leverage(api, long_order["Leverage"], leverage_state, symbol)
+
+    requests = [build_order_request(order, symbol) for order in [long_order, short_order]]
+
+    with measure_latency("place_order"):
+        response = api.place_batch_order(category=PRODUCT_TYPE, request=requests)
+
+    results = parse_batch_results(response)
+    order_ids = [order_id for order_id, error in results if not error]
 
-def round_to_bybit_requirements(value: float, step: float) -> float:
-    precision = len(str(step).split(".")[1])
-    return round(round(value / step) * step, ndigits=precision)
+    if len(order_ids) != len(results):
+        if order_ids:
+            cancel_orders(api, order_ids, symbol)
+
+        errors = [error for _, error in results if error]
+        logging.error(f"Failed to place {symbol} order pair. Errors: {errors}")
+        raise RuntimeError(f"Failed to place {symbol} order pair. Errors: {errors}")
+
+    for order_id, request, order in zip(order_ids, requests, [long_order, short_order]):
+        record_event(
+            EVENT_ORDER_PLACED, Symbol=symbol, OrderId=order_id, Side=request["side"], Price=request["price"],
+            Quantity=request["qty"], TakeProfit=request["takeProfit"], StopLoss=request["stopLoss"],
+            Leverage=order["Leverage"]
+        )
+
+    logging.info(f"Placed {symbol} order pair. Long order ID: {order_ids[0]}, Short order ID: {order_ids[1]}")
+
+    return order_ids[0], order_ids[1]
+
+
+def parse_batch_results(response: dict) -> list:
+    """
+    (order ID, error) for every order of a batch request, in request order. The error is None if the order succeeded.
+    """
+    orders = response["result"]["list"]
+    statuses = response.get("retExtInfo", {}).get("list", [{"code": 0}] * len(orders))
+
+    return [
+        (order.get("orderId"), None if 0 == status["code"] else f"{status.get('msg')} (ErrCode: {status['code']})")
+        for order, status in zip(orders, statuses)
+    ]
+
+
+def build_order_request(order: dict, symbol: str = SYMBOL_TO_TRADE) -> dict:
+    # 1: If market price rises to trigger price. 2: If market price falls to trigger price.
+    trigger_direction = 1 if "Buy" == order['Side'] else 2
+
+    # Prices and quantity are whole ticks and steps until here. These strings are exactly what Bybit expects.
+    entry = format_steps(order["Entry"], order["TickSize"])
+
+    return {
+        "symbol": symbol,
+        "isLeverage": SHOULD_USE_LEVERAGE,
+        "side": order["Side"],
+        "orderType": ORDER_TYPE,
+        "qty": format_steps(order["Quantity"], order["QuantityStep"]),
+        "price": entry,
+        "triggerDirection": trigger_direction,
+        "triggerPrice": entry,
+        "triggerBy": "LastPrice",
+        "timeInForce": "GTC",
+        "positionIdx": ONE_WAY_MODE_POSITION_INDEX,
+        "takeProfit": format_steps(order["TakeProfit"], order["TickSize"]),
+        "stopLoss": format_steps(order["StopLoss"], order["TickSize"]),
+        "tpTriggerBy": "LastPrice",
+        "slTriggerBy": "LastPrice",
+        "reduceOnly": False,
+        "closeOnTrigger": False,
+        "tpslMode": "Full",
+        "tpOrderType": "Market",
+        "slOrderType": "Market",
+    }
 
 
 def conform_leverage_to_bybit(desired_leverage: float, leverage_filter: dict) -> float:
@@ -191,61 +317,45 @@ def conform_leverage_to_bybit(desired_leverage: float, leverage_filter: dict) ->
     return desired_leverage
 
 
-def conform_quantity_to_bybit(desired_quantity: float, lot_size_filter: dict) -> float:
-    quantity_step = float(lot_size_filter["qtyStep"])
+def conform_quantity_to_bybit(desired_quantity: float, lot_size_filter: dict) -> int:
+    """
+    Returns the quantity in whole quantity steps.
+    """
+    quantity_step = lot_size_filter["qtyStep"]
 
-    valid_quantity = round_to_bybit_requirements(desired_quantity, quantity_step)
+    valid_quantity = value_to_steps(desired_quantity, quantity_step)
 
-    logging.info(f"Rounding order quantity from {desired_quantity} to {valid_quantity}")
+    logging.info(f"Rounding order quantity from {desired_quantity} to {format_steps(valid_quantity, quantity_step)}")
 
-    maximum_quantity = float(lot_size_filter.get("maxOrderQty", float("inf")))
-    minimum_quantity = float(lot_size_filter["minOrderQty"])
+    maximum_quantity = value_to_steps(lot_size_filter["maxOrderQty"], quantity_step) \
+        if "maxOrderQty" in lot_size_filter else float("inf")
+    minimum_quantity = value_to_steps(lot_size_filter["minOrderQty"], quantity_step)
 
     if valid_quantity < minimum_quantity:
         logging.warning(
-            f"Desired trade quantity ({valid_quantity}) is smaller than the allowed quantity ({minimum_quantity})."
+            f"Desired trade quantity ({desired_quantity}) is smaller than the allowed quantity "
+            f"({lot_size_filter['minOrderQty']})."
         )
         raise RuntimeError(
-            f"Desired trade quantity ({valid_quantity}) is smaller than the allowed quantity ({minimum_quantity})."
+            f"Desired trade quantity ({desired_quantity}) is smaller than the allowed quantity "
+            f"({lot_size_filter['minOrderQty']})."
         )
     elif valid_quantity > maximum_quantity:
         logging.warning(
-            f"Desired trade quantity ({valid_quantity}) exceeds the allowed quantity ({minimum_quantity})."
+            f"Desired trade quantity ({desired_quantity}) exceeds the allowed quantity "
+            f"({lot_size_filter['maxOrderQty']})."
         )
         raise RuntimeError(
-            f"Desired trade quantity ({valid_quantity}) exceeds than the allowed quantity ({minimum_quantity})."
+            f"Desired trade quantity ({desired_quantity}) exceeds the allowed quantity "
+            f"({lot_size_filter['maxOrderQty']})."
         )
 
     return valid_quantity
 
 
-def validate_order_prices_after_conformation(order: dict, candle: dict, tick_size: float) -> dict:
-    # Make sure we didn't screw up the strategy. We don't check the take-profit because it's not as critical.
-    if "Buy" == order["Side"]:
-        if order["Entry"] < candle["high"]:
-            logging.warning(f"Rounding of LONG entry caused it to be below candle high. Adding one tick.")
-            order["Entry"] += tick_size
-        if order["StopLoss"] >= candle["low"]:
-            logging.warning(
-                f"Rounding of LONG stop-loss caused it to be above or equal to candle low. Subtracting one tick."
-            )
-            order["StopLoss"] -= tick_size
-
-    if "Sell" == order["Side"]:
-        if order["Entry"] > candle["low"]:
-            logging.warning(f"Rounding of SHORT entry caused it to be above candle low. Subtracting one tick.")
-            order["Entry"] -= tick_size
-        if order["StopLoss"] <= candle["high"]:
-            logging.warning(
-                f"Rounding of SHORT stop-loss caused it to be below or equal to candle high. Adding one tick."
-            )
-            order["StopLoss"] += tick_size
-
-    return order
-
-
 def validate_position_can_be_opened(order: dict, wallet_size: float):
-    required_money = (order["Quantity"] * order["Entry"]) / order["Leverage"]
+    quantity = steps_to_float(order["Quantity"], order["QuantityStep"])
+    required_money = (quantity * steps_to_float(order["Entry"], order["TickSize"])) / order["Leverage"]
     # Use greater-equals instead greater-than due to rounding.
     if round(required_money, ROUNDING_PRECISION) >= round(wallet_size, ROUNDING_PRECISION):
         logging.error(
@@ -258,169 +368,542 @@ def validate_position_can_be_opened(order: dict, wallet_size: float):
         )
 
 
-def conform_order_to_bybit(order: dict, candle: dict, exchange_information: dict, wallet_size: float) -> dict:
+def conform_order_to_bybit(order: dict, exchange_information: dict, wallet_size: float) -> dict:
+    """
+    Prices are already whole ticks (they come straight from the candle), so only the leverage and quantity need work.
+    """
     order["Leverage"] = conform_leverage_to_bybit(order["Leverage"], exchange_information["leverageFilter"])
 
     order["Quantity"] = conform_quantity_to_bybit(order["Quantity"], exchange_information["lotSizeFilter"])
 
-    price_filter = exchange_information["priceFilter"]
+    order["TickSize"] = exchange_information["priceFilter"]["tickSize"]
+    order["QuantityStep"] = exchange_information["lotSizeFilter"]["qtyStep"]
 
-    tick_size = float(price_filter["tickSize"])
-    for field in ["Entry", "StopLoss", "TakeProfit"]:
-        rounded_value = round_to_bybit_requirements(order[field], tick_size)
+    validate_position_can_be_opened(order, wallet_size)
 
-        logging.info(f"Rounding order['{field}'] from {order[field]} to {rounded_value}")
+    return order
 
-        order[field] = rounded_value
 
-    order = validate_order_prices_after_conformation(order, candle, tick_size)
+def cancel_order(api: RateLimitedSession, order_id: str, symbol: str = SYMBOL_TO_TRADE) -> None:
+    # This can happen if an order was already filled, and we attempt to cancel it.
+    # Because we use "one-way" account, bybit allows us to only have a long or short per symbol (but not both).
+    try:
+        api.cancel_order(category=PRODUCT_TYPE, symbol=symbol, orderId=order_id)
+        logging.info(f"Successfully closed order {order_id}")
+        record_event(EVENT_ORDER_CANCELLED, Symbol=symbol, OrderId=order_id)
+    except Exception as e:
+        logging.warning(f"Failed to cancel order {order_id}. Error: {e}")
 
-    validate_position_can_be_opened(order, wallet_size)
 
-    return order
+def cancel_orders(api: RateLimitedSession, order_ids: list, symbol: str = SYMBOL_TO_TRADE) -> None:
+    """
+    Cancels the orders in as few batch requests as possible. Failures are only logged, like in `cancel_order`.
+    """
+    for start in range(0, len(order_ids), BATCH_ORDER_LIMIT):
+        batch = order_ids[start:start + BATCH_ORDER_LIMIT]
+
+        try:
+            response = api.cancel_batch_order(
+                category=PRODUCT_TYPE, request=[{"symbol": symbol, "orderId": order_id} for order_id in batch]
+            )
+        except Exception as e:
+            logging.warning(f"Failed to cancel orders {batch}. Error: {e}")
+            continue
 
+        for order_id, (_, error) in zip(batch, parse_batch_results(response)):
+            if error:
+                logging.warning(f"Failed to cancel order {order_id}. Error: {error}")
+            else:
+                logging.info(f"Successfully closed order {order_id}")
+                record_event(EVENT_ORDER_CANCELLED, Symbol=symbol, OrderId=order_id)
 
-def was_order_filled(api: ThreadSafeSession, order_id: str) -> bool:
+
+def settle_order_pair(api: RateLimitedSession, long_order_id: str, short_order_id: str, long_order_filled: bool,
+                      short_order_filled: bool, symbol: str = SYMBOL_TO_TRADE) -> bool:
     """
-    This function also returns true for partially filled orders!
+    Cancels the other leg once one leg is filled. Returns whether the pair is done.
     """
-    response = api.get_open_orders(category=PRODUCT_TYPE, orderId=order_id)
+    if long_order_filled:
+        record_event(EVENT_ORDER_FILLED, Symbol=symbol, OrderId=long_order_id, Side="Buy")
+    if short_order_filled:
+        record_event(EVENT_ORDER_FILLED, Symbol=symbol, OrderId=short_order_id, Side="Sell")
+
+    if long_order_filled and short_order_filled:
+        logging.info("Both long and short orders were filled for the same trade. Closing both positions.")
+        cancel_orders(api, [long_order_id, short_order_id], symbol)
+
+    if long_order_filled:
+        logging.info("Closing short order.")
+        cancel_order(api, short_order_id, symbol)
+        return True
+    elif short_order_filled:
+        logging.info("Closing long order.")
+        cancel_order(api, long_order_id, symbol)
+        return True
 
-    if not response["result"]["list"]:
-        logging.error("get_open_orders API failed. Invalid order ID?")
-        raise RuntimeError("get_open_orders API failed. Invalid order ID?")
+    return False
 
-    # Using index zero because we query directly by order ID (we shouldn't receive all the other open orders)
-    order_status = response["result"]["list"][0]["orderStatus"]
 
-    if "Filled" == order_status or "PartiallyFilled" == order_status:
-        logging.info(f"Considering order {order_id} as filled. Real Status: {order_status}")
-        return True
+def settle_journaled_order_pair(api: RateLimitedSession, order_journal: OrderJournal, long_order_id: str,
+                                short_order_id: str, long_order_filled: bool, short_order_filled: bool,
+                                symbol: str = SYMBOL_TO_TRADE) -> bool:
+    is_settled = settle_order_pair(api, long_order_id, short_order_id, long_order_filled, short_order_filled, symbol)
 
-    if "New" == order_status or "Untriggered" == order_status:
-        return False
+    if is_settled:
+        order_journal.record_settled(long_order_id, short_order_id)
 
-    logging.error(f"Unexpected order status: {order_status}")
-    raise RuntimeError(f"Unexpected order status: {order_status}")
+    return is_settled
 
 
-def cancel_order(api: ThreadSafeSession, order_id: str) -> None:
-    # This can happen if an order was already filled, and we attempt to cancel it.
-    # Because we use "one-way" account, bybit allows us to only have a long or short per symbol (but not both).
-    try:
-        api.cancel_order(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE, orderId=order_id)
-        logging.info(f"Successfully closed order {order_id}")
-    except Exception as e:
-        logging.warning(f"Failed to cancel order {order_id}. Error: {e}")
+def reconcile_order_journal(api: RateLimitedSession, order_journal: OrderJournal, order_reactor: OrderReactor) -> None:
+    """
+    Takes over the pairs a previous run left unsettled (after a crash, say), from the real status of every leg and one
+    snapshot of all positions. Pairs with both legs still open are watched again, pairs with a filled leg are settled
+    now, and pairs with a leg that left the book without a fill are only reported.
+    """
+    pairs = order_journal.read_unsettled_pairs()
+    live_pairs = {}
 
+    if not pairs:
+        order_journal.compact(live_pairs)
+        return
 
-def wait_for_orders(api: ThreadSafeSession, long_order_id: str, short_order_id: str) -> None:
-    last_log_time = 0
+    logging.info(f"Reconciling {len(pairs)} unsettled order pairs from {order_journal.path}")
 
-    # Wait until one order is filled, then cancel the other one.
-    while True:
-        current_time = time.time()
+    with measure_latency("journal_reconcile"):
+        statuses = order_reactor.get_order_statuses([order_id for pair in pairs for order_id in pair])
+        positions = api.get_positions(category=PRODUCT_TYPE, settleCoin=ACCOUNT_CURRENCY)["result"]["list"]
 
-        if current_time - last_log_time >= POLLING_LOG_TIME_SECONDS:
-            logging.info(
-                f"Waiting for orders to be filled. Long order ID: {long_order_id}, Short order ID: {short_order_id}"
-            )
-            last_log_time = current_time
+    open_positions = {(position["symbol"], position["side"]) for position in positions if float(position["size"])}
 
-        time.sleep(POLL_ORDER_FILL_SECONDS)
+    for (long_order_id, short_order_id), symbol in pairs.items():
+        long_order_filled = statuses[long_order_id] in FILLED_ORDER_STATUSES
+        short_order_filled = statuses[short_order_id] in FILLED_ORDER_STATUSES
 
-        long_order_filled = was_order_filled(api, long_order_id)
-        short_order_filled = was_order_filled(api, short_order_id)
+        if not (long_order_filled or short_order_filled):
+            if any(statuses[order_id] not in PENDING_ORDER_STATUSES for order_id in (long_order_id, short_order_id)):
+                # Cancelled outside the bot, rejected or unknown. There's no position to protect, so it isn't settled.
+                logging.error(
+                    f"{symbol} order pair {long_order_id}, {short_order_id} left the book without a fill. Not "
+                    f"resuming it. Statuses: {statuses[long_order_id]}, {statuses[short_order_id]}"
+                )
+                continue
+
+            logging.info(
+                f"Resuming {symbol} order pair. Long order ID: {long_order_id}, Short order ID: {short_order_id}"
+            )
+            order_reactor.add_pair(long_order_id, short_order_id, symbol)
+            live_pairs[(long_order_id, short_order_id)] = symbol
+            continue
 
         if long_order_filled and short_order_filled:
-            logging.info("Both long and short orders were filled for the same trade. Closing both positions.")
-            cancel_order(api, long_order_id)
-            cancel_order(api, short_order_id)
-
-        if long_order_filled:
-            logging.info("Closing short order.")
-            cancel_order(api, short_order_id)
-            break
-        elif short_order_filled:
-            logging.info("Closing long order.")
-            cancel_order(api, long_order_id)
-            break
-
-
-def run_bot(api: ThreadSafeSession, days_to_run: int) -> None:
-    start_time = datetime.now()
-    end_time = start_time + timedelta(days=days_to_run)
+            # Nothing is left to cancel.
+            logging.info(f"Both {symbol} orders {long_order_id}, {short_order_id} were filled. Dropping the pair.")
+            continue
 
-    while datetime.now() < end_time:
-        sleep_until_next_target_hour()
-
-        latest_candles = get_latest_candles(api)
-
-        candles_data = [
-            {
-                "start_time": unix_milliseconds_to_timestamp(int(candle[0]), "Asia/Jerusalem"),
-                "open": float(candle[1]),
-                "high": float(candle[2]),
-                "low": float(candle[3]),
-                "close": float(candle[4]),
-                "volume": float(candle[5])
-            } for candle in latest_candles
-        ]
-
-        candle_data = find_target_hour_candle(candles_data)
-        if not candle_data:
-            logging.error(
-                f"Failed to find candle in target hour. Current time: {datetime.now()}, Candles: {candles_data}"
+        filled_side = "Buy" if long_order_filled else "Sell"
+        if (symbol, filled_side) not in open_positions:
+            logging.warning(
+                f"{symbol} {filled_side} order of pair {long_order_id}, {short_order_id} was filled but no position is "
+                f"open. It was probably closed by its TP/SL already."
             )
-            raise RuntimeError(
-                f"Failed to find candle in target hour. Current time: {datetime.now()}, Candles: {candles_data}"
+
+        settle_order_pair(api, long_order_id, short_order_id, long_order_filled, short_order_filled, symbol)
+
+    order_journal.compact(live_pairs)
+
+
+def find_target_candle(candles: np.ndarray, target_hours: list, tick_size: float) -> tuple:
+    """
+    Returns the newest candle in a target hour, with its prices in ticks, and whether it's a doji.
+    The candle is an empty dict if none of the candles is in a target hour.
+    """
+    # Same array functions as the backtest. Prices are kept in whole ticks from here on.
+    in_target_hours = are_candles_in_target_hours(candles["start_time"], target_hours)
+    target_indexes = np.flatnonzero(in_target_hours)
+
+    if not len(target_indexes):
+        return {}, False
+
+    price_ticks = {field: values_to_steps(candles[field], tick_size) for field in ["open", "high", "low", "close"]}
+    doji = are_candles_doji(price_ticks["open"], price_ticks["high"], price_ticks["low"], price_ticks["close"])
+
+    target_index = target_indexes[-1]
+    candle_data = {"start_time": int(candles["start_time"][target_index])}
+    candle_data.update({field: int(ticks[target_index]) for field, ticks in price_ticks.items()})
+
+    return candle_data, bool(doji[target_index])
+
+
+def calculate_order_pair(candle_data: dict, symbol_settings: dict) -> tuple:
+    long_order = calculate_long_order_data(candle_data)
+    short_order = calculate_short_order_data(candle_data)
+
+    long_order["Leverage"] = calculate_order_leverage(
+        long_order["Entry"], long_order["StopLoss"], symbol_settings["RiskPerPosition"]
+    )
+    short_order["Leverage"] = calculate_order_leverage(
+        short_order["Entry"], short_order["StopLoss"], symbol_settings["RiskPerPosition"]
+    )
+
+    # Both legs are live together under one symbol leverage. The lower one keeps each leg within its risk.
+    long_order["Leverage"] = short_order["Leverage"] = min(long_order["Leverage"], short_order["Leverage"])
+
+    return long_order, short_order
+
+
+def get_forming_target_leverage(api: RateLimitedSession, symbol: str, symbol_settings: dict, target_start_time: int,
+                                instrument_cache: InstrumentCache) -> float:
+    """
+    The leverage the forming target candle would need if it closed now, or None if it isn't a doji. The closed candle
+    usually has the same high and low, and then `place_order_pair` finds the leverage already set.
+    """
+    klines = api.get_kline(category=PRODUCT_TYPE, symbol=symbol, interval=CHART_INTERVAL, limit=1)["result"]["list"]
+    candles = klines_to_candles(klines)
+
+    if not len(candles) or target_start_time != candles["start_time"][-1]:
+        return None
+
+    exchange_information = instrument_cache.get(symbol)
+    candle_data, is_doji = find_target_candle(
+        candles, symbol_settings["TargetHours"], exchange_information["priceFilter"]["tickSize"]
+    )
+
+    if not is_doji:
+        return None
+
+    long_order, _ = calculate_order_pair(candle_data, symbol_settings)
+
+    return conform_leverage_to_bybit(long_order["Leverage"], exchange_information["leverageFilter"])
+
+
+def prepare_for_target(api: RateLimitedSession, target_start_time: int, target_symbols: dict,
+                       instrument_cache: InstrumentCache, accounts: list, order_executor: ThreadPoolExecutor) -> dict:
+    """
+    Runs a few seconds before the target candles close, so the work after the close is only fetching the closed candle
+    and placing orders. Opens a keep-alive connection for every request that will run in parallel then, and sets the
+    likely leverage on every account. Everything here is best effort.
+    The closed candle may turn out not to be a doji, so the leverage is left alone on accounts with an open position in
+    the symbol (or whose positions couldn't be fetched). With isolated margin, changing it would change that position.
+    Instruments come from the cache, which the background refresher keeps fresh and which only fetches if expired.
+    `api` is the session market data is read from.
+    Returns the prefetched wallet balance of every account that could be fetched, by account name.
+    """
+    # At the close every symbol fetches its candles, and every account places its order pair in one batch, all at the
+    # same time.
+    warm_up_futures = [
+        order_executor.submit(account["Api"].get_server_time)
+        for account in accounts
+        for _ in range(min(CONNECTION_POOL_SIZE, 2 * len(target_symbols)))
+    ]
+    wallet_futures = {
+        account["Name"]: order_executor.submit(get_wallet_balance, account["Api"]) for account in accounts
+    }
+    position_futures = {
+        account["Name"]: order_executor.submit(get_open_position_symbols, account["Api"]) for account in accounts
+    }
+
+    prepared = {"WalletBalances": {}}
+
+    with measure_latency("pre_close"):
+        # The candle is read once, the leverage it needs is then set on every account.
+        leverage_futures = {
+            symbol: order_executor.submit(
+                get_forming_target_leverage, api, symbol, symbol_settings, target_start_time, instrument_cache
             )
-        
-        if not is_candle_doji(candle_data):
-            logging.info(f"Candle is not a doji. Candle: {candle_data}")
-            continue
+            for symbol, symbol_settings in target_symbols.items()
+        }
+        wait(list(leverage_futures.values()) + list(position_futures.values()))
+
+        set_leverage_futures = []
+        for symbol, leverage_future in leverage_futures.items():
+            if leverage_future.exception() or leverage_future.result() is None:
+                continue
+
+            logging.info(f"Preparing {symbol} leverage from the forming target candle.")
+            set_leverage_futures += [
+                order_executor.submit(
+                    set_leverage, account["Api"], leverage_future.result(), account["LeverageState"], symbol
+                )
+                for account in accounts
+                if not position_futures[account["Name"]].exception()
+                and symbol not in position_futures[account["Name"]].result()
+            ]
+
+        wait(warm_up_futures + set_leverage_futures + list(wallet_futures.values()))
+
+    for future in warm_up_futures + list(leverage_futures.values()) + list(position_futures.values()) + \
+            set_leverage_futures:
+        if future.exception():
+            logging.warning(f"Pre-close request failed. Error: {future.exception()}")
+
+    for account_name, wallet_future in wallet_futures.items():
+        if wallet_future.exception():
+            logging.warning(f"Failed to prefetch the {account_name} wallet balance. Error: {wallet_future.exception()}")
+        else:
+            prepared["WalletBalances"][account_name] = wallet_future.result()
+
+    return prepared
+
+
+def trade_symbol(api: RateLimitedSession, symbol: str, symbol_settings: dict, candle_store: CandleStore,
+                 accounts: list, instrument_cache: InstrumentCache, order_executor: ThreadPoolExecutor,
+                 target_start_time: int, wallet_balances: dict = None, kline_stream: KlineStream = None) -> None:
+    """
+    Evaluates the target candle once, from `api`, and places its order pair on every account at the same time.
+    `wallet_balances` are the balances prefetched by `prepare_for_target`. Missing ones are fetched here.
+    """
+    wallet_balances = wallet_balances or {}
+    candles = get_closed_candles(api, symbol, target_start_time, kline_stream)
 
-        logging.info(f"Identified doji candle: {candle_data}")
+    try:
+        evaluate_and_place(
+            symbol, symbol_settings, candles, accounts, instrument_cache, order_executor, wallet_balances
+        )
+    finally:
+        # After the orders, since it may have to download the candles since the previous target.
+        store_closed_candles(api, candle_store, candles)
 
-        exchange_information = get_exchange_information(api)
 
-        tick_size = float(exchange_information["priceFilter"]["tickSize"])
+def evaluate_and_place(symbol: str, symbol_settings: dict, candles: np.ndarray, accounts: list,
+                       instrument_cache: InstrumentCache, order_executor: ThreadPoolExecutor,
+                       wallet_balances: dict) -> None:
+    with measure_latency("instrument_fetch"):
+        exchange_information = instrument_cache.get(symbol)
 
-        long_order = calculate_long_order_data(candle_data, tick_size)
-        short_order = calculate_short_order_data(candle_data, tick_size)
+    tick_size = exchange_information["priceFilter"]["tickSize"]
 
-        long_order["Leverage"] = calculate_order_leverage(
-            long_order["Entry"], long_order["StopLoss"], RISK_PER_POSITION_PERCENTAGE
+    with measure_latency("doji_evaluation"):
+        candle_data, is_doji = find_target_candle(candles, symbol_settings["TargetHours"], tick_size)
+
+    if not candle_data:
+        logging.error(
+            f"Failed to find {symbol} candle in target hour. Current time: {get_clock().now()}, Candles: {candles}"
         )
-        short_order["Leverage"] = calculate_order_leverage(
-            short_order["Entry"], short_order["StopLoss"], RISK_PER_POSITION_PERCENTAGE
+        raise RuntimeError(
+            f"Failed to find {symbol} candle in target hour. Current time: {get_clock().now()}, Candles: {candles}"
         )
 
-        # Using wallet balance and not account balance to be able to have multiple open positions at a time.
-        wallet_balance = get_wallet_balance(api)
+    for account in accounts:
+        account["OrderJournal"].record_candle(symbol, candle_data, is_doji)
+    record_event(
+        EVENT_CANDLE_EVALUATED, Symbol=symbol, Interval=CHART_INTERVAL, Candle=candle_data, TickSize=tick_size,
+        IsDoji=is_doji
+    )
+
+    if not is_doji:
+        logging.info(f"{symbol} candle is not a doji. Candle (in ticks of {tick_size}): {candle_data}")
+        return
+
+    logging.info(f"Identified {symbol} doji candle (in ticks of {tick_size}): {candle_data}")
 
-        long_order["Quantity"] = calculate_order_quantity(
-            long_order["Entry"], wallet_balance // 2, long_order["Leverage"]
+    # The first account is served from this thread, so a single account doesn't pay for a hand-off.
+    futures = [
+        order_executor.submit(
+            place_account_orders, account, symbol, candle_data, symbol_settings, exchange_information,
+            wallet_balances.get(account["Name"])
         )
+        for account in accounts[1:]
+    ]
+
+    errors = {}
+    try:
+        place_account_orders(
+            accounts[0], symbol, candle_data, symbol_settings, exchange_information,
+            wallet_balances.get(accounts[0]["Name"])
+        )
+    except Exception as e:
+        errors[accounts[0]["Name"]] = e
+
+    wait(futures)
+    errors.update({
+        account["Name"]: future.exception() for account, future in zip(accounts[1:], futures) if future.exception()
+    })
+
+    # An account that can't place its pair (a quantity below the minimum, say) doesn't affect the others.
+    for account_name, error in errors.items():
+        logging.error(f"Failed to place {symbol} orders on the {account_name} account. Error: {error}")
+
+
+def place_account_orders(account: dict, symbol: str, candle_data: dict, symbol_settings: dict,
+                         exchange_information: dict, wallet_balance: float = None) -> None:
+    """
+    Sizes the order pair of a doji candle to the account's wallet and places it on the account.
+    """
+    api = account["Api"]
+    tick_size = exchange_information["priceFilter"]["tickSize"]
+    long_order, short_order = calculate_order_pair(candle_data, symbol_settings)
+
+    # Using wallet balance and not account balance to be able to have multiple open positions at a time.
+    if wallet_balance is None:
+        with measure_latency("wallet_fetch"):
+            wallet_balance = get_wallet_balance(api)
+
+    long_order["Quantity"] = calculate_order_quantity(
+        steps_to_float(long_order["Entry"], tick_size), wallet_balance // 2, long_order["Leverage"]
+    )
+
+    short_order["Quantity"] = calculate_order_quantity(
+        steps_to_float(short_order["Entry"], tick_size), wallet_balance // 2, short_order["Leverage"]
+    )
+
+    with measure_latency("conform_orders"):
+        long_order = conform_order_to_bybit(long_order, exchange_information, wallet_balance)
+        short_order = conform_order_to_bybit(short_order, exchange_information, wallet_balance)
+
+    long_order_id, short_order_id = place_order_pair(api, long_order, short_order, account["LeverageState"], symbol)
+
+    # On disk before anything relies on it, so a restart can take the pair over.
+    account["OrderJournal"].record_pair(symbol, long_order_id, short_order_id)
 
-        short_order["Quantity"] = calculate_order_quantity(
-            short_order["Entry"], wallet_balance // 2, short_order["Leverage"]
+    candle_close_time = candle_data["start_time"] / MILLISECONDS_IN_SECOND + CHART_INTERVAL * SECONDS_IN_MINUTE
+    observe_latency("candle_close_to_orders", get_clock().time() - candle_close_time)
+
+    account["OrderReactor"].add_pair(long_order_id, short_order_id, symbol)
+
+
+def record_closed_candles(instrument_cache: InstrumentCache, symbols_to_trade: dict, symbol: str,
+                          closed_candles: list) -> None:
+    """
+    Close listener of the kline stream. Runs the target hour and doji checks on every other timeframe it resamples and
+    records the target hour candles as events, with no request of their own. Only `CHART_INTERVAL` candles are traded,
+    by `trade_symbol`.
+    """
+    closed_candles = [(interval, candle) for interval, candle in closed_candles if CHART_INTERVAL != interval]
+    if symbol not in symbols_to_trade or not closed_candles:
+        return
+
+    tick_size = instrument_cache.get(symbol)["priceFilter"]["tickSize"]
+    evaluated_candles = evaluate_closed_candles(closed_candles, symbols_to_trade[symbol]["TargetHours"], tick_size)
+
+    for interval, candle_data, is_doji in evaluated_candles:
+        record_event(
+            EVENT_CANDLE_EVALUATED, Symbol=symbol, Interval=interval, Candle=candle_data, TickSize=tick_size,
+            IsDoji=is_doji
         )
 
-        long_order = conform_order_to_bybit(long_order, candle_data, exchange_information, wallet_balance)
-        short_order = conform_order_to_bybit(short_order, candle_data, exchange_information, wallet_balance)
 
-        long_order_id = place_order(api, long_order)
-        short_order_id = place_order(api, short_order)
+def get_symbols_for_target(target: datetime, symbols_to_trade: dict) -> list:
+    target_hour = target.strftime("%H:%M:%S")
 
-        threading.Thread(target=wait_for_orders, args=(api, long_order_id, short_order_id), daemon=True).start()
+    return [symbol for symbol, settings in symbols_to_trade.items() if target_hour in settings["TargetHours"]]
 
 
-def cancel_non_important_orders(api: ThreadSafeSession):
+def get_account_journal_path(order_journal_path: str, account_name: str) -> str:
+    """
+    The main account keeps `order_journal_path`, sub-accounts get their own file next to it.
+    """
+    if MAIN_ACCOUNT_NAME == account_name:
+        return order_journal_path
+
+    root, extension = os.path.splitext(order_journal_path)
+
+    return f"{root}.{account_name}{extension}"
+
+
+def create_account(name: str, api: RateLimitedSession, order_journal_path: str,
+                   order_stream: OrderUpdateStream = None) -> dict:
+    """
+    Everything that belongs to one account: its session (and so its rate limits), the leverage set on each symbol, its
+    order journal, and a reactor watching its order pairs. Pairs a previous run left unsettled are taken over first.
+    """
+    order_journal = OrderJournal(get_account_journal_path(order_journal_path, name))
+
+    # A single snapshot of all USDT perpetual orders covers every traded symbol.
+    # Dropped pairs are done too, so a restart doesn't look them up again.
+    order_reactor = OrderReactor(
+        api, PRODUCT_TYPE, ACCOUNT_CURRENCY, functools.partial(settle_journaled_order_pair, api, order_journal),
+        order_stream, drop_pair=order_journal.record_settled
+    )
+    reconcile_order_journal(api, order_journal, order_reactor)
+    order_reactor.start()
+
+    return {"Name": name, "Api": api, "LeverageState": {}, "OrderJournal": order_journal, "OrderReactor": order_reactor}
+
+
+def run_bot(api: RateLimitedSession, days_to_run: int, order_stream: OrderUpdateStream = None,
+            symbols_to_trade: dict = SYMBOLS_TO_TRADE, candle_directory: str = CANDLE_STORE_DIRECTORY,
+            instrument_cache_path: str = INSTRUMENT_CACHE_PATH, order_journal_path: str = ORDER_JOURNAL_PATH,
+            kline_stream: KlineStream = None, sub_accounts: dict = None) -> None:
+    """
+    Every wait goes through the installed clock (see `Bybit.clock`), so replays can run this exact loop.
+    Pairs left unsettled by a previous run are taken over from the order journals before anything else.
+    Signals are found from `api` alone, and traded on it and on every one of `sub_accounts`, which maps a sub-account
+    name to {"Api": its session, "OrderStream": its order stream or None}.
+    """
+    clock = get_clock()
+    start_time = clock.now()
+    end_time = start_time + timedelta(days=days_to_run)
+    candle_stores = {symbol: CandleStore(symbol, CHART_INTERVAL, candle_directory) for symbol in symbols_to_trade}
+    target_hours = sorted(set().union(*(settings["TargetHours"] for settings in symbols_to_trade.values())))
+    # Woken up right at the close. `get_closed_candles` waits for the exchange from there.
+    scheduler = TargetScheduler(target_hours, CHART_INTERVAL, 0)
+
+    accounts = [create_account(MAIN_ACCOUNT_NAME, api, order_journal_path, order_stream)]
+    for name, sub_account in (sub_accounts or {}).items():
+        accounts.append(create_account(name, sub_account["Api"], order_journal_path, sub_account.get("OrderStream")))
+
+    instrument_cache = InstrumentCache(api, PRODUCT_TYPE, list(symbols_to_trade), instrument_cache_path)
+    instrument_cache.start()
+
+    if kline_stream:
+        kline_stream.set_close_listener(functools.partial(record_closed_candles, instrument_cache, symbols_to_trade))
+
+    # Every symbol places on every account but the first from this pool, and pre-close requests run on it too.
+    order_workers = 2 * MAXIMUM_SYMBOL_WORKERS * len(accounts)
+
+    with ThreadPoolExecutor(max_workers=MAXIMUM_SYMBOL_WORKERS, thread_name_prefix="symbol") as executor, \
+            ThreadPoolExecutor(max_workers=order_workers, thread_name_prefix="order") as order_executor:
+        try:
+            while clock.now() < end_time:
+                # Done while idle, so it never delays orders.
+                for candle_store in candle_stores.values():
+                    update_candle_store(api, candle_store)
+
+                target = scheduler.sleep_until_next_target(PRE_CLOSE_SECONDS)
+                target_start_time = int(target.timestamp() * MILLISECONDS_IN_SECOND)
+                target_symbols = {
+                    symbol: symbols_to_trade[symbol] for symbol in get_symbols_for_target(target, symbols_to_trade)
+                }
+
+                prepared = prepare_for_target(
+                    api, target_start_time, target_symbols, instrument_cache, accounts, order_executor
+                )
+
+                # The same target even if preparing ran past its close.
+                scheduler.sleep_until_target(target_start_time)
+
+                # All symbols close their candle at the same moment, so they're evaluated in parallel.
+                futures = [
+                    executor.submit(
+                        trade_symbol, api, symbol, symbol_settings, candle_stores[symbol], accounts, instrument_cache,
+                        order_executor, target_start_time, prepared["WalletBalances"], kline_stream
+                    )
+                    for symbol, symbol_settings in target_symbols.items()
+                ]
+
+                # A failing symbol doesn't stop the others, now or at the next targets.
+                wait(futures)
+                for symbol, future in zip(target_symbols, futures):
+                    if future.exception():
+                        logging.error(
+                            f"Failed to trade {symbol} at the target starting {target}. Error: {future.exception()}",
+                            exc_info=future.exception()
+                        )
+        finally:
+            for account in accounts:
+                account["OrderReactor"].stop()
+            instrument_cache.stop()
+            for account in accounts:
+                account["OrderJournal"].close()
+
+
+def cancel_non_important_orders(api: RateLimitedSession, symbol: str = SYMBOL_TO_TRADE):
     """
     Cancel all orders which aren't stop-loss or take-profit orders.
     """
-    open_orders = api.get_open_orders(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE)["result"]["list"]
+    open_orders = api.get_open_orders(category=PRODUCT_TYPE, symbol=symbol)["result"]["list"]
+    order_ids = []
 
     for order in open_orders:
         order_id = order.get("orderId")
@@ -439,27 +922,29 @@ def cancel_non_important_orders(api: ThreadSafeSession):
             )
             continue
 
-        # Suppressing default pybit exception throwing because we want a best-effort cleanup.
-        try:
-            api.cancel_order(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE, orderId=order_id)
-            logging.info(f"Canceled non-TP/SL order: {order_id} (price={order.get('price')}, side={order.get('side')})")
-        except Exception as e:
-            logging.error(f"Failed to cancel order {order_id}: {e}")
+        logging.info(f"Canceling non-TP/SL order: {order_id} (price={order.get('price')}, side={order.get('side')})")
+        order_ids.append(order_id)
 
+    # A best-effort cleanup, failures are only logged.
+    cancel_orders(api, order_ids, symbol)
+    record_event(
+        EVENT_CLEANUP, Symbol=symbol, CancelledOrderIds=order_ids, KeptOrderCount=len(open_orders) - len(order_ids)
+    )
 
-def print_remaining_open_orders(api: ThreadSafeSession):
-    response = api.get_open_orders(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE)
-    logging.info("Printing currently open orders.")
+
+def print_remaining_open_orders(api: RateLimitedSession, symbol: str = SYMBOL_TO_TRADE):
+    response = api.get_open_orders(category=PRODUCT_TYPE, symbol=symbol)
+    logging.info(f"Printing currently open {symbol} orders.")
     for order in response["result"]["list"]:
         logging.info(
             f"ID: {order.get('orderId')}, Side: {order.get('side')}, Price: {order.get('price')}"
         )
 
 
-def print_open_positions(api: ThreadSafeSession):
-    positions = api.get_positions(category=PRODUCT_TYPE, symbol=SYMBOL_TO_TRADE)["result"]["list"]
+def print_open_positions(api: RateLimitedSession, symbol: str = SYMBOL_TO_TRADE):
+    positions = api.get_positions(category=PRODUCT_TYPE, symbol=symbol)["result"]["list"]
 
-    logging.info("Printing currently open positions.")
+    logging.info(f"Printing currently open {symbol} positions.")
 
     if not positions:
         logging.info("No open positions found.")
@@ -480,41 +965,104 @@ def print_open_positions(api: ThreadSafeSession):
         )
 
 
-def cleanup(api: ThreadSafeSession):
-    cancel_non_important_orders(api)
-    print_remaining_open_orders(api)
-    print_open_positions(api)
+def cleanup(apis: list, symbols: list):
+    log_latency_summary()
+
+    for api in apis:
+        for symbol in symbols:
+            cancel_non_important_orders(api, symbol)
+            print_remaining_open_orders(api, symbol)
+            print_open_positions(api, symbol)
+
+    # Everything recorded so far is on disk before the process exits.
+    stop_event_log()
 
 
-def exit_hook(api: ThreadSafeSession):
+def exit_hook(apis: list, symbols: list):
     def handle_exit(signum, frame):
         logging.info("Graceful shutdown signal received. Cleaning up.")
-        cleanup(api)
+        cleanup(apis, symbols)
         exit(0)
 
     signal.signal(signal.SIGINT, handle_exit)
     signal.signal(signal.SIGTERM, handle_exit)
 
 
-def start_bot(days_to_run,is_testnet_mode=True,is_local_running=False) -> None:
+def connect_order_stream(is_testnet_mode: bool, api_key: str, api_secret: str) -> OrderUpdateStream:
+    """
+    Returns None if the stream can't connect. Fill detection then falls back to REST polling.
+    """
+    try:
+        return OrderUpdateStream.connect(is_testnet_mode, api_key, api_secret)
+    except Exception as e:
+        logging.warning(f"Failed to connect to the order stream, polling REST for fills instead. Error: {e}")
+        return None
+
+
+def connect_kline_stream(is_testnet_mode: bool, symbols: list) -> KlineStream:
+    """
+    Returns None if the stream can't connect. Candle closes are then detected by polling REST.
+    """
+    try:
+        return KlineStream.connect(is_testnet_mode, symbols, tuple(sorted({CHART_INTERVAL, *RESAMPLED_INTERVALS})))
+    except Exception as e:
+        logging.warning(f"Failed to connect to the kline stream, polling REST for candle closes instead. Error: {e}")
+        return None
+
+
+def start_bot(days_to_run,is_testnet_mode=True,is_local_running=False,symbols_to_trade=SYMBOLS_TO_TRADE) -> None:
+    api_key = read_api_key(is_testnet_mode,is_local_running)
+    api_secret = read_api_secret(is_testnet_mode,is_local_running)
+
     session = HTTP(
         testnet=is_testnet_mode,
-        api_key= read_api_key(is_testnet_mode,is_local_running),
-        api_secret=read_api_secret(is_testnet_mode,is_local_running)
+        api_key=api_key,
+        api_secret=api_secret
     )
 
-    api = ThreadSafeSession(session)
+    # Every account has its own per-endpoint limits, but they all share this host's IP limit.
+    ip_bucket = TokenBucket(IP_REQUESTS_PER_SECOND)
+    api = RateLimitedSession(session, ip_bucket=ip_bucket)
+
+    start_metrics_server()
+    start_event_log()
 
-    exit_hook(api)
+    order_stream = connect_order_stream(is_testnet_mode, api_key, api_secret)
+    kline_stream = connect_kline_stream(is_testnet_mode, list(symbols_to_trade))
+
+    sub_accounts = {}
+    for account_name in read_sub_account_names():
+        sub_account_key, sub_account_secret = read_sub_account_credentials(account_name, is_testnet_mode)
+        sub_accounts[account_name] = {
+            "Api": RateLimitedSession(
+                HTTP(testnet=is_testnet_mode, api_key=sub_account_key, api_secret=sub_account_secret),
+                ip_bucket=ip_bucket
+            ),
+            "OrderStream": connect_order_stream(is_testnet_mode, sub_account_key, sub_account_secret),
+        }
+    logging.info(f"Trading the main account and {len(sub_accounts)} sub-accounts: {list(sub_accounts)}")
+
+    apis = [api] + [sub_account["Api"] for sub_account in sub_accounts.values()]
+    exit_hook(apis, list(symbols_to_trade))
 
     # This API should be called once per symbol. I think it throws when you call it multiple times on the same symbol.
-    api.set_margin_mode(
-        setMarginMode=MARGIN_MODE
-    )
+    for account_api in apis:
+        account_api.set_margin_mode(
+            setMarginMode=MARGIN_MODE
+        )
 
     try:
-        run_bot(api, days_to_run)
+        run_bot(
+            api, days_to_run, order_stream, symbols_to_trade, kline_stream=kline_stream, sub_accounts=sub_accounts
+        )
     except Exception as e:
         logging.error(f"[ERROR] forward_test(): {e} | Traceback: {traceback.print_exc()}")
 
-    cleanup(api)
+    cleanup(apis, list(symbols_to_trade))
+
+    for stream in [order_stream] + [sub_account["OrderStream"] for sub_account in sub_accounts.values()]:
+        if stream:
+            stream.close()
+
+    if kline_stream:
+        kline_stream.close()
@@ -0,0 +1,148 @@
+"""
+The clock every time-dependent part of the bot reads and sleeps on.
+Live runs use the system clock. Replays install a `VirtualClock`, so the same code runs over recorded data without
+ever waiting for real time to pass.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+
+# `time.sleep` can overshoot by a few milliseconds, so the last stretch before a deadline is spent spinning.
+FINAL_SPIN_SECONDS = 0.02
+# How often (in real seconds) waiting threads re-check whether participants exited.
+VIRTUAL_CLOCK_RECHECK_SECONDS = 0.01
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self, tz=None) -> datetime:
+        return datetime.now(tz)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def sleep_until(self, monotonic_deadline: float) -> None:
+        while (remaining := monotonic_deadline - time.monotonic()) > FINAL_SPIN_SECONDS:
+            time.sleep(remaining - FINAL_SPIN_SECONDS)
+        while time.monotonic() < monotonic_deadline:
+            pass
+
+    def create_event(self) -> threading.Event:
+        return threading.Event()
+
+    def wait(self, event: threading.Event, timeout: float = None) -> bool:
+        return event.wait(timeout)
+
+
+class _VirtualClockEvent(threading.Event):
+    def __init__(self, clock: "VirtualClock"):
+        super().__init__()
+        self._clock = clock
+
+    def set(self) -> None:
+        super().set()
+        self._clock._notify()
+
+
+class VirtualClock:
+    """
+    Time only moves when every thread that uses the clock is waiting on it. It then jumps straight to the earliest
+    deadline, so hours of sleeping take no real time, while threads that are still working hold time still.
+    Threads that waited on the clock once must only block on it (or exit) from then on; a thread blocked on anything
+    else counts as working. The thread that creates the clock takes part from the start, so background threads can't
+    move time while it's still setting up. `on_advance(now)` is called with the new time (epoch seconds) after every
+    jump.
+    """
+
+    def __init__(self, start_time: float, on_advance=None):
+        self._now = start_time
+        self._on_advance = on_advance
+        self._condition = threading.Condition()
+        # Every thread that ever waited on the clock, and the deadline of the ones waiting right now.
+        self._participants = {threading.current_thread()}
+        self._deadlines = {}
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def now(self, tz=None) -> datetime:
+        return datetime.fromtimestamp(self._now, tz)
+
+    def sleep(self, seconds: float) -> None:
+        self._wait_until(self._now + seconds, None)
+
+    def sleep_until(self, monotonic_deadline: float) -> None:
+        self._wait_until(monotonic_deadline, None)
+
+    def create_event(self) -> threading.Event:
+        return _VirtualClockEvent(self)
+
+    def wait(self, event: threading.Event, timeout: float = None) -> bool:
+        """
+        `event` must come from `create_event`, otherwise setting it doesn't wake the waiting thread.
+        """
+        return self._wait_until(math.inf if timeout is None else self._now + timeout, event)
+
+    def _notify(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    def _wait_until(self, deadline: float, event: threading.Event) -> bool:
+        thread = threading.current_thread()
+
+        with self._condition:
+            self._participants.add(thread)
+            try:
+                while True:
+                    if event is not None and event.is_set():
+                        return True
+                    if self._now >= deadline:
+                        return False
+
+                    self._deadlines[thread] = (deadline, event)
+                    self._advance_if_idle()
+                    if self._now < deadline and not (event is not None and event.is_set()):
+                        self._condition.wait(VIRTUAL_CLOCK_RECHECK_SECONDS)
+            finally:
+                self._deadlines.pop(thread, None)
+
+    def _advance_if_idle(self) -> None:
+        self._participants = {thread for thread in self._participants if thread.is_alive()}
+
+        waiters = self._deadlines.values()
+        if len(self._deadlines) < len(self._participants) or \
+                any(event is not None and event.is_set() for _, event in waiters):
+            return
+
+        next_deadline = min(deadline for deadline, _ in waiters)
+        if math.isinf(next_deadline) or next_deadline <= self._now:
+            return
+
+        self._now = next_deadline
+        if self._on_advance:
+            self._on_advance(self._now)
+        self._condition.notify_all()
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    return _clock
+
+
+def use_clock(clock) -> None:
+    """
+    Installs the clock for the whole process. Objects that create events take the clock that was in use at creation.
+    """
+    global _clock
+    _clock = clock
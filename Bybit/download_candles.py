@@ -0,0 +1,43 @@
+"""
+Downloads closed candles into the candle store, e.g. the 1-minute candles the backtests can settle trades on
+(`--fine-interval 1`). The bot only records its own chart interval. Run again to download what's new since.
+
+Usage: python -m Bybit.download_candles --symbol BTCUSDT [--interval 1] [--days 365] [--testnet]
+"""
+import argparse
+import logging
+
+from pybit.unified_trading import HTTP
+
+from Strategy.candle_store import CANDLE_STORE_DIRECTORY, CandleStore
+
+from .bot import CANDLE_STORE_SEED_DAYS, download_candles_to_store, get_missing_candles_start_time
+from .rate_limited_session import RateLimitedSession
+
+FINE_CANDLE_INTERVAL = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download closed candles into the candle store.")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", type=int, default=FINE_CANDLE_INTERVAL, help="Candle interval in minutes")
+    parser.add_argument("--days", type=float, default=CANDLE_STORE_SEED_DAYS,
+                        help="History to download into an empty store. A filled store is only brought up to date.")
+    parser.add_argument("--directory", default=CANDLE_STORE_DIRECTORY, help="Candle store directory")
+    parser.add_argument("--testnet", action="store_true", help="Download from the testnet")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Candles are public, so no keys are needed.
+    api = RateLimitedSession(HTTP(testnet=args.testnet))
+    candle_store = CandleStore(args.symbol, args.interval, args.directory)
+
+    start_time = get_missing_candles_start_time(candle_store, args.days)
+    added_candles = download_candles_to_store(api, candle_store, start_time)
+
+    print(f"Added {added_candles} candles to {candle_store.path}, which now holds {len(candle_store)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Structured events of the trading path (candle evaluated, order placed, filled, cancelled, cleanup) as JSON lines.
+Trading threads only put the event on a queue. A background thread serializes and writes it, flushing once per batch,
+and rotates the file by size. `python -m Bybit.event_log` filters and aggregates a log, rotated files included.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+from collections import Counter
+from datetime import datetime
+
+from .clock import get_clock
+
+EVENT_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "events.jsonl")
+EVENT_LOG_MAX_BYTES = 64 * 1024 * 1024
+EVENT_LOG_BACKUP_COUNT = 5
+# Most events written between two flushes. The writer also flushes whenever the queue runs empty.
+EVENT_BATCH_SIZE = 1024
+
+EVENT_CANDLE_EVALUATED = "CandleEvaluated"
+EVENT_ORDER_PLACED = "OrderPlaced"
+EVENT_ORDER_FILLED = "OrderFilled"
+EVENT_ORDER_CANCELLED = "OrderCancelled"
+EVENT_CLEANUP = "Cleanup"
+EVENT_TYPES = [EVENT_CANDLE_EVALUATED, EVENT_ORDER_PLACED, EVENT_ORDER_FILLED, EVENT_ORDER_CANCELLED, EVENT_CLEANUP]
+
+# Tells the writer thread to stop.
+_STOP = object()
+
+
+class EventLog:
+    def __init__(self, path: str = EVENT_LOG_PATH, max_bytes: int = EVENT_LOG_MAX_BYTES,
+                 backup_count: int = EVENT_LOG_BACKUP_COUNT):
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+        self._thread = threading.Thread(target=self._write_events, name="event-log", daemon=True)
+        self._thread.start()
+
+    def record(self, event_type: str, fields: dict) -> None:
+        # Serializing is left to the writer thread, the caller only pays for the queue.
+        self._queue.put((get_clock().time(), event_type, fields))
+
+    def _write_events(self) -> None:
+        while True:
+            events = [self._queue.get()]
+            while len(events) < EVENT_BATCH_SIZE:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            is_stopping = _STOP in events
+            lines = [
+                json.dumps({"Time": event[0], "Type": event[1], **event[2]}, separators=(",", ":"), default=str)
+                for event in events if event is not _STOP
+            ]
+
+            if lines:
+                data = ("\n".join(lines) + "\n").encode()
+                if self._size and self._size + len(data) > self._max_bytes:
+                    self._rotate()
+
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+
+            if is_stopping:
+                return
+
+    def _rotate(self) -> None:
+        self._file.close()
+
+        for index in range(self._backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self._backup_count:
+            os.replace(self.path, f"{self.path}.1")
+
+        self._file = open(self.path, "wb")
+        self._size = 0
+
+    def close(self) -> None:
+        """
+        Writes every event recorded so far and stops the writer.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+
+
+_event_log = None
+
+
+def start_event_log(path: str = EVENT_LOG_PATH) -> EventLog:
+    global _event_log
+    _event_log = EventLog(path)
+
+    return _event_log
+
+
+def stop_event_log() -> None:
+    global _event_log
+    event_log, _event_log = _event_log, None
+
+    if event_log:
+        event_log.close()
+
+
+def record_event(event_type: str, **fields) -> None:
+    """
+    Does nothing until `start_event_log` is called, so tools that run the bot's functions don't need a log.
+    """
+    event_log = _event_log
+    if event_log:
+        event_log.record(event_type, fields)
+
+
+def get_event_log_paths(path: str = EVENT_LOG_PATH) -> list:
+    """
+    The log and its rotated files that exist, oldest first.
+    """
+    rotated_paths = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        rotated_paths.append(f"{path}.{index}")
+        index += 1
+
+    return rotated_paths[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def read_events(path: str = EVENT_LOG_PATH, event_types: list = None, symbols: list = None, since: float = None,
+                until: float = None):
+    """
+    Yields the matching events of the log and its rotated files, oldest first. `since` and `until` are Unix seconds.
+    """
+    # Lines are written without spaces, so a byte search rules out most lines without parsing them.
+    type_markers = [f'"Type":"{event_type}"'.encode() for event_type in event_types or []]
+    symbol_markers = [f'"Symbol":"{symbol}"'.encode() for symbol in symbols or []]
+
+    for log_path in get_event_log_paths(path):
+        with open(log_path, "rb") as log_file:
+            for line in log_file:
+                if type_markers and not any(marker in line for marker in type_markers):
+                    continue
+                if symbol_markers and not any(marker in line for marker in symbol_markers):
+                    continue
+
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A crash can leave half a line behind.
+                    continue
+
+                if since is not None and event["Time"] < since:
+                    continue
+                if until is not None and event["Time"] >= until:
+                    continue
+
+                yield event
+
+
+def count_events(events, group_by: list) -> Counter:
+    return Counter(tuple(event.get(field) for field in group_by) for event in events)
+
+
+def parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter and count the bot's structured events.")
+    parser.add_argument("--path", default=EVENT_LOG_PATH)
+    parser.add_argument("--type", nargs="+", choices=EVENT_TYPES, help="Only these event types.")
+    parser.add_argument("--symbol", nargs="+", help="Only these symbols.")
+    parser.add_argument("--since", type=parse_time, help="ISO date or time, local unless it has an offset.")
+    parser.add_argument("--until", type=parse_time, help="ISO date or time, local unless it has an offset.")
+    parser.add_argument("--group-by", nargs="+", default=["Type", "Symbol"], help="Fields to count events by.")
+    parser.add_argument("--print", action="store_true", help="Print the matching events instead of counting them.")
+    args = parser.parse_args()
+
+    events = read_events(args.path, args.type, args.symbol, args.since, args.until)
+
+    if args.print:
+        for event in events:
+            print(json.dumps(event, separators=(",", ":")))
+        return
+
+    counts = count_events(events, args.group_by)
+    print("  ".join(f"{field:>16}" for field in args.group_by + ["count"]))
+    for key, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print("  ".join(f"{str(value):>16}" for value in key + (count,)))
+
+
+if __name__ == "__main__":
+    main()
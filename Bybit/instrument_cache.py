@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import threading
+
+from .clock import get_clock
+from .rate_limited_session import RateLimitedSession
+
+INSTRUMENT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instruments.json")
+# Tick size, lot size and leverage limits almost never change.
+INSTRUMENT_CACHE_TTL_SECONDS = 60 * 60
+# Maximum page size of `get_instruments_info`.
+INSTRUMENTS_PAGE_LIMIT = 1000
+# Only these fields are used for order sizing. They are stored as numbers.
+INSTRUMENT_FILTER_FIELDS = {
+    "priceFilter": ["tickSize", "minPrice", "maxPrice"],
+    "lotSizeFilter": ["qtyStep", "minOrderQty", "maxOrderQty"],
+    "leverageFilter": ["minLeverage", "maxLeverage", "leverageStep"],
+}
+
+
+def parse_instrument_information(instrument: dict) -> dict:
+    return {
+        filter_name: {
+            field: float(instrument[filter_name][field]) for field in fields if field in instrument[filter_name]
+        }
+        for filter_name, fields in INSTRUMENT_FILTER_FIELDS.items()
+    }
+
+
+class InstrumentCache:
+    """
+    Parsed instrument filters per symbol, so placing orders doesn't wait for `get_instruments_info`.
+    Entries are refreshed in the background well before they expire, and saved to disk for the next start.
+    """
+
+    def __init__(self, api: RateLimitedSession, category: str, symbols: list, path: str = INSTRUMENT_CACHE_PATH,
+                 ttl_seconds: float = INSTRUMENT_CACHE_TTL_SECONDS):
+        self._api = api
+        self._category = category
+        self._symbols = list(symbols)
+        self._path = path
+        self._ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        # Symbol -> {"FetchedAt": epoch seconds, "priceFilter": ..., "lotSizeFilter": ..., "leverageFilter": ...}
+        self._entries = self._load()
+        self._clock = get_clock()
+        self._stop_event = self._clock.create_event()
+        self._thread = None
+
+    def _load(self) -> dict:
+        if not os.path.exists(self._path):
+            return {}
+
+        try:
+            with open(self._path, "rt") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable instrument cache {self._path}. Error: {e}")
+            return {}
+
+    def _save(self) -> None:
+        with self._lock:
+            content = json.dumps(self._entries)
+
+        # Write then rename, so a crash never leaves a half-written cache behind.
+        temporary_path = f"{self._path}.tmp"
+        with self._file_lock:
+            with open(temporary_path, "wt") as cache_file:
+                cache_file.write(content)
+            os.replace(temporary_path, self._path)
+
+    def refresh(self) -> None:
+        """
+        Fetches every instrument of the category in as few pages as possible and keeps the ones we trade.
+        """
+        fetched_at = self._clock.time()
+        entries = {}
+        cursor = ""
+
+        while True:
+            result = self._api.get_instruments_info(
+                category=self._category, limit=INSTRUMENTS_PAGE_LIMIT, cursor=cursor
+            )["result"]
+
+            for instrument in result["list"]:
+                if instrument["symbol"] in self._symbols:
+                    entries[instrument["symbol"]] = {
+                        "FetchedAt": fetched_at, **parse_instrument_information(instrument)
+                    }
+
+            cursor = result.get("nextPageCursor")
+            if not cursor or len(entries) == len(self._symbols):
+                break
+
+        with self._lock:
+            self._entries.update(entries)
+
+        try:
+            self._save()
+        except OSError as e:
+            logging.warning(f"Failed to save instrument cache {self._path}. Error: {e}")
+
+    def _is_fresh(self, symbol: str, maximum_age_seconds: float) -> bool:
+        entry = self._entries.get(symbol)
+        return entry is not None and self._clock.time() - entry["FetchedAt"] < maximum_age_seconds
+
+    def get(self, symbol: str) -> dict:
+        """
+        Parsed filters of the symbol. Only fetches (on the calling thread) if the entry is missing or expired.
+        """
+        with self._lock:
+            if self._is_fresh(symbol, self._ttl_seconds):
+                return self._entries[symbol]
+
+        logging.info(f"Instrument information of {symbol} is missing or expired. Fetching it now.")
+        self.refresh()
+
+        with self._lock:
+            if symbol not in self._entries:
+                logging.error(f"Instrument information of {symbol} wasn't found.")
+                raise RuntimeError(f"Instrument information of {symbol} wasn't found.")
+
+            return self._entries[symbol]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        # Refreshing at half the TTL keeps entries from ever expiring on the hot path.
+        refresh_age_seconds = self._ttl_seconds / 2
+
+        while True:
+            with self._lock:
+                is_fresh = all(self._is_fresh(symbol, refresh_age_seconds) for symbol in self._symbols)
+
+            if not is_fresh:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.warning(f"Failed to refresh instrument cache. Error: {e}")
+
+            if self._clock.wait(self._stop_event, refresh_age_seconds / 2):
+                return
@@ -0,0 +1,103 @@
+import logging
+import threading
+
+from pybit.unified_trading import WebSocket
+
+from Strategy.candle_resampler import CandleResampler, RESAMPLED_INTERVALS
+
+from .clock import get_clock
+
+# The only kline subscription. Every other timeframe is resampled from it.
+BASE_INTERVAL = 1
+
+
+class KlineStream:
+    """
+    Listens to the public 1-minute `kline` topic of every traded symbol. Each candle the exchange confirms as closed
+    (`confirm` is true in the last update of every candle) is resampled into every timeframe in `intervals`, so a candle
+    of any of them is known to be final the moment its last minute is, with no request per timeframe.
+    """
+
+    def __init__(self, websocket, symbols: list, intervals: tuple = RESAMPLED_INTERVALS):
+        self._websocket = websocket
+        self._lock = threading.Lock()
+        self._clock = get_clock()
+        self._resamplers = {symbol: CandleResampler(intervals) for symbol in symbols}
+        self._events = {symbol: self._clock.create_event() for symbol in symbols}
+        self._close_listener = None
+
+        websocket.kline_stream(interval=BASE_INTERVAL, symbol=list(symbols), callback=self._handle_kline_message)
+
+    @classmethod
+    def connect(cls, is_testnet_mode: bool, symbols: list, intervals: tuple = RESAMPLED_INTERVALS) -> "KlineStream":
+        return cls(WebSocket(testnet=is_testnet_mode, channel_type="linear"), symbols, intervals)
+
+    def is_connected(self) -> bool:
+        return self._websocket.is_connected()
+
+    def set_close_listener(self, listener) -> None:
+        """
+        `listener(symbol, closed_candles)` runs on the stream's thread with the (interval, candle) pairs that every
+        confirmed minute closed. It must be quick, the next message waits for it.
+        """
+        self._close_listener = listener
+
+    def wait_for_close(self, symbol: str, start_time: int, interval: int, timeout: float):
+        """
+        Waits until the `interval` candle starting at `start_time` (UTC milliseconds) is closed and returns it as a
+        one-candle array. Returns None if it wasn't closed within `timeout` seconds.
+        """
+        deadline = self._clock.monotonic() + timeout
+        event = self._events[symbol]
+
+        while True:
+            with self._lock:
+                candle = self._resamplers[symbol].find_closed_candle(interval, start_time)
+
+            remaining_seconds = deadline - self._clock.monotonic()
+            if candle is not None or remaining_seconds <= 0:
+                return candle
+
+            # Cleared only after waking, and the candle is looked up again before waiting, so no update is missed.
+            self._clock.wait(event, remaining_seconds)
+            event.clear()
+
+    def closed_candles(self, symbol: str, interval: int, count: int = None):
+        """
+        The newest `count` closed candles of a timeframe (default: all that are kept), oldest first.
+        """
+        with self._lock:
+            return self._resamplers[symbol].closed_candles(interval, count)
+
+    def _handle_kline_message(self, message: dict) -> None:
+        symbol = message.get("topic", "").split(".")[-1]
+        if symbol not in self._resamplers:
+            return
+
+        confirmed = sorted(
+            (int(candle["start"]), float(candle["open"]), float(candle["high"]), float(candle["low"]),
+             float(candle["close"]), float(candle["volume"]))
+            for candle in message.get("data", []) if candle.get("confirm")
+        )
+        if not confirmed:
+            return
+
+        with self._lock:
+            closed_candles = [
+                closed_candle for candle in confirmed for closed_candle in self._resamplers[symbol].update(candle)
+            ]
+
+        if not closed_candles:
+            return
+
+        self._events[symbol].set()
+
+        listener = self._close_listener
+        if listener:
+            try:
+                listener(symbol, closed_candles)
+            except Exception as e:
+                logging.warning(f"Failed to handle closed {symbol} candles. Error: {e}")
+
+    def close(self) -> None:
+        self._websocket.exit()
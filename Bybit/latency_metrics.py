@@ -0,0 +1,136 @@
+"""
+In-process latency histograms for every stage between a candle closing and its orders resting on the book.
+Exported in the Prometheus text format from a local HTTP endpoint, and summarized in the log on shutdown.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+METRIC_NAME = "karpabot_stage_latency_seconds"
+QUANTILE_METRIC_NAME = "karpabot_stage_latency_quantile_seconds"
+# Upper bounds (in seconds) of the histogram buckets.
+BUCKET_BOUNDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+# Quantiles are computed from the most recent samples of each stage.
+RECENT_SAMPLES_PER_STAGE = 10000
+QUANTILES = [0.5, 0.99]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent_samples = deque(maxlen=RECENT_SAMPLES_PER_STAGE)
+
+    def observe(self, seconds: float) -> None:
+        self.bucket_counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent_samples.append(seconds)
+
+    def quantile(self, quantile: float) -> float:
+        samples = sorted(self.recent_samples)
+        if not samples:
+            return 0.0
+
+        return samples[min(int(quantile * len(samples)), len(samples) - 1)]
+
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+def observe_latency(stage: str, seconds: float) -> None:
+    with _lock:
+        if stage not in _histograms:
+            _histograms[stage] = LatencyHistogram()
+        _histograms[stage].observe(seconds)
+
+
+@contextmanager
+def measure_latency(stage: str):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_latency(stage, time.perf_counter() - start_time)
+
+
+def export_prometheus_text() -> str:
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of each stage of the candle-to-order path.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    quantile_lines = [
+        f"# HELP {QUANTILE_METRIC_NAME} Quantiles of the recent latencies of each stage.",
+        f"# TYPE {QUANTILE_METRIC_NAME} gauge",
+    ]
+
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            cumulative_count = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS + ["+Inf"], histogram.bucket_counts):
+                cumulative_count += bucket_count
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative_count}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+
+            for quantile in QUANTILES:
+                quantile_lines.append(
+                    f'{QUANTILE_METRIC_NAME}{{stage="{stage}",quantile="{quantile}"}} {histogram.quantile(quantile)}'
+                )
+
+    return "\n".join(lines + quantile_lines) + "\n"
+
+
+def log_latency_summary() -> None:
+    with _lock:
+        if not _histograms:
+            return
+
+        logging.info("Latency summary per stage:")
+        for stage, histogram in sorted(_histograms.items()):
+            logging.info(
+                f"{stage}: count={histogram.count}, p50={histogram.quantile(0.5) * 1000:.1f} ms, "
+                f"p99={histogram.quantile(0.99) * 1000:.1f} ms, max={max(histogram.recent_samples) * 1000:.1f} ms"
+            )
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if "/metrics" != self.path:
+            self.send_error(404)
+            return
+
+        body = export_prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would flood the bot log otherwise.
+        pass
+
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> ThreadingHTTPServer:
+    """
+    Serves `/metrics` from a daemon thread. Returns None if the port can't be bound; metrics are still collected.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logging.warning(f"Failed to start metrics endpoint on {host}:{port}. Error: {e}")
+        return None
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving latency metrics on http://{host}:{port}/metrics")
+
+    return server
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+
+from .clock import get_clock
+
+ORDER_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "orders.journal")
+# Records that don't have to survive a crash on their own are synced with the next record that does, or by a timer
+# at most this long after they were written.
+JOURNAL_SYNC_SECONDS = 1
+
+RECORD_CANDLE = "Candle"
+RECORD_PAIR = "Pair"
+RECORD_SETTLED = "Settled"
+
+
+class OrderJournal:
+    """
+    Append-only record of every candle decision, placed order pair and settled pair, one JSON object per line.
+    Placed pairs are on disk before `record_pair` returns, so a restart after a crash knows which live orders are ours.
+    Concurrent writers share `fsync` calls: whoever syncs first covers every line written before it.
+    Other records are synced by a timer thread, which only wakes while some line is waiting for it.
+    """
+
+    def __init__(self, path: str = ORDER_JOURNAL_PATH):
+        self.path = path
+        self._clock = get_clock()
+
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Lines are numbered as they're written, so a writer can tell whether someone else already synced its line.
+        self._written_count = 0
+        self._synced_count = 0
+        self._unsynced_event = self._clock.create_event()
+        self._stop_event = self._clock.create_event()
+
+        self._discard_partial_line()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _discard_partial_line(self) -> None:
+        # A crash in the middle of a write can leave half a line at the end of the file.
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as journal_file:
+            content = journal_file.read()
+
+        if content and not content.endswith(b"\n"):
+            logging.warning(f"Truncating partial record at the end of {self.path}")
+            os.truncate(self.path, content.rfind(b"\n") + 1)
+
+    def _append(self, record: dict, is_durable: bool) -> None:
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+        # One `write` per line on an O_APPEND descriptor, so lines never interleave.
+        with self._write_lock:
+            os.write(self._fd, line)
+            self._written_count += 1
+            line_number = self._written_count
+
+        if is_durable:
+            self.sync(line_number)
+        else:
+            self._unsynced_event.set()
+
+    def _run(self) -> None:
+        while True:
+            self._clock.wait(self._unsynced_event)
+            if self._clock.wait(self._stop_event, JOURNAL_SYNC_SECONDS):
+                return
+
+            # Cleared first, so a line written during the sync sets it again.
+            self._unsynced_event.clear()
+            self.sync()
+
+    def sync(self, line_number: int = None) -> None:
+        """
+        Makes every line up to `line_number` (default: everything written so far) durable.
+        """
+        with self._sync_lock:
+            if line_number is not None and line_number <= self._synced_count:
+                return
+
+            with self._write_lock:
+                written_count = self._written_count
+
+            os.fsync(self._fd)
+            self._synced_count = written_count
+
+    def record_candle(self, symbol: str, candle: dict, is_doji: bool) -> None:
+        self._append(
+            {"Type": RECORD_CANDLE, "Time": self._clock.time(), "Symbol": symbol, "Candle": candle, "IsDoji": is_doji},
+            is_durable=False
+        )
+
+    def record_pair(self, symbol: str, long_order_id: str, short_order_id: str) -> None:
+        self._append(
+            {"Type": RECORD_PAIR, "Time": self._clock.time(), "Symbol": symbol, "LongOrderId": long_order_id,
+             "ShortOrderId": short_order_id},
+            is_durable=True
+        )
+
+    def record_settled(self, long_order_id: str, short_order_id: str) -> None:
+        # Losing this only means the pair is looked up again on the next start.
+        self._append(
+            {"Type": RECORD_SETTLED, "Time": self._clock.time(), "LongOrderId": long_order_id,
+             "ShortOrderId": short_order_id},
+            is_durable=False
+        )
+
+    def read_unsettled_pairs(self) -> dict:
+        """
+        (long order ID, short order ID) -> symbol, for every pair that was placed and never settled.
+        """
+        pairs = {}
+
+        with open(self.path, "rt") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping unreadable record in {self.path}: {line.strip()}")
+                    continue
+
+                if RECORD_PAIR == record["Type"]:
+                    pairs[(record["LongOrderId"], record["ShortOrderId"])] = record["Symbol"]
+                elif RECORD_SETTLED == record["Type"]:
+                    pairs.pop((record["LongOrderId"], record["ShortOrderId"]), None)
+
+        return pairs
+
+    def compact(self, pairs: dict) -> None:
+        """
+        Replaces the journal with just `pairs` (as returned by `read_unsettled_pairs`), so it doesn't grow forever.
+        """
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "wt") as journal_file:
+            for (long_order_id, short_order_id), symbol in pairs.items():
+                journal_file.write(json.dumps(
+                    {"Type": RECORD_PAIR, "Time": self._clock.time(), "Symbol": symbol,
+                     "LongOrderId": long_order_id, "ShortOrderId": short_order_id},
+                    separators=(",", ":")
+                ) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        with self._sync_lock, self._write_lock:
+            os.replace(temporary_path, self.path)
+            self._sync_directory()
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._written_count = self._synced_count = 0
+
+    def _sync_directory(self) -> None:
+        # The rename itself is only durable once the directory entry is.
+        directory_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+    def close(self) -> None:
+        self._stop_event.set()
+        self._unsynced_event.set()
+        self._thread.join()
+
+        self.sync()
+        os.close(self._fd)
@@ -0,0 +1,250 @@
+import logging
+import threading
+
+from .clock import get_clock
+from .latency_metrics import measure_latency, observe_latency
+from .order_stream import OrderUpdateStream, FILLED_ORDER_STATUSES
+from .rate_limited_session import RateLimitedSession
+
+# Bybit limits 600 requests per IP per 5 seconds.
+POLL_ORDER_FILL_SECONDS = 0.5
+STREAM_RECONCILE_SECONDS = 30
+POLLING_LOG_TIME_SECONDS = 30
+# Maximum page size of `get_open_orders`.
+OPEN_ORDERS_PAGE_LIMIT = 50
+# Still on the book. Anything that is neither this nor filled left the book without trading.
+PENDING_ORDER_STATUSES = ("New", "Untriggered", "Triggered")
+# `get_open_orders` with this returns recently closed orders instead of open ones.
+CLOSED_ORDERS_ONLY = 1
+
+
+class OrderReactor:
+    """
+    Watches every outstanding long/short pair, of every symbol, from a single thread.
+    Each tick takes one snapshot of the open orders of all symbols settled in `settle_coin` and settles all pairs from
+    it, so the number of API calls depends on time and not on the number of pairs or symbols. With an order stream,
+    ticks happen when a leg fills instead. Legs that left the book are looked up one by one, and a pair whose legs left
+    it without filling (rejected, deactivated, or cancelled outside the bot) is dropped with an error and not settled.
+    """
+
+    def __init__(self, api: RateLimitedSession, category: str, settle_coin: str, settle_pair,
+                 order_stream: OrderUpdateStream = None, drop_pair=None):
+        self._api = api
+        self._category = category
+        self._settle_coin = settle_coin
+        # Called as `settle_pair(long_order_id, short_order_id, long_order_filled, short_order_filled, symbol)`.
+        self._settle_pair = settle_pair
+        self._order_stream = order_stream
+        # Called as `drop_pair(long_order_id, short_order_id)` for a pair that is dropped without settling it.
+        self._drop_pair = drop_pair
+
+        self._lock = threading.Lock()
+        # Order ID -> (long order ID, short order ID). Both legs of a pair point to the same tuple.
+        self._pairs = {}
+        self._pair_symbols = {}
+        self._clock = get_clock()
+        self._wake_event = self._clock.create_event()
+        self._stop_event = self._clock.create_event()
+        self._thread = None
+
+    def add_pair(self, long_order_id: str, short_order_id: str, symbol: str) -> None:
+        pair = (long_order_id, short_order_id)
+        with self._lock:
+            self._pairs[long_order_id] = pair
+            self._pairs[short_order_id] = pair
+            self._pair_symbols[pair] = symbol
+
+        if self._order_stream:
+            self._order_stream.watch(list(pair), lambda order_id: self._wake_event.set())
+
+        self._wake_event.set()
+
+    def pending_pairs(self) -> set:
+        with self._lock:
+            return set(self._pairs.values())
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        last_log_time = 0
+        last_snapshot_time = 0
+
+        while not self._stop_event.is_set():
+            pairs = self.pending_pairs()
+            if not pairs:
+                self._clock.wait(self._wake_event)
+                self._wake_event.clear()
+                continue
+
+            current_time = self._clock.monotonic()
+            if current_time - last_log_time >= POLLING_LOG_TIME_SECONDS:
+                logging.info(f"Waiting for orders to be filled. Pending pairs: {sorted(pairs)}")
+                last_log_time = current_time
+
+            try:
+                if self._order_stream and self._order_stream.is_connected():
+                    # The stream wakes us up the moment a leg fills. The timeout only lets us notice a dropped
+                    # connection and reconcile fills that were pushed while it was reconnecting.
+                    self._clock.wait(self._wake_event, POLL_ORDER_FILL_SECONDS)
+                    self._wake_event.clear()
+
+                    filled_order_ids = {
+                        order_id for pair in pairs for order_id in pair if self._order_stream.is_filled(order_id)
+                    }
+                    is_reconcile_due = self._clock.monotonic() - last_snapshot_time >= STREAM_RECONCILE_SECONDS
+                    if not filled_order_ids and is_reconcile_due:
+                        filled_order_ids = self._get_filled_order_ids(pairs)
+                        last_snapshot_time = self._clock.monotonic()
+                else:
+                    self._clock.wait(self._stop_event, POLL_ORDER_FILL_SECONDS)
+                    filled_order_ids = self._get_filled_order_ids(pairs)
+            except Exception as e:
+                logging.error(f"Failed to get order states. Retrying next tick. Error: {e}")
+                continue
+
+            for long_order_id, short_order_id in pairs:
+                long_order_filled = long_order_id in filled_order_ids
+                short_order_filled = short_order_id in filled_order_ids
+
+                if long_order_filled or short_order_filled:
+                    self._settle(long_order_id, short_order_id, long_order_filled, short_order_filled)
+
+    def _settle(self, long_order_id: str, short_order_id: str, long_order_filled: bool,
+                short_order_filled: bool) -> None:
+        with self._lock:
+            symbol = self._pair_symbols.pop((long_order_id, short_order_id))
+
+        try:
+            with measure_latency("settle_order_pair"):
+                self._settle_pair(long_order_id, short_order_id, long_order_filled, short_order_filled, symbol)
+        except Exception as e:
+            logging.error(f"Failed to settle {symbol} orders {long_order_id}, {short_order_id}. Error: {e}")
+
+        self._forget(long_order_id, short_order_id)
+
+    def _drop(self, long_order_id: str, short_order_id: str, statuses: dict) -> None:
+        with self._lock:
+            symbol = self._pair_symbols.pop((long_order_id, short_order_id))
+
+        logging.error(
+            f"{symbol} order pair {long_order_id}, {short_order_id} left the book without a fill. Not settling it. "
+            f"Statuses: {statuses}"
+        )
+        self._forget(long_order_id, short_order_id)
+
+        if not self._drop_pair:
+            return
+
+        try:
+            self._drop_pair(long_order_id, short_order_id)
+        except Exception as e:
+            logging.error(f"Failed to drop {symbol} orders {long_order_id}, {short_order_id}. Error: {e}")
+
+    def _forget(self, long_order_id: str, short_order_id: str) -> None:
+        with self._lock:
+            self._pairs.pop(long_order_id, None)
+            self._pairs.pop(short_order_id, None)
+
+        if self._order_stream:
+            self._order_stream.forget([long_order_id, short_order_id])
+
+    def get_open_orders(self) -> dict:
+        """
+        Order ID -> order of every open order settled in `settle_coin`, of every symbol.
+        """
+        orders = {}
+        cursor = ""
+
+        while True:
+            result = self._api.get_open_orders(
+                category=self._category, settleCoin=self._settle_coin, limit=OPEN_ORDERS_PAGE_LIMIT, cursor=cursor
+            )["result"]
+
+            for order in result["list"]:
+                orders[order["orderId"]] = order
+
+            cursor = result.get("nextPageCursor")
+            if not cursor or len(result["list"]) < OPEN_ORDERS_PAGE_LIMIT:
+                return orders
+
+    def get_recently_closed_orders(self) -> dict:
+        """
+        Order ID -> order of the newest orders settled in `settle_coin` that left the book, one page of them.
+        """
+        orders = self._api.get_open_orders(
+            category=self._category, settleCoin=self._settle_coin, openOnly=CLOSED_ORDERS_ONLY,
+            limit=OPEN_ORDERS_PAGE_LIMIT
+        )["result"]["list"]
+
+        return {order["orderId"]: order for order in orders}
+
+    def get_order(self, order_id: str) -> dict:
+        """
+        An order that is no longer open, or None if the exchange doesn't know it.
+        """
+        orders = self._api.get_open_orders(
+            category=self._category, orderId=order_id, openOnly=CLOSED_ORDERS_ONLY
+        )["result"]["list"]
+
+        # Only the newest closed orders are kept there, older ones are in the order history.
+        if not orders:
+            orders = self._api.get_order_history(category=self._category, orderId=order_id)["result"]["list"]
+
+        return orders[0] if orders else None
+
+    def get_orders(self, order_ids: list) -> dict:
+        """
+        Order ID -> order (None if unknown) of every order in `order_ids`. One snapshot covers the open ones, and one
+        page of recently closed orders usually covers the rest. Only orders older than that cost a request each.
+        """
+        orders = self.get_open_orders()
+
+        if any(order_id not in orders for order_id in order_ids):
+            orders.update(self.get_recently_closed_orders())
+
+        return {
+            order_id: orders[order_id] if order_id in orders else self.get_order(order_id)
+            for order_id in order_ids
+        }
+
+    def get_order_statuses(self, order_ids: list) -> dict:
+        """
+        Order ID -> status (None if unknown) of every order in `order_ids`, see `get_orders`.
+        """
+        return {
+            order_id: order["orderStatus"] if order else None for order_id, order in self.get_orders(order_ids).items()
+        }
+
+    def _get_filled_order_ids(self, pairs: set) -> set:
+        orders = self.get_orders([order_id for pair in pairs for order_id in pair])
+        statuses = {order_id: order["orderStatus"] if order else None for order_id, order in orders.items()}
+
+        filled_order_ids = set()
+        for pair in pairs:
+            pair_statuses = {order_id: statuses[order_id] for order_id in pair}
+            pair_filled_order_ids = {
+                order_id for order_id, status in pair_statuses.items() if status in FILLED_ORDER_STATUSES
+            }
+
+            for order_id in pair_filled_order_ids:
+                logging.info(f"Considering order {order_id} as filled. Real Status: {pair_statuses[order_id]}")
+                # Same metric as the order stream, so both ways of detecting a fill can be compared.
+                update_time = int(orders[order_id].get("updatedTime", 0))
+                if update_time:
+                    observe_latency("fill_detection_lag", self._clock.time() - update_time / 1000)
+            filled_order_ids |= pair_filled_order_ids
+
+            # A filled leg is settled even if the other one is gone too, cancelling it then only logs a warning.
+            if not pair_filled_order_ids and \
+                    any(status not in PENDING_ORDER_STATUSES for status in pair_statuses.values()):
+                self._drop(*pair, pair_statuses)
+
+        return filled_order_ids
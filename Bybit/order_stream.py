@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from pybit.unified_trading import WebSocket
+
+from .latency_metrics import observe_latency
+
+FILLED_ORDER_STATUSES = ("Filled", "PartiallyFilled")
+# Fills of orders nobody watches (yet) that are remembered. The account's other fills (TP/SL executions, other symbols)
+# pass through here too, so only the newest ones are kept.
+MAXIMUM_UNWATCHED_FILLS = 1024
+
+
+class OrderUpdateStream:
+    """
+    Listens to the private `order` and `execution` topics and calls the registered callback as soon as a watched
+    order gets (partially) filled. Partial fills count as fills.
+    """
+
+    def __init__(self, websocket):
+        self._websocket = websocket
+        self._lock = threading.Lock()
+        # Watched orders that filled, until they're forgotten.
+        self._filled_order_ids = set()
+        # Fills can arrive before the watcher registers (the order may trigger right after it's placed).
+        self._unwatched_fills = OrderedDict()
+        self._callbacks = {}
+
+        websocket.order_stream(self._handle_order_message)
+        websocket.execution_stream(self._handle_execution_message)
+
+    @classmethod
+    def connect(cls, is_testnet_mode: bool, api_key: str, api_secret: str) -> "OrderUpdateStream":
+        return cls(WebSocket(testnet=is_testnet_mode, channel_type="private", api_key=api_key, api_secret=api_secret))
+
+    def is_connected(self) -> bool:
+        return self._websocket.is_connected()
+
+    def watch(self, order_ids: list, callback) -> None:
+        """
+        Calls `callback(order_id)` once for every order in `order_ids` that gets filled, including orders that were
+        already filled before this call.
+        """
+        already_filled = []
+        with self._lock:
+            for order_id in order_ids:
+                if order_id in self._filled_order_ids or self._unwatched_fills.pop(order_id, None):
+                    self._filled_order_ids.add(order_id)
+                    already_filled.append(order_id)
+                else:
+                    self._callbacks[order_id] = callback
+
+        for order_id in already_filled:
+            callback(order_id)
+
+    def forget(self, order_ids: list) -> None:
+        with self._lock:
+            for order_id in order_ids:
+                self._callbacks.pop(order_id, None)
+                self._filled_order_ids.discard(order_id)
+
+    def is_filled(self, order_id: str) -> bool:
+        with self._lock:
+            return order_id in self._filled_order_ids
+
+    def _handle_order_message(self, message: dict) -> None:
+        for order in message.get("data", []):
+            if order.get("orderStatus") in FILLED_ORDER_STATUSES:
+                self._mark_filled(order["orderId"], order["orderStatus"], int(order.get("updatedTime", 0)))
+
+    def _handle_execution_message(self, message: dict) -> None:
+        for execution in message.get("data", []):
+            self._mark_filled(execution["orderId"], "Executed", int(execution.get("execTime", 0)))
+
+    def _mark_filled(self, order_id: str, status: str, exchange_time: int) -> None:
+        with self._lock:
+            if order_id in self._filled_order_ids or order_id in self._unwatched_fills:
+                return
+            if exchange_time:
+                observe_latency("fill_detection_lag", time.time() - exchange_time / 1000)
+
+            callback = self._callbacks.pop(order_id, None)
+            if not callback:
+                self._unwatched_fills[order_id] = True
+                if len(self._unwatched_fills) > MAXIMUM_UNWATCHED_FILLS:
+                    self._unwatched_fills.popitem(last=False)
+                return
+
+            self._filled_order_ids.add(order_id)
+
+        logging.info(f"Order stream reported order {order_id} as filled. Real Status: {status}")
+        callback(order_id)
+
+    def close(self) -> None:
+        self._websocket.exit()
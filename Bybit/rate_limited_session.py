@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+from requests.adapters import HTTPAdapter
+
+# Bybit allows 600 requests per IP per 5 seconds.
+IP_REQUESTS_PER_SECOND = 120
+# Per-UID limits of the endpoints we use (requests per second). Other methods are only bound by the IP limit.
+ENDPOINT_REQUESTS_PER_SECOND = {
+    "place_order": 10,
+    "cancel_order": 10,
+    "set_leverage": 10,
+    "place_batch_order": 10,
+    "cancel_batch_order": 10,
+    "get_open_orders": 50,
+    "get_order_history": 50,
+    "get_positions": 50,
+    "get_wallet_balance": 50,
+}
+# Keep-alive connections shared by all the threads that send requests concurrently.
+CONNECTION_POOL_SIZE = 32
+# Bybit reports the remaining budget of the endpoint group in these headers.
+LIMIT_HEADER = "X-Bapi-Limit"
+LIMIT_STATUS_HEADER = "X-Bapi-Limit-Status"
+LIMIT_RESET_HEADER = "X-Bapi-Limit-Reset-Timestamp"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self._rate = rate
+        self._capacity = capacity or rate
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_seconds = max(self._paused_until - now, (1 - self._tokens) / self._rate)
+
+            # Sleeping outside the lock lets other threads refill and take their own tokens.
+            time.sleep(wait_seconds)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+class RateLimitedSession:
+    """
+    Lets any number of threads use one pybit `HTTP` session at the same time, over a pool of keep-alive connections.
+    Requests are throttled client-side with a token bucket per endpoint plus one for the whole IP, and an endpoint
+    backs off until its reset time when Bybit reports that its budget ran out.
+    """
+
+    def __init__(self, session, pool_size: int = CONNECTION_POOL_SIZE, ip_bucket: TokenBucket = None):
+        """
+        Sessions of several accounts on one host should share `ip_bucket`. The per-endpoint limits are per account.
+        """
+        self._session = session
+        # pybit then returns (response, elapsed, headers), which we unwrap after reading the rate limit headers.
+        session.return_response_headers = True
+        session.client.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+
+        self._ip_bucket = ip_bucket or TokenBucket(IP_REQUESTS_PER_SECOND)
+        self._endpoint_buckets = {name: TokenBucket(rate) for name, rate in ENDPOINT_REQUESTS_PER_SECOND.items()}
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def rate_limited_method(*args, **kwargs):
+            endpoint_bucket = self._endpoint_buckets.get(name)
+            if endpoint_bucket:
+                endpoint_bucket.acquire()
+            self._ip_bucket.acquire()
+
+            response = attr(*args, **kwargs)
+
+            if not isinstance(response, tuple):
+                return response
+
+            response, _, headers = response
+            self._back_off_if_exhausted(name, headers)
+
+            return response
+
+        return rate_limited_method
+
+    def _back_off_if_exhausted(self, name: str, headers) -> None:
+        remaining = headers.get(LIMIT_STATUS_HEADER)
+        reset_timestamp = headers.get(LIMIT_RESET_HEADER)
+
+        if remaining is None or reset_timestamp is None or int(remaining) > 0:
+            return
+
+        seconds_to_reset = max(int(reset_timestamp) / 1000 - time.time(), 0)
+        logging.warning(f"Rate limit budget of {name} ran out. Pausing it for {seconds_to_reset:.3f} seconds.")
+
+        # Endpoints without a configured limit get a bucket the first time Bybit says they're exhausted.
+        endpoint_bucket = self._endpoint_buckets.setdefault(
+            name, TokenBucket(float(headers.get(LIMIT_HEADER, IP_REQUESTS_PER_SECOND)))
+        )
+        endpoint_bucket.pause(seconds_to_reset)
@@ -0,0 +1,90 @@
+import bisect
+import logging
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from Strategy.constants import TARGET_HOURS_TIMEZONE
+from Strategy.target_slots import MILLISECONDS_IN_DAY, get_target_slots
+
+from .clock import get_clock
+from .latency_metrics import observe_latency
+
+# Target hours come back every day, but one can be missing on a DST switch day. No schedule skips a whole week.
+MAXIMUM_DAYS_TO_NEXT_TARGET = 7
+MILLISECONDS_IN_SECOND = 1000
+
+
+class TargetScheduler:
+    """
+    Start times (UTC milliseconds) of the upcoming target candles, from the same `TargetSlots` the backtest matches
+    candles with. Target hours are wall-clock times in `timezone_string`, so times that don't exist on a DST switch day
+    are skipped and times that happen twice are both scheduled. The host timezone doesn't matter.
+    """
+
+    def __init__(self, target_hours: list, candle_minutes: int, close_delay_seconds: float,
+                 timezone_string: str = TARGET_HOURS_TIMEZONE):
+        self._target_slots = get_target_slots(tuple(target_hours), timezone_string)
+        self._zone = ZoneInfo(timezone_string)
+        self._candle_milliseconds = candle_minutes * 60 * MILLISECONDS_IN_SECOND
+        self._close_delay_milliseconds = int(close_delay_seconds * MILLISECONDS_IN_SECOND)
+
+    def next_target(self, now_milliseconds: int) -> int:
+        """
+        Start time of the first target candle that hasn't been closed for long enough (including the one forming now).
+        """
+        threshold = now_milliseconds - self._candle_milliseconds - self._close_delay_milliseconds
+        first_day = threshold // MILLISECONDS_IN_DAY
+
+        for day in range(first_day, first_day + MAXIMUM_DAYS_TO_NEXT_TARGET + 1):
+            start_times = self._target_slots.start_times_of_day(day)
+
+            index = bisect.bisect_right(start_times, threshold)
+            if index < len(start_times):
+                return start_times[index]
+
+        logging.error(f"No target candle in the {MAXIMUM_DAYS_TO_NEXT_TARGET} days after {now_milliseconds}")
+        raise RuntimeError(f"No target candle in the {MAXIMUM_DAYS_TO_NEXT_TARGET} days after {now_milliseconds}")
+
+    def wake_up_time(self, target_start_time: int) -> int:
+        return target_start_time + self._candle_milliseconds + self._close_delay_milliseconds
+
+    def to_local_time(self, milliseconds: int) -> datetime:
+        return datetime.fromtimestamp(milliseconds / MILLISECONDS_IN_SECOND, tz=self._zone)
+
+    def sleep_until_next_target(self, seconds_before: float = 0) -> datetime:
+        """
+        Sleeps until the next target candle closed (or until `seconds_before` seconds before that) and returns its start
+        time in the target-hours timezone.
+        """
+        target_start_time = self.next_target(int(get_clock().time() * MILLISECONDS_IN_SECOND))
+
+        self.sleep_until_target(target_start_time, seconds_before)
+
+        return self.to_local_time(target_start_time)
+
+    def sleep_until_target(self, target_start_time: int, seconds_before: float = 0) -> None:
+        """
+        Sleeps until the given target candle closed (or `seconds_before` seconds before that). Returns at once if that
+        moment already passed.
+        """
+        clock = get_clock()
+        now_milliseconds = int(clock.time() * MILLISECONDS_IN_SECOND)
+        wake_up_time = self.wake_up_time(target_start_time) - int(seconds_before * MILLISECONDS_IN_SECOND)
+
+        # Wall-clock time is only read once. The wait itself runs on the monotonic clock, which can't jump.
+        seconds_to_sleep = max(wake_up_time - now_milliseconds, 0) / MILLISECONDS_IN_SECOND
+        deadline = clock.monotonic() + seconds_to_sleep
+
+        logging.info(
+            f"Sleeping until next target: {self.to_local_time(wake_up_time)} (in {seconds_to_sleep / 60:.1f} minutes)"
+        )
+
+        clock.sleep_until(deadline)
+
+        now_milliseconds = int(clock.time() * MILLISECONDS_IN_SECOND)
+        if not seconds_before:
+            observe_latency("wake_up_lag", (now_milliseconds - wake_up_time) / MILLISECONDS_IN_SECOND)
+        logging.info(
+            f"Woken up from sleep. Current time: {self.to_local_time(now_milliseconds)} "
+            f"(late by {now_milliseconds - wake_up_time} ms)"
+        )
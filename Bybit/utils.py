@@ -1,9 +1,13 @@
 import base64
+import logging
 import os
 
 BASE_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
 API_KEY_FILE_PATH = os.path.join(BASE_DIRECTORY_PATH, "API Keys\\api_key.txt")
 API_SECRET_FILE_PATH = os.path.join(BASE_DIRECTORY_PATH, "API Keys\\api_secret.txt")
+# Comma-separated names of the sub-accounts that trade the same signals as the main account.
+SUB_ACCOUNTS_ENV_VAR = "BYBIT_SUB_ACCOUNTS"
+
 
 def read_api_key(testnet_mode: bool = True,local_running: bool = False) -> str:
     env_var = "BYBIT_API_KEY_TESTNET" if testnet_mode else "BYBIT_API_KEY"
@@ -45,3 +49,29 @@ def read_api_secret(testnet_mode: bool = True,local_running: bool = False) -> st
             return base64.b64decode(env_key).decode("utf-8")
         except Exception:
             return env_key  # If not base64, return as is
+
+
+def read_sub_account_names() -> list:
+    return [name.strip() for name in os.environ.get(SUB_ACCOUNTS_ENV_VAR, "").split(",") if name.strip()]
+
+
+def read_sub_account_credentials(account_name: str, testnet_mode: bool = True) -> tuple:
+    """
+    Returns the API key and secret of a sub-account, from `BYBIT_API_KEY[_TESTNET]_<NAME>` and
+    `BYBIT_API_SECRET[_TESTNET]_<NAME>`. Like the main account's, they may be base64 encoded.
+    """
+    suffix = f"{'_TESTNET' if testnet_mode else ''}_{account_name.upper()}"
+    credentials = []
+
+    for env_var in [f"BYBIT_API_KEY{suffix}", f"BYBIT_API_SECRET{suffix}"]:
+        env_value = os.environ.get(env_var)
+        if not env_value:
+            logging.error(f"Missing {env_var} for sub-account {account_name}")
+            raise RuntimeError(f"Missing {env_var} for sub-account {account_name}")
+
+        try:
+            credentials.append(base64.b64decode(env_value, validate=True).decode("utf-8"))
+        except Exception:
+            credentials.append(env_value)  # If not base64, return as is
+
+    return credentials[0], credentials[1]
@@ -0,0 +1,289 @@
+"""
+End-to-end benchmarks of the bot against the simulated exchange.
+Every symbol gets a doji in the same target candle, so all of them place their orders at once, and the candle after it
+triggers the long leg of every pair.
+
+Usage: python -m Simulator.benchmark [--symbols 1 8 32] [--accounts 1 4] [--latency 0.05]
+"""
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from Bybit.bot import (
+    ACCOUNT_CURRENCY, CHART_INTERVAL, MAXIMUM_SYMBOL_WORKERS, PRE_CLOSE_SECONDS,
+    PRODUCT_TYPE, prepare_for_target, settle_order_pair, trade_symbol
+)
+from Bybit.instrument_cache import InstrumentCache
+from Bybit.order_journal import OrderJournal
+from Bybit.order_reactor import OrderReactor, POLL_ORDER_FILL_SECONDS, PENDING_ORDER_STATUSES
+from Bybit.order_stream import FILLED_ORDER_STATUSES
+from Bybit.rate_limited_session import RateLimitedSession
+from Strategy.candle_store import CandleStore
+from Strategy.candles import CANDLE_DTYPE, klines_to_candles
+from Strategy.constants import RISK_PER_POSITION_PERCENTAGE, TARGET_HOURS_TIMEZONE
+
+from .exchange import SimulatedExchange
+
+BENCHMARK_TARGET_TIME = datetime(2024, 3, 4, 9, 30, tzinfo=ZoneInfo(TARGET_HOURS_TIMEZONE))
+CANDLES_BEFORE_TARGET = 10
+CANDLES_AFTER_TARGET = 10
+BASE_PRICE = 60000.0
+# Half the height of the doji, in price units. The candle after it breaks above its high.
+DOJI_HALF_RANGE = 50.0
+BREAKOUT_DISTANCE = 150.0
+DEFAULT_SYMBOL_COUNTS = [1, 8, 32]
+DEFAULT_ACCOUNT_COUNTS = [1]
+DEFAULT_LATENCY_SECONDS = 0.05
+SETTLEMENT_TIMEOUT_SECONDS = 120
+MILLISECONDS_IN_SECOND = 1000
+
+
+def build_doji_candles(symbol_count: int) -> dict:
+    """
+    Same price path for every symbol: flat candles, a doji at the target time, then a breakout above the doji.
+    """
+    candle_milliseconds = CHART_INTERVAL * 60 * MILLISECONDS_IN_SECOND
+    target_start_time = int(BENCHMARK_TARGET_TIME.timestamp() * MILLISECONDS_IN_SECOND)
+    candle_count = CANDLES_BEFORE_TARGET + 1 + CANDLES_AFTER_TARGET
+
+    candles = np.zeros(candle_count, dtype=CANDLE_DTYPE)
+    candles["start_time"] = target_start_time + (np.arange(candle_count) - CANDLES_BEFORE_TARGET) * candle_milliseconds
+    candles["open"] = candles["close"] = BASE_PRICE
+    # Plain candles have a body, so they are never dojis.
+    candles["close"] += 1
+    candles["high"] = candles["close"] + 1
+    candles["low"] = candles["open"] - 1
+    candles["volume"] = 1.0
+
+    target = candles[CANDLES_BEFORE_TARGET:CANDLES_BEFORE_TARGET + 1]
+    target["close"] = BASE_PRICE
+    target["high"] = BASE_PRICE + DOJI_HALF_RANGE
+    target["low"] = BASE_PRICE - DOJI_HALF_RANGE
+
+    breakout = candles[CANDLES_BEFORE_TARGET + 1:CANDLES_BEFORE_TARGET + 2]
+    breakout["close"] = breakout["high"] = BASE_PRICE + BREAKOUT_DISTANCE
+
+    return {f"SIM{index}USDT": candles.copy() for index in range(symbol_count)}
+
+
+def candle_close_time(candle_index: int) -> int:
+    candle_milliseconds = CHART_INTERVAL * 60 * MILLISECONDS_IN_SECOND
+    start_time = int(BENCHMARK_TARGET_TIME.timestamp() * MILLISECONDS_IN_SECOND)
+
+    return start_time + (candle_index - CANDLES_BEFORE_TARGET + 1) * candle_milliseconds
+
+
+class PairCollector:
+    """
+    Takes the place of an account's order reactor, so the placed pairs can be settled separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pairs = []
+
+    def add_pair(self, long_order_id: str, short_order_id: str, symbol: str) -> None:
+        with self._lock:
+            self.pairs.append((long_order_id, short_order_id, symbol))
+
+
+def place_all_pairs(exchanges: list, directory: str) -> tuple:
+    """
+    Runs `prepare_for_target` and then `trade_symbol` for every symbol in parallel, like `run_bot` does at a target
+    candle. Every exchange is a separate account, and the first one is also where market data is read from.
+    Returns the placed pairs of every account as (long order ID, short order ID, symbol) and the wall time from the
+    close.
+    """
+    api = RateLimitedSession(exchanges[0])
+    symbols = exchanges[0].symbols
+    symbol_settings = {"TargetHours": [BENCHMARK_TARGET_TIME.strftime("%H:%M:%S")],
+                       "RiskPerPosition": RISK_PER_POSITION_PERCENTAGE}
+
+    instrument_cache = InstrumentCache(api, PRODUCT_TYPE, symbols, path=f"{directory}/instruments.json")
+    instrument_cache.refresh()
+    accounts = [
+        {"Name": f"Account{index}", "Api": RateLimitedSession(exchange) if index else api, "LeverageState": {},
+         "OrderJournal": OrderJournal(f"{directory}/orders.{index}.journal"), "OrderReactor": PairCollector()}
+        for index, exchange in enumerate(exchanges)
+    ]
+
+    # `run_bot` wakes up right at the close.
+    wake_up_time = candle_close_time(CANDLES_BEFORE_TARGET)
+    target_start_time = int(BENCHMARK_TARGET_TIME.timestamp() * MILLISECONDS_IN_SECOND)
+
+    with ThreadPoolExecutor(max_workers=MAXIMUM_SYMBOL_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=2 * MAXIMUM_SYMBOL_WORKERS * len(accounts)) as order_executor:
+        for exchange in exchanges:
+            exchange.advance_to(wake_up_time - int(PRE_CLOSE_SECONDS * MILLISECONDS_IN_SECOND))
+        prepared = prepare_for_target(
+            api, target_start_time, {symbol: symbol_settings for symbol in symbols}, instrument_cache, accounts,
+            order_executor
+        )
+
+        # `run_bot` keeps the stores up to date while it waits, so after the close only the new candles are appended.
+        candle_stores = {symbol: CandleStore(symbol, CHART_INTERVAL, directory) for symbol in symbols}
+        for symbol, candle_store in candle_stores.items():
+            candles = klines_to_candles(
+                api.get_kline(category=PRODUCT_TYPE, symbol=symbol, interval=CHART_INTERVAL)["result"]["list"]
+            )
+            candle_store.append(candles[candles["start_time"] < target_start_time])
+
+        # Only what happens after the close counts.
+        for exchange in exchanges:
+            exchange.advance_to(wake_up_time)
+            exchange.call_counts.clear()
+
+        start_time = time.perf_counter()
+        futures = [
+            executor.submit(
+                trade_symbol, api, symbol, symbol_settings, candle_stores[symbol], accounts, instrument_cache,
+                order_executor, target_start_time, prepared["WalletBalances"]
+            )
+            for symbol in symbols
+        ]
+        wait(futures)
+        elapsed = time.perf_counter() - start_time
+
+    for account in accounts:
+        account["OrderJournal"].close()
+
+    for future in futures:
+        future.result()
+
+    return [account["OrderReactor"].pairs for account in accounts], elapsed
+
+
+def settle_with_reactor(exchange: SimulatedExchange, pairs: list) -> float:
+    api = RateLimitedSession(exchange)
+    order_reactor = OrderReactor(api, PRODUCT_TYPE, ACCOUNT_CURRENCY, lambda *args: settle_order_pair(api, *args))
+    for long_order_id, short_order_id, symbol in pairs:
+        order_reactor.add_pair(long_order_id, short_order_id, symbol)
+
+    start_time = time.perf_counter()
+    order_reactor.start()
+    try:
+        while order_reactor.pending_pairs():
+            if time.perf_counter() - start_time > SETTLEMENT_TIMEOUT_SECONDS:
+                raise RuntimeError(f"Order reactor didn't settle {len(pairs)} pairs in time")
+            time.sleep(0.01)
+    finally:
+        order_reactor.stop()
+
+    return time.perf_counter() - start_time
+
+
+def was_order_filled(api: RateLimitedSession, order_id: str) -> bool:
+    """
+    The fill check the bot made before the order reactor, one request per leg. Partially filled orders count as filled.
+    """
+    response = api.get_open_orders(category=PRODUCT_TYPE, orderId=order_id)
+
+    if not response["result"]["list"]:
+        logging.error("get_open_orders API failed. Invalid order ID?")
+        raise RuntimeError("get_open_orders API failed. Invalid order ID?")
+
+    order_status = response["result"]["list"][0]["orderStatus"]
+
+    if order_status in FILLED_ORDER_STATUSES:
+        return True
+    if order_status in PENDING_ORDER_STATUSES:
+        return False
+
+    logging.error(f"Unexpected order status: {order_status}")
+    raise RuntimeError(f"Unexpected order status: {order_status}")
+
+
+def wait_for_orders(api: RateLimitedSession, long_order_id: str, short_order_id: str, symbol: str) -> None:
+    """
+    How a pair was settled before the order reactor: a thread per pair polls both of its legs.
+    """
+    while True:
+        time.sleep(POLL_ORDER_FILL_SECONDS)
+
+        long_order_filled = was_order_filled(api, long_order_id)
+        short_order_filled = was_order_filled(api, short_order_id)
+
+        if settle_order_pair(api, long_order_id, short_order_id, long_order_filled, short_order_filled, symbol):
+            return
+
+
+def settle_with_wait_for_orders(exchange: SimulatedExchange, pairs: list) -> float:
+    api = RateLimitedSession(exchange)
+
+    start_time = time.perf_counter()
+    threads = [
+        threading.Thread(target=wait_for_orders, args=(api, long_order_id, short_order_id, symbol))
+        for long_order_id, short_order_id, symbol in pairs
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start_time
+
+
+def run_benchmark(symbol_count: int, latency_seconds: float, account_count: int = 1) -> dict:
+    """
+    Settling is measured on the first account only.
+    """
+    results = {"symbols": symbol_count, "accounts": account_count}
+
+    for settle_name, settle in (("reactor", settle_with_reactor), ("wait_for_orders", settle_with_wait_for_orders)):
+        exchanges = [
+            SimulatedExchange(build_doji_candles(symbol_count), CHART_INTERVAL, latency_seconds=latency_seconds)
+            for _ in range(account_count)
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            pairs_by_account, place_seconds = place_all_pairs(exchanges, directory)
+
+        place_calls = sum(sum(exchange.call_counts.values()) for exchange in exchanges)
+        results["candle_to_orders_seconds"] = place_seconds
+        results["api_calls_per_trade"] = place_calls / max(sum(len(pairs) for pairs in pairs_by_account), 1)
+
+        # The breakout candle triggers the long leg of every pair.
+        exchanges[0].advance_to(candle_close_time(CANDLES_BEFORE_TARGET + 1))
+        exchanges[0].call_counts.clear()
+
+        results[f"{settle_name}_settle_seconds"] = settle(exchanges[0], pairs_by_account[0])
+        results[f"{settle_name}_api_calls"] = sum(exchanges[0].call_counts.values())
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot against the simulated exchange.")
+    parser.add_argument("--symbols", type=int, nargs="+", default=DEFAULT_SYMBOL_COUNTS,
+                        help="Numbers of symbols that get a doji at the same time")
+    parser.add_argument("--accounts", type=int, nargs="+", default=DEFAULT_ACCOUNT_COUNTS,
+                        help="Numbers of accounts every signal is placed on")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY_SECONDS,
+                        help="Simulated latency of every API call, in seconds")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own log")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    print(f"{'symbols':>8} {'accounts':>9} {'candle->orders':>15} {'calls/trade':>12} {'reactor':>10} {'calls':>6} "
+          f"{'wait_for_orders':>16} {'calls':>6}")
+    for symbol_count in args.symbols:
+        for account_count in args.accounts:
+            results = run_benchmark(symbol_count, args.latency, account_count)
+            print(
+                f"{results['symbols']:>8} {results['accounts']:>9} {results['candle_to_orders_seconds']:>14.3f}s "
+                f"{results['api_calls_per_trade']:>12.1f} {results['reactor_settle_seconds']:>9.3f}s "
+                f"{results['reactor_api_calls']:>6} {results['wait_for_orders_settle_seconds']:>15.3f}s "
+                f"{results['wait_for_orders_api_calls']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
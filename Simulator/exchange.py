@@ -0,0 +1,355 @@
+"""
+In-process stand-in for the parts of the pybit `HTTP` session that the bot uses.
+Prices replay recorded candles: conditional orders trigger when a candle crosses their trigger price, and positions
+close when a later candle reaches their stop-loss or take-profit. Time only moves when `advance_to` is called.
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import requests
+from pybit.exceptions import InvalidRequestError
+
+from Strategy.candles import CANDLE_DTYPE
+
+ORDER_NOT_FOUND_ERROR_CODE = 110001
+LEVERAGE_NOT_MODIFIED_ERROR_CODE = 110043
+QUANTITY_TOO_SMALL_ERROR_CODE = 10001
+DEFAULT_INSTRUMENT_FILTERS = {
+    "priceFilter": {"tickSize": "0.10", "minPrice": "0.10", "maxPrice": "1999999.80"},
+    "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001", "maxOrderQty": "1190.000"},
+    "leverageFilter": {"minLeverage": "1", "maxLeverage": "100.00", "leverageStep": "0.01"},
+}
+OPEN_ORDER_STATUSES = ("Untriggered", "New")
+
+
+class SimulatedExchange:
+    def __init__(self, candles_by_symbol: dict, interval: int = 3, wallet_balance: float = 10000.0,
+                 latency_seconds: float = 0.0, instrument_filters: dict = None):
+        """
+        `latency_seconds` is added to every call, or can be a dict of method name -> seconds.
+        """
+        self._candles = {symbol: np.sort(candles.astype(CANDLE_DTYPE), order="start_time")
+                         for symbol, candles in candles_by_symbol.items()}
+        self._interval_milliseconds = interval * 60 * 1000
+        self._wallet_balance = wallet_balance
+        self._latency_seconds = latency_seconds
+        self._instrument_filters = instrument_filters or DEFAULT_INSTRUMENT_FILTERS
+
+        self._lock = threading.RLock()
+        self._now = min(int(candles["start_time"][0]) for candles in self._candles.values())
+        self._next_candle_to_match = {symbol: 0 for symbol in self._candles}
+        self._order_ids = itertools.count(1)
+        self._orders = {}
+        self._positions = {}
+        self._leverage = {}
+
+        self.call_counts = Counter()
+        # Same switch as pybit: return (response, elapsed, headers) instead of the response.
+        self.return_response_headers = False
+        self.client = requests.Session()
+
+    @property
+    def now(self) -> int:
+        return self._now
+
+    @property
+    def wallet_balance(self) -> float:
+        return self._wallet_balance
+
+    @property
+    def symbols(self) -> list:
+        return list(self._candles)
+
+    # Simulation control.
+
+    def advance_to(self, now: int) -> None:
+        """
+        Moves the clock forward (UTC milliseconds) and matches every candle that closed in the meantime.
+        """
+        with self._lock:
+            self._now = max(self._now, now)
+
+            for symbol, candles in self._candles.items():
+                index = self._next_candle_to_match[symbol]
+                while index < len(candles) and candles["start_time"][index] + self._interval_milliseconds <= self._now:
+                    self._match_candle(symbol, candles[index])
+                    index += 1
+                self._next_candle_to_match[symbol] = index
+
+    def _match_candle(self, symbol: str, candle) -> None:
+        candle_time = int(candle["start_time"])
+
+        for order in list(self._orders.values()):
+            if order["symbol"] != symbol or "Untriggered" != order["orderStatus"]:
+                continue
+
+            trigger_price = float(order["triggerPrice"])
+            if (1 == order["triggerDirection"] and candle["high"] >= trigger_price) or \
+                    (2 == order["triggerDirection"] and candle["low"] <= trigger_price):
+                self._fill(order, trigger_price, candle_time)
+
+        position = self._positions.get(symbol)
+        if not position:
+            return
+
+        # Within a single candle we can't tell which came first, so the stop-loss wins.
+        is_long = "Buy" == position["side"]
+        stop_loss, take_profit = position["stopLoss"], position["takeProfit"]
+        stop_loss_hit = candle["low"] <= stop_loss if is_long else candle["high"] >= stop_loss
+        take_profit_hit = candle["high"] >= take_profit if is_long else candle["low"] <= take_profit
+
+        if stop_loss and stop_loss_hit:
+            self._close_position(symbol, stop_loss)
+        elif take_profit and take_profit_hit:
+            self._close_position(symbol, take_profit)
+
+    def _fill(self, order: dict, price: float, fill_time: int) -> None:
+        order["orderStatus"] = "Filled"
+        order["avgPrice"] = str(price)
+        order["updatedTime"] = str(fill_time)
+
+        symbol = order["symbol"]
+        quantity = float(order["qty"])
+        position = self._positions.get(symbol)
+
+        if not position:
+            self._positions[symbol] = {
+                "side": order["side"], "size": quantity, "entryPrice": price,
+                "leverage": self._leverage.get(symbol, 1.0),
+                "takeProfit": float(order.get("takeProfit") or 0), "stopLoss": float(order.get("stopLoss") or 0),
+            }
+        elif position["side"] == order["side"]:
+            total_size = position["size"] + quantity
+            position["entryPrice"] = (position["entryPrice"] * position["size"] + price * quantity) / total_size
+            position["size"] = total_size
+        else:
+            # One-way mode: an opposite fill reduces (and possibly flips) the position.
+            closed_size = min(position["size"], quantity)
+            self._realize(position, price, closed_size)
+            position["size"] -= closed_size
+            if not position["size"]:
+                del self._positions[symbol]
+            if quantity > closed_size:
+                self._positions[symbol] = {
+                    "side": order["side"], "size": quantity - closed_size, "entryPrice": price,
+                    "leverage": self._leverage.get(symbol, 1.0),
+                    "takeProfit": float(order.get("takeProfit") or 0), "stopLoss": float(order.get("stopLoss") or 0),
+                }
+
+    def _realize(self, position: dict, price: float, size: float) -> None:
+        direction = 1 if "Buy" == position["side"] else -1
+        self._wallet_balance += direction * (price - position["entryPrice"]) * size
+
+    def _close_position(self, symbol: str, price: float) -> None:
+        position = self._positions.pop(symbol)
+        self._realize(position, price, position["size"])
+
+    # pybit `HTTP` surface.
+
+    def _respond(self, method: str, result: dict, ext_info: dict = None):
+        self.call_counts[method] += 1
+
+        latency = self._latency_seconds.get(method, 0.0) if isinstance(self._latency_seconds, dict) \
+            else self._latency_seconds
+        if latency:
+            time.sleep(latency)
+
+        response = {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": ext_info or {}, "time": self._now}
+        if self.return_response_headers:
+            return response, latency, {}
+
+        return response
+
+    def _raise(self, method: str, message: str, status_code: int):
+        self._respond(method, {})
+        raise InvalidRequestError(
+            request=method, message=message, status_code=status_code,
+            time=datetime.now().strftime("%H:%M:%S"), resp_headers={}
+        )
+
+    def get_server_time(self, **kwargs):
+        with self._lock:
+            now = self._now
+
+        return self._respond("get_server_time", {
+            "timeSecond": str(now // 1000), "timeNano": str(now * 1000000)
+        })
+
+    def get_kline(self, category: str, symbol: str, interval, limit: int = 200, start: int = None, end: int = None,
+                  **kwargs):
+        with self._lock:
+            candles = self._candles[symbol]
+            candles = candles[candles["start_time"] <= min(self._now, end if end is not None else self._now)]
+            if start is not None:
+                candles = candles[candles["start_time"] >= start]
+            candles = candles[-limit:]
+
+            klines = [
+                [str(candle["start_time"]), str(candle["open"]), str(candle["high"]), str(candle["low"]),
+                 str(candle["close"]), str(candle["volume"]), "0"]
+                for candle in candles[::-1]
+            ]
+
+        return self._respond("get_kline", {"category": category, "symbol": symbol, "list": klines})
+
+    def get_instruments_info(self, category: str, symbol: str = None, **kwargs):
+        symbols = [symbol] if symbol else list(self._candles)
+        instruments = [{"symbol": name, **self._instrument_filters} for name in symbols]
+
+        return self._respond("get_instruments_info", {"category": category, "list": instruments,
+                                                      "nextPageCursor": ""})
+
+    def get_wallet_balance(self, accountType: str, coin: str = None, **kwargs):
+        with self._lock:
+            balance = self._wallet_balance
+
+        return self._respond("get_wallet_balance", {"list": [{"totalWalletBalance": str(balance)}]})
+
+    def set_margin_mode(self, setMarginMode: str, **kwargs):
+        return self._respond("set_margin_mode", {})
+
+    def set_leverage(self, category: str, symbol: str, buyLeverage: str, sellLeverage: str, **kwargs):
+        with self._lock:
+            if self._leverage.get(symbol) == float(buyLeverage):
+                self._raise("set_leverage", "leverage not modified", LEVERAGE_NOT_MODIFIED_ERROR_CODE)
+            self._leverage[symbol] = float(buyLeverage)
+
+        return self._respond("set_leverage", {})
+
+    def _place_order(self, symbol: str, side: str, orderType: str, qty: str, **kwargs) -> tuple:
+        """
+        Returns (error code, message, order ID). Must be called with the lock held.
+        """
+        minimum_quantity = float(self._instrument_filters["lotSizeFilter"]["minOrderQty"])
+        if float(qty) < minimum_quantity:
+            return QUANTITY_TOO_SMALL_ERROR_CODE, "Order quantity is too small", ""
+
+        order_id = f"simulated-{next(self._order_ids)}"
+        self._orders[order_id] = {
+            "orderId": order_id, "symbol": symbol, "side": side, "orderType": orderType, "qty": qty,
+            "price": kwargs.get("price", "0"), "triggerPrice": kwargs.get("triggerPrice", ""),
+            "triggerDirection": kwargs.get("triggerDirection", 0),
+            "takeProfit": kwargs.get("takeProfit", ""), "stopLoss": kwargs.get("stopLoss", ""),
+            "orderStatus": "Untriggered" if kwargs.get("triggerPrice") else "New",
+            "orderFilter": "StopOrder" if kwargs.get("triggerPrice") else "Order",
+            "reduceOnly": kwargs.get("reduceOnly", False), "closeOnTrigger": kwargs.get("closeOnTrigger", False),
+            "createdTime": str(self._now), "updatedTime": str(self._now),
+        }
+
+        # Orders without a trigger are market orders, filled at the last traded price.
+        if not kwargs.get("triggerPrice"):
+            candles = self._candles[symbol]
+            last_index = max(np.searchsorted(candles["start_time"], self._now, side="right") - 1, 0)
+            self._fill(self._orders[order_id], float(candles["close"][last_index]), self._now)
+
+        return 0, "OK", order_id
+
+    def _cancel_order(self, order_id: str) -> tuple:
+        """
+        Returns (error code, message). Must be called with the lock held.
+        """
+        order = self._orders.get(order_id)
+        if not order or order["orderStatus"] not in OPEN_ORDER_STATUSES:
+            return ORDER_NOT_FOUND_ERROR_CODE, "Order does not exist or is too late to cancel"
+
+        order["orderStatus"] = "Cancelled"
+        order["updatedTime"] = str(self._now)
+
+        return 0, "OK"
+
+    def place_order(self, category: str, symbol: str, side: str, orderType: str, qty: str, **kwargs):
+        with self._lock:
+            code, message, order_id = self._place_order(symbol, side, orderType, qty, **kwargs)
+
+        if code:
+            self._raise("place_order", message, code)
+
+        return self._respond("place_order", {"orderId": order_id, "orderLinkId": ""})
+
+    def place_batch_order(self, category: str, request: list, **kwargs):
+        """
+        Like Bybit, every order succeeds or fails on its own, and the per-order codes are in `retExtInfo`.
+        """
+        results = []
+        with self._lock:
+            for order in request:
+                results.append(self._place_order(**order))
+
+        return self._respond(
+            "place_batch_order",
+            {"list": [
+                {"category": category, "symbol": order["symbol"], "orderId": order_id, "orderLinkId": ""}
+                for order, (_, _, order_id) in zip(request, results)
+            ]},
+            {"list": [{"code": code, "msg": message} for code, message, _ in results]}
+        )
+
+    def get_open_orders(self, category: str, symbol: str = None, settleCoin: str = None, orderId: str = None,
+                        openOnly: int = 0, limit: int = 20, cursor: str = "", **kwargs):
+        """
+        Like Bybit, `openOnly=1` returns recently closed orders (newest first) instead of open ones.
+        """
+        with self._lock:
+            if orderId:
+                # Like Bybit, querying by ID also returns recently closed orders.
+                orders = [dict(self._orders[orderId])] if orderId in self._orders else []
+            else:
+                orders = [
+                    dict(order) for order in self._orders.values()
+                    if (order["orderStatus"] not in OPEN_ORDER_STATUSES) == bool(openOnly) and
+                    (not symbol or order["symbol"] == symbol)
+                ]
+                if openOnly:
+                    orders.sort(key=lambda order: int(order["updatedTime"]), reverse=True)
+
+        offset = int(cursor or 0)
+        page = orders[offset:offset + limit]
+        next_cursor = str(offset + limit) if offset + limit < len(orders) else ""
+
+        return self._respond("get_open_orders", {"category": category, "list": page, "nextPageCursor": next_cursor})
+
+    def get_order_history(self, category: str, orderId: str = None, **kwargs):
+        with self._lock:
+            orders = [dict(self._orders[orderId])] if orderId in self._orders else []
+
+        return self._respond("get_order_history", {"category": category, "list": orders, "nextPageCursor": ""})
+
+    def cancel_order(self, category: str, symbol: str, orderId: str, **kwargs):
+        with self._lock:
+            code, message = self._cancel_order(orderId)
+
+        if code:
+            self._raise("cancel_order", message, code)
+
+        return self._respond("cancel_order", {"orderId": orderId, "orderLinkId": ""})
+
+    def cancel_batch_order(self, category: str, request: list, **kwargs):
+        with self._lock:
+            results = [self._cancel_order(order["orderId"]) for order in request]
+
+        return self._respond(
+            "cancel_batch_order",
+            {"list": [
+                {"category": category, "symbol": order["symbol"], "orderId": order["orderId"], "orderLinkId": ""}
+                for order in request
+            ]},
+            {"list": [{"code": code, "msg": message} for code, message in results]}
+        )
+
+    def get_positions(self, category: str, symbol: str = None, **kwargs):
+        with self._lock:
+            positions = [
+                {
+                    "symbol": name, "side": position["side"], "size": str(position["size"]),
+                    "entryPrice": str(position["entryPrice"]), "leverage": str(position["leverage"]),
+                    "takeProfit": str(position["takeProfit"]), "stopLoss": str(position["stopLoss"]),
+                    "unrealisedPnl": "0",
+                }
+                for name, position in self._positions.items() if not symbol or name == symbol
+            ]
+
+        return self._respond("get_positions", {"category": category, "list": positions})
@@ -0,0 +1,119 @@
+"""
+Runs the live `run_bot` loop over recorded candles on a virtual clock.
+Nothing about the bot is modelled separately: the scheduler, `trade_symbol` and the order reactor run unchanged against
+the simulated exchange, and every sleep finishes as soon as all the bot's threads are idle.
+
+Usage: python -m Simulator.replay --start 2024-03-01 --days 7 [--directory candles]
+"""
+import argparse
+import logging
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from Bybit.bot import CHART_INTERVAL, SYMBOLS_TO_TRADE, run_bot
+from Bybit.clock import VirtualClock, get_clock, use_clock
+from Strategy.candle_store import CANDLE_STORE_DIRECTORY, CandleStore
+
+from .exchange import SimulatedExchange
+
+SECONDS_IN_DAY = 24 * 60 * 60
+MILLISECONDS_IN_SECOND = 1000
+DEFAULT_WALLET_BALANCE = 10000.0
+
+
+def load_recorded_candles(symbols: list, directory: str = CANDLE_STORE_DIRECTORY) -> dict:
+    candles_by_symbol = {}
+
+    for symbol in symbols:
+        candle_store = CandleStore(symbol, CHART_INTERVAL, directory)
+        if not len(candle_store):
+            logging.error(f"No recorded candles for {symbol} in {candle_store.path}")
+            raise RuntimeError(f"No recorded candles for {symbol} in {candle_store.path}")
+
+        candles_by_symbol[symbol] = np.array(candle_store.open())
+
+    return candles_by_symbol
+
+
+def run_replay(candles_by_symbol: dict, start_time: float, days_to_run: float,
+               symbols_to_trade: dict = SYMBOLS_TO_TRADE, wallet_balance: float = DEFAULT_WALLET_BALANCE,
+               candle_directory: str = None, sub_account_wallet_balances: dict = None) -> dict:
+    """
+    Replays `days_to_run` days from `start_time` (epoch seconds). The candles must cover the whole period.
+    The bot records its candles into `candle_directory`, or a temporary directory that's deleted afterwards.
+    `sub_account_wallet_balances` maps a sub-account name to its balance. Each sub-account trades on its own exchange.
+    Returns the simulated exchange's final wallet balance and API call counts, the final balance of every sub-account,
+    and the real time it took.
+    """
+    last_close_time = min(
+        int(candles["start_time"][-1]) for candles in candles_by_symbol.values()
+    ) / MILLISECONDS_IN_SECOND
+    if start_time + days_to_run * SECONDS_IN_DAY >= last_close_time:
+        logging.error(f"Recorded candles end at {datetime.fromtimestamp(last_close_time, timezone.utc)}, "
+                      f"before the end of the replay.")
+        raise RuntimeError(f"Recorded candles end at {datetime.fromtimestamp(last_close_time, timezone.utc)}, "
+                           f"before the end of the replay.")
+
+    exchange = SimulatedExchange(candles_by_symbol, CHART_INTERVAL, wallet_balance)
+    sub_account_exchanges = {
+        name: SimulatedExchange(candles_by_symbol, CHART_INTERVAL, sub_account_wallet_balance)
+        for name, sub_account_wallet_balance in (sub_account_wallet_balances or {}).items()
+    }
+    exchanges = [exchange] + list(sub_account_exchanges.values())
+
+    def advance_exchanges(now: float) -> None:
+        for advanced_exchange in exchanges:
+            advanced_exchange.advance_to(int(now * MILLISECONDS_IN_SECOND))
+
+    advance_exchanges(start_time)
+    clock = VirtualClock(start_time, advance_exchanges)
+
+    previous_clock = get_clock()
+    use_clock(clock)
+    real_start_time = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            run_bot(exchange, days_to_run, symbols_to_trade=symbols_to_trade,
+                    candle_directory=candle_directory or directory,
+                    instrument_cache_path=f"{directory}/instruments.json",
+                    order_journal_path=f"{directory}/orders.journal",
+                    sub_accounts={name: {"Api": sub_account_exchange}
+                                  for name, sub_account_exchange in sub_account_exchanges.items()})
+    finally:
+        use_clock(previous_clock)
+
+    return {
+        "wallet_balance": exchange.wallet_balance,
+        "api_calls": dict(exchange.call_counts),
+        "sub_account_wallet_balances": {
+            name: sub_account_exchange.wallet_balance for name, sub_account_exchange in sub_account_exchanges.items()
+        },
+        "real_seconds": time.perf_counter() - real_start_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the live bot over recorded candles on a virtual clock.")
+    parser.add_argument("--start", required=True, help="UTC date to start from, YYYY-MM-DD")
+    parser.add_argument("--days", type=float, required=True, help="Days to replay")
+    parser.add_argument("--directory", default=CANDLE_STORE_DIRECTORY, help="Candle store directory")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own log")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    start_time = datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    candles_by_symbol = load_recorded_candles(list(SYMBOLS_TO_TRADE), args.directory)
+
+    result = run_replay(candles_by_symbol, start_time, args.days)
+
+    print(f"Replayed {args.days} days in {result['real_seconds']:.1f} seconds")
+    print(f"Final wallet balance: {result['wallet_balance']:.2f}")
+    print(f"API calls: {result['api_calls']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Historical backtest of the doji strategy over arrays of candles (see `candles.CANDLE_DTYPE`).
+Signals, orders and leverage come from `vectorized_strategy`, which mirrors `live_strategy` exactly.
+Trade outcomes are resolved for all signals at once by scanning a fixed window of bars after each signal.
+The few trades whose order of events inside one bar matters can be replayed on finer candles (e.g. 1-minute) mapped
+from a `CandleStore`, see `simulate_trades`.
+"""
+import logging
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .constants import RISK_PER_POSITION_PERCENTAGE, WICK_PERCENTAGE_OF_BODY
+from .live_strategy import RISK_REWARD_RATIO, STOP_LOSS_TICKS
+from .ticks import values_to_steps
+from .vectorized_strategy import are_candles_in_target_hours, are_candles_doji, calculate_long_orders_data, \
+    calculate_short_orders_data, calculate_orders_leverage, verify_against_live_strategy
+
+BTCUSDT_TICK_SIZE = 0.1
+DEFAULT_INITIAL_BALANCE = 1000.0
+# 480 3-minute candles is one day. Orders that didn't trigger (or positions that didn't close) by then are dropped.
+DEFAULT_MAXIMUM_BARS_IN_TRADE = 480
+# `run_bot` sizes each leg with half of the wallet balance.
+WALLET_FRACTION_PER_ORDER = 0.5
+# Bounds the memory used by the (signals x window) comparison matrices.
+SIGNALS_PER_CHUNK = 4096
+# Candles looked at to find the interval of a candle array. Enough to step over a few gaps.
+INTERVAL_SAMPLE_CANDLES = 1000
+
+SIDE_NONE = 0
+SIDE_LONG = 1
+SIDE_SHORT = -1
+
+OUTCOME_NOT_TRIGGERED = 0
+OUTCOME_TAKE_PROFIT = 1
+OUTCOME_STOP_LOSS = 2
+OUTCOME_TIMEOUT = 3
+# Both legs triggered inside the same bar, so the bar alone can't tell which one filled first.
+OUTCOME_BOTH_TRIGGERED = 4
+
+TRADE_DTYPE = np.dtype([
+    ("signal_time", np.int64),
+    ("entry_time", np.int64),
+    ("exit_time", np.int64),
+    ("side", np.int8),
+    ("outcome", np.int8),
+    ("entry", np.float64),
+    ("stop_loss", np.float64),
+    ("take_profit", np.float64),
+    ("exit_price", np.float64),
+    ("leverage", np.float64),
+    # The larger stop-loss distance of the two legs, relative to its entry. It sets the leverage of both legs, so trades
+    # can be sized again for another risk (see `risk_of_ruin`).
+    ("relative_loss", np.float64),
+    ("return", np.float64),
+    # The outcome was replayed on finer candles instead of being assumed from the bars.
+    ("resolved", np.bool_),
+])
+
+
+def _first_true(matrix: np.ndarray) -> np.ndarray:
+    """
+    Column index of the first True value in every row, or the row length if there isn't one.
+    """
+    return np.where(matrix.any(axis=1), matrix.argmax(axis=1), matrix.shape[1])
+
+
+def _first_index(values: np.ndarray) -> int:
+    return int(values.argmax()) if values.any() else len(values)
+
+
+def _interval_milliseconds(candles: np.ndarray) -> int:
+    return int(np.diff(candles["start_time"][:INTERVAL_SAMPLE_CANDLES]).min())
+
+
+def _padded_windows(values: np.ndarray, window: int) -> np.ndarray:
+    # NaN padding compares as False, so windows that run past the data simply never trigger.
+    return sliding_window_view(np.concatenate([values, np.full(window, np.nan)]), window)
+
+
+def find_signal_indexes(candles: np.ndarray, wick_percentage_of_body: float = WICK_PERCENTAGE_OF_BODY,
+                        in_target_hours: np.ndarray = None, tick_size: float = BTCUSDT_TICK_SIZE) -> np.ndarray:
+    """
+    `in_target_hours` can be passed in when it was already computed for these candles.
+    Dojis are checked on prices in ticks, like the live code does, so wick/body ratios on the boundary agree.
+    """
+    if in_target_hours is None:
+        in_target_hours = are_candles_in_target_hours(candles["start_time"])
+    doji = are_candles_doji(
+        *(values_to_steps(candles[field], tick_size) for field in ["open", "high", "low", "close"]),
+        wick_percentage_of_body
+    )
+
+    return np.flatnonzero(in_target_hours & doji)
+
+
+def _resolve_with_fine_candles(trade: np.ndarray, fine_candles: np.ndarray, start_time: int, end_time: int,
+                               fine_milliseconds: int, long_order: dict, short_order: dict) -> None:
+    """
+    Replays one bracket on the fine candles in [start_time, end_time) and overwrites `trade` (a one-record view).
+    Inside a single fine candle the order of events is still unknown: two legs triggering in it count as both filled,
+    and a stop-loss is assumed to come before a take-profit (including in the candle of the entry).
+    """
+    start_times = fine_candles["start_time"]
+    fine = fine_candles[np.searchsorted(start_times, start_time):np.searchsorted(start_times, end_time)]
+
+    if len(fine) != (end_time - start_time) // fine_milliseconds:
+        logging.debug(f"Fine candles don't fully cover {start_time} to {end_time}, keeping the bar outcome.")
+        return
+
+    high = fine["high"]
+    low = fine["low"]
+    first_long = _first_index(high >= long_order["Entry"])
+    first_short = _first_index(low <= short_order["Entry"])
+    entry_index = min(first_long, first_short)
+
+    trade["resolved"] = True
+
+    if len(fine) == entry_index:
+        trade["side"] = SIDE_NONE
+        trade["outcome"] = OUTCOME_NOT_TRIGGERED
+        return
+
+    trade["entry_time"] = trade["exit_time"] = fine["start_time"][entry_index]
+
+    if first_long == first_short:
+        trade["side"] = SIDE_NONE
+        trade["outcome"] = OUTCOME_BOTH_TRIGGERED
+        return
+
+    # The bot cancels the other leg as soon as the first one fills.
+    is_long = first_long < first_short
+    order = long_order if is_long else short_order
+    side = SIDE_LONG if is_long else SIDE_SHORT
+
+    exit_high = high[entry_index:]
+    exit_low = low[entry_index:]
+    first_stop_loss = _first_index(exit_low <= order["StopLoss"] if is_long else exit_high >= order["StopLoss"])
+    first_take_profit = _first_index(exit_high >= order["TakeProfit"] if is_long else exit_low <= order["TakeProfit"])
+
+    if first_stop_loss < len(exit_high) and first_stop_loss <= first_take_profit:
+        outcome, exit_offset, exit_price = OUTCOME_STOP_LOSS, first_stop_loss, order["StopLoss"]
+    elif first_take_profit < len(exit_high):
+        outcome, exit_offset, exit_price = OUTCOME_TAKE_PROFIT, first_take_profit, order["TakeProfit"]
+    else:
+        outcome, exit_offset, exit_price = OUTCOME_TIMEOUT, len(exit_high) - 1, fine["close"][-1]
+
+    trade["side"] = side
+    trade["outcome"] = outcome
+    trade["entry"] = order["Entry"]
+    trade["stop_loss"] = order["StopLoss"]
+    trade["take_profit"] = order["TakeProfit"]
+    trade["exit_time"] = fine["start_time"][entry_index + exit_offset]
+    trade["exit_price"] = exit_price
+
+
+def simulate_trades(candles: np.ndarray, signal_indexes: np.ndarray, tick_size: float,
+                    risk_per_position: float = RISK_PER_POSITION_PERCENTAGE,
+                    maximum_bars_in_trade: int = DEFAULT_MAXIMUM_BARS_IN_TRADE,
+                    taker_fee_rate: float = 0.0, stop_loss_ticks: int = STOP_LOSS_TICKS,
+                    risk_reward_ratio: float = RISK_REWARD_RATIO, fine_candles: np.ndarray = None) -> np.ndarray:
+    """
+    `fine_candles` are optional candles of a shorter interval over the same period (usually a memory-mapped 1-minute
+    `CandleStore`). Trades the bars can't settle on their own are replayed on them, everything else never reads them.
+    Where they are missing or have gaps, the bars' worst-case assumptions are kept.
+    """
+    trades = np.zeros(len(signal_indexes), dtype=TRADE_DTYPE)
+
+    if fine_candles is not None and len(fine_candles):
+        candle_milliseconds = _interval_milliseconds(candles)
+        fine_milliseconds = _interval_milliseconds(fine_candles)
+
+    high_windows = _padded_windows(candles["high"], maximum_bars_in_trade)
+    low_windows = _padded_windows(candles["low"], maximum_bars_in_trade)
+    last_index = len(candles) - 1
+
+    for chunk_start in range(0, len(signal_indexes), SIGNALS_PER_CHUNK):
+        indexes = signal_indexes[chunk_start:chunk_start + SIGNALS_PER_CHUNK]
+        chunk = trades[chunk_start:chunk_start + SIGNALS_PER_CHUNK]
+
+        high = candles["high"][indexes]
+        low = candles["low"][indexes]
+        long_orders = calculate_long_orders_data(high, low, tick_size, stop_loss_ticks, risk_reward_ratio)
+        short_orders = calculate_short_orders_data(high, low, tick_size, stop_loss_ticks, risk_reward_ratio)
+
+        # Orders are placed once the signal candle closes, so they can only trigger from the next candle onward.
+        first_long = _first_true(high_windows[indexes + 1] >= long_orders["Entry"][:, None])
+        first_short = _first_true(low_windows[indexes + 1] <= short_orders["Entry"][:, None])
+
+        triggered = np.minimum(first_long, first_short) < maximum_bars_in_trade
+        both_triggered = triggered & (first_long == first_short)
+        is_long = first_long < first_short
+
+        side = np.where(is_long, SIDE_LONG, SIDE_SHORT)
+        side[~triggered | both_triggered] = SIDE_NONE
+        entry_index = np.minimum(indexes + 1 + np.minimum(first_long, first_short), last_index)
+
+        entry = np.where(is_long, long_orders["Entry"], short_orders["Entry"])
+        stop_loss = np.where(is_long, long_orders["StopLoss"], short_orders["StopLoss"])
+        take_profit = np.where(is_long, long_orders["TakeProfit"], short_orders["TakeProfit"])
+        relative_loss = np.maximum(
+            np.abs(long_orders["Entry"] - long_orders["StopLoss"]) / long_orders["Entry"],
+            np.abs(short_orders["Entry"] - short_orders["StopLoss"]) / short_orders["Entry"]
+        )
+        # Both legs share the lower of their two leverages, like `trade_symbol` does.
+        leverage = np.minimum(
+            calculate_orders_leverage(long_orders["Entry"], long_orders["StopLoss"], risk_per_position),
+            calculate_orders_leverage(short_orders["Entry"], short_orders["StopLoss"], risk_per_position)
+        )
+
+        # The stop-loss and take-profit can already be hit in the candle that triggered the entry.
+        exit_high = high_windows[entry_index]
+        exit_low = low_windows[entry_index]
+        first_stop_loss = _first_true(np.where(
+            is_long[:, None], exit_low <= stop_loss[:, None], exit_high >= stop_loss[:, None]
+        ))
+        first_take_profit = _first_true(np.where(
+            is_long[:, None], exit_high >= take_profit[:, None], exit_low <= take_profit[:, None]
+        ))
+
+        # When both are inside the same candle, assume the worst: the stop-loss came first.
+        hit_stop_loss = (first_stop_loss <= first_take_profit) & (first_stop_loss < maximum_bars_in_trade)
+        hit_take_profit = ~hit_stop_loss & (first_take_profit < maximum_bars_in_trade)
+
+        exit_offset = np.select(
+            [hit_stop_loss, hit_take_profit], [first_stop_loss, first_take_profit], maximum_bars_in_trade - 1
+        )
+        exit_index = np.minimum(entry_index + exit_offset, last_index)
+        exit_price = np.select(
+            [hit_stop_loss, hit_take_profit], [stop_loss, take_profit], candles["close"][exit_index]
+        )
+
+        outcome = np.select(
+            [~triggered, both_triggered, hit_stop_loss, hit_take_profit],
+            [OUTCOME_NOT_TRIGGERED, OUTCOME_BOTH_TRIGGERED, OUTCOME_STOP_LOSS, OUTCOME_TAKE_PROFIT],
+            OUTCOME_TIMEOUT
+        )
+
+        chunk["signal_time"] = candles["start_time"][indexes]
+        chunk["entry_time"] = candles["start_time"][entry_index]
+        chunk["exit_time"] = candles["start_time"][exit_index]
+        chunk["side"] = side
+        chunk["outcome"] = outcome
+        chunk["entry"] = entry
+        chunk["stop_loss"] = stop_loss
+        chunk["take_profit"] = take_profit
+        chunk["exit_price"] = exit_price
+        chunk["leverage"] = leverage
+        chunk["relative_loss"] = relative_loss
+
+        if fine_candles is not None and len(fine_candles):
+            # Only these depend on what happened inside a single bar: which leg triggered first, whether the exit
+            # came after the entry in the entry bar, and whether the stop-loss or the take-profit came first.
+            ambiguous = both_triggered | (
+                triggered & (hit_stop_loss | hit_take_profit) & (
+                    (0 == exit_offset) | (first_stop_loss == first_take_profit)
+                )
+            )
+            last_close_time = int(candles["start_time"][last_index]) + candle_milliseconds
+
+            for position in np.flatnonzero(ambiguous):
+                # Orders go in when the signal candle closes. Exits are searched for as long as in the bars.
+                start_time = int(candles["start_time"][indexes[position]]) + candle_milliseconds
+                end_time = min(int(chunk["entry_time"][position]) + maximum_bars_in_trade * candle_milliseconds,
+                               last_close_time)
+
+                _resolve_with_fine_candles(
+                    chunk[position:position + 1], fine_candles, start_time, end_time, fine_milliseconds,
+                    {name: values[position] for name, values in long_orders.items()},
+                    {name: values[position] for name, values in short_orders.items()}
+                )
+
+        # Return relative to the whole wallet. Fees are charged on the entry and exit notional.
+        position_fraction = WALLET_FRACTION_PER_ORDER * leverage
+        trade_return = position_fraction * (
+                chunk["side"] * (chunk["exit_price"] - chunk["entry"]) / chunk["entry"] -
+                taker_fee_rate * (1 + chunk["exit_price"] / chunk["entry"])
+        )
+        chunk["return"] = np.where(SIDE_NONE == chunk["side"], 0.0, trade_return)
+
+    return trades
+
+
+def calculate_equity_curve(candles: np.ndarray, trades: np.ndarray, initial_balance: float) -> np.ndarray:
+    """
+    Wallet balance after every candle. Each trade's return compounds on the balance at the time it closes.
+    """
+    closed_trades = np.sort(trades[SIDE_NONE != trades["side"]], order="exit_time")
+
+    balances = initial_balance * np.concatenate([[1.0], np.cumprod(1 + closed_trades["return"])])
+    closed_count = np.searchsorted(closed_trades["exit_time"], candles["start_time"], side="right")
+
+    return balances[closed_count]
+
+
+def run_backtest(candles: np.ndarray, tick_size: float = BTCUSDT_TICK_SIZE,
+                 initial_balance: float = DEFAULT_INITIAL_BALANCE,
+                 risk_per_position: float = RISK_PER_POSITION_PERCENTAGE,
+                 maximum_bars_in_trade: int = DEFAULT_MAXIMUM_BARS_IN_TRADE,
+                 taker_fee_rate: float = 0.0, verify: bool = True,
+                 wick_percentage_of_body: float = WICK_PERCENTAGE_OF_BODY, stop_loss_ticks: int = STOP_LOSS_TICKS,
+                 risk_reward_ratio: float = RISK_REWARD_RATIO, fine_candles: np.ndarray = None) -> dict:
+    """
+    `verify` compares against the live strategy, so it only makes sense with the live strategy's parameters.
+    `fine_candles` are passed on to `simulate_trades`.
+    """
+    if verify:
+        verify_against_live_strategy(candles, tick_size, risk_per_position)
+
+    signal_indexes = find_signal_indexes(candles, wick_percentage_of_body, tick_size=tick_size)
+
+    trades = simulate_trades(
+        candles, signal_indexes, tick_size, risk_per_position, maximum_bars_in_trade, taker_fee_rate,
+        stop_loss_ticks, risk_reward_ratio, fine_candles
+    )
+
+    equity_curve = calculate_equity_curve(candles, trades, initial_balance)
+
+    logging.info(f"Backtest over {len(candles)} candles found {len(signal_indexes)} doji signals.")
+
+    return {"trades": trades, "equity_curve": equity_curve}
+
+
+def summarize_backtest(result: dict) -> dict:
+    trades = result["trades"]
+    equity_curve = result["equity_curve"]
+
+    closed_trades = trades[SIDE_NONE != trades["side"]]
+    running_peak = np.maximum.accumulate(equity_curve)
+
+    return {
+        "signals": len(trades),
+        "trades": len(closed_trades),
+        "both_triggered": int(np.count_nonzero(OUTCOME_BOTH_TRIGGERED == trades["outcome"])),
+        "resolved": int(np.count_nonzero(trades["resolved"])),
+        "win_rate": float(np.mean(closed_trades["return"] > 0)) if len(closed_trades) else 0.0,
+        "total_return": float(equity_curve[-1] / equity_curve[0] - 1) if len(equity_curve) else 0.0,
+        "max_drawdown": float(np.max(1 - equity_curve / running_peak)) if len(equity_curve) else 0.0,
+    }
@@ -0,0 +1,142 @@
+"""
+Candles of several timeframes built from one feed of closed 1-minute candles, so no timeframe needs its own requests.
+Every update costs the same regardless of history: each timeframe only folds the new minute into its forming candle,
+and closed candles go into a fixed-size ring.
+"""
+import numpy as np
+
+from .candles import CANDLE_DTYPE
+from .live_strategy import is_candle_doji
+from .target_slots import get_target_slots
+from .ticks import value_to_steps
+
+RESAMPLED_INTERVALS = (3, 5, 15, 60)
+# Closed candles kept per timeframe.
+CANDLES_KEPT_PER_INTERVAL = 256
+MILLISECONDS_IN_MINUTE = 60 * 1000
+
+
+class CandleRing:
+    """
+    The newest `capacity` candles, oldest overwritten first.
+    """
+
+    def __init__(self, capacity: int = CANDLES_KEPT_PER_INTERVAL):
+        self._candles = np.zeros(capacity, dtype=CANDLE_DTYPE)
+        self._appended_count = 0
+
+    def __len__(self) -> int:
+        return min(self._appended_count, len(self._candles))
+
+    def append(self, candle: tuple) -> None:
+        self._candles[self._appended_count % len(self._candles)] = candle
+        self._appended_count += 1
+
+    def latest(self, count: int = None) -> np.ndarray:
+        """
+        A copy of the newest `count` candles (default: all of them), oldest first.
+        """
+        count = len(self) if count is None else min(count, len(self))
+
+        return self._candles[np.arange(self._appended_count - count, self._appended_count) % len(self._candles)]
+
+    def find(self, start_time: int) -> np.ndarray:
+        """
+        The candle starting at `start_time` as a one-candle array, or None. Searches from the newest candle, so asking
+        for a candle that just closed is a single comparison.
+        """
+        for age in range(len(self)):
+            index = (self._appended_count - 1 - age) % len(self._candles)
+            candle_start_time = self._candles["start_time"][index]
+
+            if candle_start_time == start_time:
+                return self._candles[index:index + 1].copy()
+            if candle_start_time < start_time:
+                return None
+
+        return None
+
+
+class CandleResampler:
+    """
+    Folds closed 1-minute candles, in order, into candles of every interval in `intervals` (in minutes). Buckets are
+    aligned to UTC epoch multiples of the interval, like Bybit's minute-based klines. A candle closes as soon as its
+    last minute arrives. Candles missing any minute (the feed started mid-candle, or a reconnect lost minutes) are
+    dropped instead of being reported with wrong prices.
+    """
+
+    def __init__(self, intervals: tuple = RESAMPLED_INTERVALS, capacity: int = CANDLES_KEPT_PER_INTERVAL):
+        self.intervals = tuple(intervals)
+        self._interval_milliseconds = [interval * MILLISECONDS_IN_MINUTE for interval in self.intervals]
+        # Per interval: [start time, open, high, low, close, volume, minutes folded in], or None between candles.
+        self._forming = [None] * len(self.intervals)
+        self._rings = {interval: CandleRing(capacity) for interval in self.intervals}
+        self._last_start_time = None
+
+    def update(self, candle: tuple) -> list:
+        """
+        Adds a closed 1-minute candle, given in `CANDLE_DTYPE` field order. Minutes that aren't newer than the last one
+        are ignored, so overlapping sources can feed the same resampler.
+        Returns (interval, candle) for every candle this minute closed.
+        """
+        start_time, open_price, high, low, close_price, volume = candle
+        if self._last_start_time is not None and start_time <= self._last_start_time:
+            return []
+        self._last_start_time = start_time
+
+        closed_candles = []
+
+        for index, interval_milliseconds in enumerate(self._interval_milliseconds):
+            bucket_start_time = start_time - start_time % interval_milliseconds
+            forming = self._forming[index]
+
+            # A minute of a later bucket arrived before the last minute of this one.
+            if forming is not None and forming[0] != bucket_start_time:
+                self._forming[index] = forming = None
+
+            if forming is None:
+                forming = self._forming[index] = [bucket_start_time, open_price, high, low, close_price, volume, 1]
+            else:
+                forming[2] = max(forming[2], high)
+                forming[3] = min(forming[3], low)
+                forming[4] = close_price
+                forming[5] += volume
+                forming[6] += 1
+
+            if start_time + MILLISECONDS_IN_MINUTE == bucket_start_time + interval_milliseconds:
+                self._forming[index] = None
+
+                if forming[6] * MILLISECONDS_IN_MINUTE == interval_milliseconds:
+                    closed_candle = tuple(forming[:len(CANDLE_DTYPE.names)])
+                    self._rings[self.intervals[index]].append(closed_candle)
+                    closed_candles.append((self.intervals[index], closed_candle))
+
+        return closed_candles
+
+    def closed_candles(self, interval: int, count: int = None) -> np.ndarray:
+        return self._rings[interval].latest(count)
+
+    def find_closed_candle(self, interval: int, start_time: int) -> np.ndarray:
+        return self._rings[interval].find(start_time)
+
+
+def evaluate_closed_candles(closed_candles: list, target_hours: list, tick_size: float) -> list:
+    """
+    Runs the target hour check and the doji check on (interval, candle) pairs as returned by `CandleResampler.update`.
+    Returns (interval, candle data in ticks, is doji) for every candle in a target hour.
+    """
+    target_slots = get_target_slots(tuple(target_hours))
+    evaluated_candles = []
+
+    for interval, candle in closed_candles:
+        if not target_slots.contains(int(candle[0])):
+            continue
+
+        candle_data = {"start_time": int(candle[0])}
+        candle_data.update({
+            field: value_to_steps(price, tick_size)
+            for field, price in zip(["open", "high", "low", "close"], candle[1:5])
+        })
+        evaluated_candles.append((interval, candle_data, is_candle_doji(candle_data)))
+
+    return evaluated_candles
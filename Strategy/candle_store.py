@@ -0,0 +1,102 @@
+"""
+On-disk candle history, one file per symbol and interval.
+The file is a flat sequence of `CANDLE_DTYPE` records sorted by start time, so readers map it with `np.memmap` and
+slice it by time range without copying or parsing anything.
+"""
+import logging
+import os
+
+import numpy as np
+
+from .candles import CANDLE_DTYPE
+
+CANDLE_STORE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "candles")
+CANDLE_FILE_EXTENSION = ".candles"
+
+
+class CandleStore:
+    def __init__(self, symbol: str, interval: int, directory: str = CANDLE_STORE_DIRECTORY):
+        self.symbol = symbol
+        self.interval = interval
+        self.path = os.path.join(directory, f"{symbol}_{interval}{CANDLE_FILE_EXTENSION}")
+
+        os.makedirs(directory, exist_ok=True)
+        self._discard_partial_record()
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.path) // CANDLE_DTYPE.itemsize if os.path.exists(self.path) else 0
+
+    def _discard_partial_record(self) -> None:
+        # A crash in the middle of an append can leave half a record at the end of the file.
+        if not os.path.exists(self.path):
+            return
+
+        size = os.path.getsize(self.path)
+        if size % CANDLE_DTYPE.itemsize:
+            logging.warning(f"Truncating partial candle record at the end of {self.path}")
+            os.truncate(self.path, size - size % CANDLE_DTYPE.itemsize)
+
+    def last_start_time(self) -> int:
+        """
+        Start time (UTC milliseconds) of the newest stored candle, or -1 if the store is empty.
+        """
+        count = len(self)
+        if not count:
+            return -1
+
+        with open(self.path, "rb") as candle_file:
+            candle_file.seek((count - 1) * CANDLE_DTYPE.itemsize)
+            return int(np.frombuffer(candle_file.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)["start_time"][0])
+
+    def append(self, candles: np.ndarray) -> int:
+        """
+        Appends closed candles that are newer than the newest stored one and returns how many were written.
+        Older or duplicate candles are skipped, so it's safe to append overlapping API responses.
+        """
+        candles = np.sort(candles.astype(CANDLE_DTYPE, copy=False), order="start_time")
+        new_candles = candles[candles["start_time"] > self.last_start_time()]
+
+        if not len(new_candles):
+            return 0
+
+        _, unique_indexes = np.unique(new_candles["start_time"], return_index=True)
+        new_candles = new_candles[unique_indexes]
+
+        with open(self.path, "ab") as candle_file:
+            candle_file.write(new_candles.tobytes())
+
+        return len(new_candles)
+
+    def require_candles(self) -> "CandleStore":
+        """
+        Returns the store itself, or raises if it's empty, for stores that were asked for explicitly.
+        """
+        if not len(self):
+            logging.error(
+                f"No candles in {self.path}. Download them with: python -m Bybit.download_candles --symbol "
+                f"{self.symbol} --interval {self.interval}"
+            )
+            raise RuntimeError(
+                f"No candles in {self.path}. Download them with: python -m Bybit.download_candles --symbol "
+                f"{self.symbol} --interval {self.interval}"
+            )
+
+        return self
+
+    def open(self) -> np.ndarray:
+        """
+        Read-only memory map of every stored candle. Candles appended later aren't visible to an existing map.
+        """
+        if not len(self):
+            return np.empty(0, dtype=CANDLE_DTYPE)
+
+        return np.memmap(self.path, dtype=CANDLE_DTYPE, mode="r", shape=(len(self),))
+
+    def read_range(self, start_time: int, end_time: int) -> np.ndarray:
+        """
+        Zero-copy view of the candles starting in [start_time, end_time), in UTC milliseconds.
+        """
+        candles = self.open()
+        start_times = candles["start_time"]
+
+        return candles[np.searchsorted(start_times, start_time):np.searchsorted(start_times, end_time)]
@@ -0,0 +1,26 @@
+import numpy as np
+
+# Fixed-width candle record. Start time is kept as UTC epoch milliseconds, exactly as Bybit returns it.
+CANDLE_DTYPE = np.dtype([
+    ("start_time", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+])
+
+
+def klines_to_candles(klines: list) -> np.ndarray:
+    """
+    Converts a Bybit `get_kline` result list (newest first, all fields as strings) into a candle array sorted from
+    oldest to newest.
+    """
+    candles = np.empty(len(klines), dtype=CANDLE_DTYPE)
+    # One string matrix, converted a column at a time.
+    fields = np.array([kline[:len(CANDLE_DTYPE.names)] for kline in reversed(klines)], dtype=str)
+
+    for column, name in enumerate(CANDLE_DTYPE.names):
+        candles[name] = fields[:, column] if len(klines) else []
+
+    return candles
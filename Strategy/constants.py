@@ -1,3 +1,4 @@
+TARGET_HOURS_TIMEZONE = "Asia/Jerusalem"
 TARGET_HOURS_ISRAEL = sorted(
     {"00:09:00", "00:45:00", "02:30:00", "02:45:00", "03:21:00", "03:30:00", "04:00:00", "04:45:00",
      "05:15:00", "06:00:00", "06:21:00", "06:30:00", "06:51:00", "08:30:00", "09:00:00", "09:30:00",
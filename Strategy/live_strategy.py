@@ -18,17 +18,10 @@ def unix_milliseconds_to_timestamp(unix_milliseconds: int, timezone_string: str)
     return utc_timestamp.astimezone(ZoneInfo(timezone_string))
 
 
-def is_candle_in_target_hours(candle_timestamp) -> bool:
+def is_candle_in_target_hours(candle_timestamp, target_hours: list = TARGET_HOURS_ISRAEL) -> bool:
     time_of_day = candle_timestamp.strftime("%H:%M:%S")
 
-    return time_of_day in TARGET_HOURS_ISRAEL
-
-
-def find_target_hour_candle(candles: list) -> dict:
-    for candle in candles:
-        if is_candle_in_target_hours(candle["start_time"]):
-            return candle
-    return {}
+    return time_of_day in target_hours
 
 
 def is_candle_doji(candle: dict) -> bool:
@@ -53,11 +46,11 @@ def is_candle_doji(candle: dict) -> bool:
     )
 
 
-def calculate_long_order_data(candle: dict, tick_size: float) -> dict:
-    # The result matches the Bybit API.
+def calculate_long_order_data(candle: dict, risk_reward_ratio: float = RISK_REWARD_RATIO) -> dict:
+    # Candle prices are in ticks (see `ticks`), so the result is in ticks too and matches the Bybit API exactly.
     entry = candle["high"]
-    stop_loss = candle["low"] - (tick_size * STOP_LOSS_TICKS)
-    take_profit = entry + RISK_REWARD_RATIO * (entry - stop_loss)
+    stop_loss = candle["low"] - STOP_LOSS_TICKS
+    take_profit = entry + round(risk_reward_ratio * (entry - stop_loss))
 
     assert entry != stop_loss, f"Bad candle, entry == stop_loss. Candle: {candle}"
     assert stop_loss != take_profit, f"Bad candle, stop_loss == take_profit. Candle: {candle}"
@@ -70,11 +63,11 @@ def calculate_long_order_data(candle: dict, tick_size: float) -> dict:
     }
 
 
-def calculate_short_order_data(candle: dict, tick_size: float) -> dict:
-    # The result matches the Bybit API.
+def calculate_short_order_data(candle: dict, risk_reward_ratio: float = RISK_REWARD_RATIO) -> dict:
+    # Candle prices are in ticks (see `ticks`), so the result is in ticks too and matches the Bybit API exactly.
     entry = candle["low"]
-    stop_loss = candle["high"] + (tick_size * STOP_LOSS_TICKS)
-    take_profit = entry - RISK_REWARD_RATIO * (stop_loss - entry)
+    stop_loss = candle["high"] + STOP_LOSS_TICKS
+    take_profit = entry - round(risk_reward_ratio * (stop_loss - entry))
 
     assert entry != stop_loss, f"Bad candle, entry == stop_loss. Candle: {candle}"
     assert stop_loss != take_profit, f"Bad candle, stop_loss == take_profit. Candle: {candle}"
@@ -92,6 +85,7 @@ def calculate_order_leverage(entry_price: float, stop_loss_price: float, maximum
     This function returns by how much you should multiply your trade in order for a stop-loss percentage move to
     be like `maximum_loss_percentage`. i.e., If the stop-loss is 5% away from the entry (calculated relative to
     the entry), and you want it to be 10%, then you'll get a leverage value of 2.
+    Only the ratio between the prices matters, so they can be given in ticks.
     """
     if entry_price == stop_loss_price:
         logging.error(f"Entry price and stop loss price cannot be the same. Value: {entry_price}")
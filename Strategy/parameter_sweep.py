@@ -0,0 +1,222 @@
+"""
+Backtests many combinations of the strategy's parameters over the same candles, on every core.
+The candles are copied once into shared memory and every worker maps them read-only, so nothing large is pickled.
+Combinations come from a full grid, uniform random samples, or a Bayesian (tree-structured Parzen estimator) search.
+
+Usage: python -m Strategy.parameter_sweep --symbol BTCUSDT --mode grid [--samples 200] [--top 20]
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from .backtest import BTCUSDT_TICK_SIZE, DEFAULT_INITIAL_BALANCE, DEFAULT_MAXIMUM_BARS_IN_TRADE, \
+    find_signal_indexes, simulate_trades, calculate_equity_curve, summarize_backtest
+from .candle_store import CANDLE_STORE_DIRECTORY, CandleStore
+from .candles import CANDLE_DTYPE
+from .vectorized_strategy import are_candles_in_target_hours
+
+# Values tried by the grid search. Random and Bayesian searches sample anywhere between the lowest and highest value.
+SWEEP_PARAMETERS = {
+    "wick_percentage_of_body": [0.05, 0.10, 0.15, 0.20, 0.30],
+    "risk_per_position": [0.04, 0.08, 0.12, 0.16],
+    "risk_reward_ratio": [1.5, 2.0, 2.5, 3.0, 4.0],
+    "stop_loss_ticks": [0, 1, 2, 3, 5],
+}
+INTEGER_PARAMETERS = {"stop_loss_ticks"}
+SWEEP_MODES = ["grid", "random", "bayesian"]
+RANKING_METRICS = ["total_return", "max_drawdown", "trades", "win_rate"]
+DEFAULT_SAMPLES = 200
+DEFAULT_TOP_RESULTS = 20
+# Bayesian search: share of the results that counts as "good", and how many candidates are scored per proposal.
+BAYESIAN_GOOD_FRACTION = 0.25
+BAYESIAN_CANDIDATES_PER_PROPOSAL = 256
+# Kernel width of the Parzen estimators, on parameters scaled to [0, 1].
+BAYESIAN_BANDWIDTH = 0.1
+
+# Set in every worker process by `_attach_candles`.
+_worker_shared_memory = None
+_worker_candles = None
+_worker_in_target_hours = None
+_worker_fine_candles = None
+_worker_settings = None
+
+
+def _attach_candles(shared_memory_name: str, candle_count: int, settings: dict,
+                    fine_candle_store: CandleStore = None) -> None:
+    global _worker_shared_memory, _worker_candles, _worker_in_target_hours, _worker_fine_candles, _worker_settings
+
+    _worker_shared_memory = SharedMemory(name=shared_memory_name)
+    _worker_candles = np.ndarray(candle_count, dtype=CANDLE_DTYPE, buffer=_worker_shared_memory.buf)
+    _worker_candles.flags.writeable = False
+    # Target hours don't depend on any swept parameter, so they're resolved once per worker.
+    _worker_in_target_hours = are_candles_in_target_hours(_worker_candles["start_time"])
+    # Every worker maps the fine candles file itself. The OS page cache shares it between them.
+    _worker_fine_candles = fine_candle_store.open() if fine_candle_store else None
+    _worker_settings = settings
+
+
+def _evaluate(parameters: dict) -> dict:
+    signal_indexes = find_signal_indexes(
+        _worker_candles, parameters["wick_percentage_of_body"], _worker_in_target_hours, _worker_settings["tick_size"]
+    )
+
+    trades = simulate_trades(
+        _worker_candles, signal_indexes, _worker_settings["tick_size"], parameters["risk_per_position"],
+        _worker_settings["maximum_bars_in_trade"], _worker_settings["taker_fee_rate"],
+        parameters["stop_loss_ticks"], parameters["risk_reward_ratio"], _worker_fine_candles
+    )
+    equity_curve = calculate_equity_curve(_worker_candles, trades, _worker_settings["initial_balance"])
+
+    return {**parameters, **summarize_backtest({"trades": trades, "equity_curve": equity_curve})}
+
+
+def grid_parameters(space: dict = SWEEP_PARAMETERS) -> list:
+    return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+
+def _to_unit_cube(parameters: list, space: dict) -> np.ndarray:
+    lows = np.array([min(values) for values in space.values()], dtype=np.float64)
+    highs = np.array([max(values) for values in space.values()], dtype=np.float64)
+    points = np.array([[combination[name] for name in space] for combination in parameters], dtype=np.float64)
+
+    return (points - lows) / np.where(highs > lows, highs - lows, 1)
+
+
+def _from_unit_cube(points: np.ndarray, space: dict) -> list:
+    parameters = []
+
+    for point in np.clip(points, 0, 1):
+        combination = {}
+        for value, (name, values) in zip(point, space.items()):
+            value = min(values) + value * (max(values) - min(values))
+            combination[name] = int(round(value)) if name in INTEGER_PARAMETERS else float(value)
+        parameters.append(combination)
+
+    return parameters
+
+
+def random_parameters(count: int, space: dict = SWEEP_PARAMETERS, rng: np.random.Generator = None) -> list:
+    rng = rng or np.random.default_rng()
+
+    return _from_unit_cube(rng.random((count, len(space))), space)
+
+
+def _parzen_log_density(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    squared_distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    densities = np.exp(-squared_distances / (2 * BAYESIAN_BANDWIDTH ** 2)).mean(axis=1)
+
+    return np.log(densities + np.finfo(np.float64).tiny)
+
+
+def propose_parameters(results: list, count: int, rank_by: str, space: dict = SWEEP_PARAMETERS,
+                       rng: np.random.Generator = None) -> list:
+    """
+    Tree-structured Parzen estimator step: candidates are drawn around the best results so far, and the ones most
+    likely under the "good" density relative to the "bad" density are proposed next.
+    """
+    rng = rng or np.random.default_rng()
+
+    ranked = sorted(results, key=lambda result: _ranking_key(result, rank_by))
+    good_count = max(1, int(len(ranked) * BAYESIAN_GOOD_FRACTION))
+    good_points = _to_unit_cube(ranked[:good_count], space)
+    bad_points = _to_unit_cube(ranked[good_count:] or ranked, space)
+
+    centers = good_points[rng.integers(len(good_points), size=BAYESIAN_CANDIDATES_PER_PROPOSAL)]
+    candidates = np.clip(centers + rng.normal(0, BAYESIAN_BANDWIDTH, centers.shape), 0, 1)
+
+    scores = _parzen_log_density(candidates, good_points) - _parzen_log_density(candidates, bad_points)
+
+    return _from_unit_cube(candidates[np.argsort(-scores)[:count]], space)
+
+
+def _ranking_key(result: dict, rank_by: str) -> float:
+    # Lower drawdown is better, everything else is better when higher.
+    return result[rank_by] if "max_drawdown" == rank_by else -result[rank_by]
+
+
+def run_parameter_sweep(candles: np.ndarray, mode: str = "grid", samples: int = DEFAULT_SAMPLES,
+                        rank_by: str = "total_return", tick_size: float = BTCUSDT_TICK_SIZE,
+                        initial_balance: float = DEFAULT_INITIAL_BALANCE,
+                        maximum_bars_in_trade: int = DEFAULT_MAXIMUM_BARS_IN_TRADE, taker_fee_rate: float = 0.0,
+                        workers: int = None, seed: int = None, fine_candle_store: CandleStore = None) -> pd.DataFrame:
+    """
+    Returns one row per evaluated combination, best first. `samples` is ignored by the grid search.
+    `fine_candle_store` holds shorter-interval candles for settling trades inside a candle (see `simulate_trades`).
+    """
+    if mode not in SWEEP_MODES:
+        logging.error(f"Unknown sweep mode: {mode}")
+        raise ValueError(f"Unknown sweep mode: {mode}")
+
+    workers = workers or os.cpu_count()
+    rng = np.random.default_rng(seed)
+    settings = {
+        "tick_size": tick_size, "initial_balance": initial_balance,
+        "maximum_bars_in_trade": maximum_bars_in_trade, "taker_fee_rate": taker_fee_rate,
+    }
+
+    shared_memory = SharedMemory(create=True, size=max(candles.nbytes, 1))
+    try:
+        np.ndarray(len(candles), dtype=CANDLE_DTYPE, buffer=shared_memory.buf)[:] = candles
+
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_attach_candles,
+                initargs=(shared_memory.name, len(candles), settings, fine_candle_store)
+        ) as executor:
+            if "grid" == mode:
+                results = list(executor.map(_evaluate, grid_parameters()))
+            elif "random" == mode:
+                results = list(executor.map(_evaluate, random_parameters(samples, rng=rng)))
+            else:
+                # A random start, then one batch of proposals per round, as wide as the pool.
+                results = list(executor.map(_evaluate, random_parameters(min(samples, max(workers, 8)), rng=rng)))
+                while len(results) < samples:
+                    proposals = propose_parameters(results, min(workers, samples - len(results)), rank_by, rng=rng)
+                    results += list(executor.map(_evaluate, proposals))
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    results.sort(key=lambda result: _ranking_key(result, rank_by))
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest combinations of the strategy's parameters.")
+    parser.add_argument("--symbol", default="BTCUSDT", help="Symbol whose stored candles are used")
+    parser.add_argument("--interval", type=int, default=3, help="Candle interval in minutes")
+    parser.add_argument("--directory", default=CANDLE_STORE_DIRECTORY, help="Candle store directory")
+    parser.add_argument("--fine-interval", type=int, default=None,
+                        help="Interval in minutes of stored finer candles used to settle trades inside a candle")
+    parser.add_argument("--mode", choices=SWEEP_MODES, default="grid")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="Combinations to try (random/bayesian)")
+    parser.add_argument("--rank-by", choices=RANKING_METRICS, default="total_return")
+    parser.add_argument("--tick-size", type=float, default=BTCUSDT_TICK_SIZE)
+    parser.add_argument("--taker-fee-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_RESULTS, help="Rows to print")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    candles = np.array(CandleStore(args.symbol, args.interval, args.directory).open())
+    fine_candle_store = None
+    if args.fine_interval:
+        fine_candle_store = CandleStore(args.symbol, args.fine_interval, args.directory).require_candles()
+    results = run_parameter_sweep(
+        candles, args.mode, args.samples, args.rank_by, args.tick_size, taker_fee_rate=args.taker_fee_rate,
+        workers=args.workers, seed=args.seed, fine_candle_store=fine_candle_store
+    )
+
+    print(results.head(args.top).to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
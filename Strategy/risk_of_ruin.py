@@ -0,0 +1,245 @@
+"""
+Monte Carlo risk of ruin of the doji bracket for several position sizings. Closed backtest trades are resampled with
+replacement into many equity paths at once, and every sizing setting is applied to the same resampled trades, so the
+settings differ only by their sizing. Each trade is sized again from its stop distance with the same leverage rounding
+as `simulate_trades`, so the historical outcomes don't have to be backtested once per setting. `verify_sized_returns`
+checks that the backtest's own sizing gives back its summary.
+
+Usage: python -m Strategy.risk_of_ruin --symbol BTCUSDT [--risk 0.04 0.08 0.12] [--paths 200000] [--block-length 5]
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .backtest import BTCUSDT_TICK_SIZE, DEFAULT_INITIAL_BALANCE, SIDE_NONE, WALLET_FRACTION_PER_ORDER, \
+    calculate_equity_curve, run_backtest, summarize_backtest
+from .candle_store import CANDLE_STORE_DIRECTORY, CandleStore
+from .constants import RISK_PER_POSITION_PERCENTAGE
+from .live_strategy import BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE
+from .vectorized_strategy import round_orders_leverage, VERIFICATION_ABSOLUTE_TOLERANCE
+
+DEFAULT_RISKS_PER_POSITION = [0.04, 0.08, RISK_PER_POSITION_PERCENTAGE, 0.16]
+DEFAULT_PATH_COUNT = 200000
+# A path has lost this share of the initial balance at some point, it's ruined.
+DEFAULT_RUIN_DRAWDOWN = 0.5
+# Consecutive historical trades drawn together, so losing streaks from the same market regime stay together.
+DEFAULT_BLOCK_LENGTH = 1
+# Bounds the memory used by the (paths x trades) matrices.
+ELEMENTS_PER_CHUNK = 1024 * 1024
+DRAWDOWN_QUANTILES = [0.5, 0.95, 0.99]
+
+
+def calculate_sized_returns(trades: np.ndarray, risk_per_position: float,
+                            maximum_leverage: float = BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE) -> np.ndarray:
+    """
+    Return of every closed trade relative to the whole wallet, had it been sized with `risk_per_position` and
+    `maximum_leverage`. With the backtest's own settings this gives back its `return` field.
+    """
+    closed_trades = trades[SIDE_NONE != trades["side"]]
+
+    # The outcome per unit of position (fees included) doesn't depend on the sizing.
+    unit_returns = closed_trades["return"] / (WALLET_FRACTION_PER_ORDER * closed_trades["leverage"])
+    leverage = np.minimum(round_orders_leverage(risk_per_position / closed_trades["relative_loss"]), maximum_leverage)
+
+    return WALLET_FRACTION_PER_ORDER * leverage * unit_returns
+
+
+def verify_sized_returns(candles: np.ndarray, backtest: dict, risk_per_position: float,
+                         maximum_leverage: float = BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE) -> None:
+    """
+    Sizes the trades of `backtest` again with the settings it ran with, and makes sure its summary comes back.
+    Raises on the first field that differs.
+    """
+    trades = backtest["trades"]
+    resized_trades = trades.copy()
+    resized_trades["return"][SIDE_NONE != trades["side"]] = calculate_sized_returns(
+        trades, risk_per_position, maximum_leverage
+    )
+
+    summary = summarize_backtest(backtest)
+    resized_summary = summarize_backtest({
+        "trades": resized_trades,
+        "equity_curve": calculate_equity_curve(candles, resized_trades, DEFAULT_INITIAL_BALANCE)
+    })
+
+    for field, value in summary.items():
+        if not np.isclose(value, resized_summary[field], rtol=0, atol=VERIFICATION_ABSOLUTE_TOLERANCE):
+            logging.error(f"Resized trades don't match the backtest ({field}: {resized_summary[field]} != {value}).")
+            raise RuntimeError(
+                f"Resized trades don't match the backtest ({field}: {resized_summary[field]} != {value})."
+            )
+
+
+def _sample_trade_indexes(random_generator: np.random.Generator, trade_count: int, path_count: int,
+                          trades_per_path: int, block_length: int) -> np.ndarray:
+    """
+    (paths x trades_per_path) indexes into the historical trades. Blocks wrap around the end of the history.
+    """
+    if 1 == block_length:
+        return random_generator.integers(0, trade_count, size=(path_count, trades_per_path), dtype=np.int64)
+
+    block_count = -(-trades_per_path // block_length)
+    block_starts = random_generator.integers(0, trade_count, size=(path_count, block_count, 1), dtype=np.int64)
+    indexes = (block_starts + np.arange(block_length)) % trade_count
+
+    return indexes.reshape(path_count, -1)[:, :trades_per_path]
+
+
+def _simulate_chunk(growth_factors: np.ndarray, paths: dict, chunk: slice, trades_per_path: int, block_length: int,
+                    ruin_drawdown: float, seed_sequence: np.random.SeedSequence) -> None:
+    # Drawn once and shared by every setting.
+    indexes = _sample_trade_indexes(
+        np.random.default_rng(seed_sequence), growth_factors.shape[1], chunk.stop - chunk.start, trades_per_path,
+        block_length
+    )
+
+    for setting, setting_growth_factors in enumerate(growth_factors):
+        equity = setting_growth_factors[indexes]
+        np.cumprod(equity, axis=1, out=equity)
+
+        # The initial balance is the first peak.
+        peaks = np.maximum.accumulate(equity, axis=1)
+        np.maximum(peaks, 1.0, out=peaks)
+        np.divide(equity, peaks, out=peaks)
+
+        paths["final_multiples"][setting, chunk] = equity[:, -1]
+        paths["max_drawdowns"][setting, chunk] = 1 - np.minimum(peaks.min(axis=1), 1.0)
+        paths["is_ruined"][setting, chunk] = equity.min(axis=1) <= 1 - ruin_drawdown
+
+
+def simulate_equity_paths(sized_returns: np.ndarray, path_count: int = DEFAULT_PATH_COUNT,
+                          trades_per_path: int = None, block_length: int = DEFAULT_BLOCK_LENGTH,
+                          ruin_drawdown: float = DEFAULT_RUIN_DRAWDOWN, seed: int = None, workers: int = None) -> dict:
+    """
+    `sized_returns` has one row of per-trade returns per sizing setting, all for the same trades (see
+    `calculate_sized_returns`). Paths are `trades_per_path` trades long (default: as many as there are trades).
+    Returns, per setting (rows) and path (columns), the final balance as a multiple of the initial one, the maximum
+    drawdown, and whether the path was ruined.
+    Chunks of paths run on `workers` threads (default: one per core). Every chunk has its own random stream derived
+    from `seed`, so the result doesn't depend on the number of workers.
+    """
+    setting_count, trade_count = sized_returns.shape
+    trades_per_path = trades_per_path or trade_count
+
+    # Losing more than the whole wallet isn't possible, the position is liquidated first.
+    growth_factors = np.maximum(1 + sized_returns, 0.0)
+
+    paths = {
+        "final_multiples": np.empty((setting_count, path_count)),
+        "max_drawdowns": np.empty((setting_count, path_count)),
+        "is_ruined": np.empty((setting_count, path_count), dtype=bool),
+    }
+
+    paths_per_chunk = max(1, ELEMENTS_PER_CHUNK // trades_per_path)
+    chunks = [
+        slice(chunk_start, min(chunk_start + paths_per_chunk, path_count))
+        for chunk_start in range(0, path_count, paths_per_chunk)
+    ]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    # NumPy releases the GIL inside these array operations, so threads use every core without copying anything.
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(
+                _simulate_chunk, growth_factors, paths, chunk, trades_per_path, block_length, ruin_drawdown,
+                seed_sequence
+            )
+            for chunk, seed_sequence in zip(chunks, seed_sequences)
+        ]
+        for future in futures:
+            future.result()
+
+    return paths
+
+
+def run_risk_of_ruin(trades: np.ndarray, risks_per_position: list = DEFAULT_RISKS_PER_POSITION,
+                     maximum_leverages: list = (BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE,),
+                     path_count: int = DEFAULT_PATH_COUNT, trades_per_path: int = None,
+                     block_length: int = DEFAULT_BLOCK_LENGTH, ruin_drawdown: float = DEFAULT_RUIN_DRAWDOWN,
+                     seed: int = None, workers: int = None) -> pd.DataFrame:
+    """
+    One row per combination of risk per position and maximum leverage, for the trades of a backtest.
+    """
+    if not np.count_nonzero(SIDE_NONE != trades["side"]):
+        logging.error("The backtest has no closed trades to resample.")
+        raise RuntimeError("The backtest has no closed trades to resample.")
+
+    settings = list(itertools.product(risks_per_position, maximum_leverages))
+    sized_returns = np.stack([
+        calculate_sized_returns(trades, risk_per_position, maximum_leverage)
+        for risk_per_position, maximum_leverage in settings
+    ])
+
+    paths = simulate_equity_paths(
+        sized_returns, path_count, trades_per_path, block_length, ruin_drawdown, seed, workers
+    )
+    drawdown_quantiles = np.quantile(paths["max_drawdowns"], DRAWDOWN_QUANTILES, axis=1)
+
+    results = []
+    for setting, (risk_per_position, maximum_leverage) in enumerate(settings):
+        result = {
+            "risk_per_position": risk_per_position,
+            "maximum_leverage": maximum_leverage,
+            "risk_of_ruin": float(np.mean(paths["is_ruined"][setting])),
+            "median_growth": float(np.median(paths["final_multiples"][setting]) - 1),
+            "loss_probability": float(np.mean(paths["final_multiples"][setting] < 1)),
+            "mean_max_drawdown": float(np.mean(paths["max_drawdowns"][setting])),
+        }
+        result.update({
+            f"max_drawdown_p{round(quantile * 100)}": float(drawdown_quantiles[index, setting])
+            for index, quantile in enumerate(DRAWDOWN_QUANTILES)
+        })
+        results.append(result)
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo risk of ruin of the strategy for several sizings.")
+    parser.add_argument("--symbol", default="BTCUSDT", help="Symbol whose stored candles are backtested")
+    parser.add_argument("--interval", type=int, default=3, help="Candle interval in minutes")
+    parser.add_argument("--directory", default=CANDLE_STORE_DIRECTORY, help="Candle store directory")
+    parser.add_argument("--fine-interval", type=int, default=None,
+                        help="Interval in minutes of stored finer candles used to settle trades inside a candle")
+    parser.add_argument("--risk", type=float, nargs="+", default=DEFAULT_RISKS_PER_POSITION,
+                        help="Risks per position to compare")
+    parser.add_argument("--maximum-leverage", type=float, nargs="+", default=[BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE],
+                        help="Leverage caps to compare")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATH_COUNT, help="Equity paths per setting")
+    parser.add_argument("--trades", type=int, default=None, help="Trades per path (default: as many as the backtest)")
+    parser.add_argument("--block-length", type=int, default=DEFAULT_BLOCK_LENGTH,
+                        help="Consecutive historical trades drawn together")
+    parser.add_argument("--ruin-drawdown", type=float, default=DEFAULT_RUIN_DRAWDOWN,
+                        help="Share of the initial balance whose loss counts as ruin")
+    parser.add_argument("--tick-size", type=float, default=BTCUSDT_TICK_SIZE)
+    parser.add_argument("--taker-fee-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Threads (default: one per core)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    candles = np.array(CandleStore(args.symbol, args.interval, args.directory).open())
+    fine_candles = None
+    if args.fine_interval:
+        fine_candles = CandleStore(args.symbol, args.fine_interval, args.directory).require_candles().open()
+    backtest = run_backtest(
+        candles, args.tick_size, taker_fee_rate=args.taker_fee_rate, verify=False, fine_candles=fine_candles
+    )
+    verify_sized_returns(candles, backtest, RISK_PER_POSITION_PERCENTAGE)
+
+    results = run_risk_of_ruin(
+        backtest["trades"], args.risk, args.maximum_leverage, args.paths, args.trades, args.block_length,
+        args.ruin_drawdown, args.seed, args.workers
+    )
+
+    print(results.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
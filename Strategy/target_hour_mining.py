@@ -0,0 +1,129 @@
+"""
+Ranks every time of day (in the target-hours timezone) by how the doji bracket historically did there, to regenerate
+`TARGET_HOURS_ISRAEL` from data. Every doji is backtested regardless of its time, then the results are grouped per
+slot with `np.bincount`, so years of candles take seconds.
+
+Usage: python -m Strategy.target_hour_mining --symbol BTCUSDT [--minimum-trades 30] [--top 38]
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .backtest import BTCUSDT_TICK_SIZE, DEFAULT_MAXIMUM_BARS_IN_TRADE, SIDE_NONE, OUTCOME_BOTH_TRIGGERED, \
+    OUTCOME_TAKE_PROFIT, simulate_trades
+from .candle_store import CANDLE_STORE_DIRECTORY, CandleStore
+from .constants import RISK_PER_POSITION_PERCENTAGE, TARGET_HOURS_ISRAEL, TARGET_HOURS_TIMEZONE
+from .ticks import values_to_steps
+from .target_slots import SECONDS_IN_DAY, local_seconds_of_day
+from .vectorized_strategy import are_candles_doji, seconds_of_day_to_string
+
+DEFAULT_CANDLE_MINUTES = 3
+# Slots with fewer closed trades than this are too noisy to be candidates.
+DEFAULT_MINIMUM_TRADES = 30
+DEFAULT_CANDIDATE_COUNT = len(TARGET_HOURS_ISRAEL)
+
+
+def mine_target_hours(candles: np.ndarray, candle_minutes: int = DEFAULT_CANDLE_MINUTES,
+                      tick_size: float = BTCUSDT_TICK_SIZE, risk_per_position: float = RISK_PER_POSITION_PERCENTAGE,
+                      maximum_bars_in_trade: int = DEFAULT_MAXIMUM_BARS_IN_TRADE, taker_fee_rate: float = 0.0,
+                      timezone_string: str = TARGET_HOURS_TIMEZONE, fine_candles: np.ndarray = None) -> pd.DataFrame:
+    """
+    One row per slot of the day, ranked by the t-statistic of the mean trade return (best first).
+    With `fine_candles`, trades the bars can't settle are replayed on them (see `backtest.simulate_trades`).
+    """
+    slot_seconds = candle_minutes * 60
+    slot_count = SECONDS_IN_DAY // slot_seconds
+
+    slots = local_seconds_of_day(candles["start_time"], timezone_string) // slot_seconds
+    doji = are_candles_doji(*(values_to_steps(candles[field], tick_size) for field in ["open", "high", "low", "close"]))
+    signal_indexes = np.flatnonzero(doji)
+
+    trades = simulate_trades(
+        candles, signal_indexes, tick_size, risk_per_position, maximum_bars_in_trade, taker_fee_rate,
+        fine_candles=fine_candles
+    )
+    trade_slots = slots[signal_indexes]
+    closed = SIDE_NONE != trades["side"]
+    returns = np.where(closed, trades["return"], 0.0)
+
+    candle_counts = np.bincount(slots, minlength=slot_count)
+    doji_counts = np.bincount(trade_slots, minlength=slot_count)
+    trade_counts = np.bincount(trade_slots, weights=closed, minlength=slot_count)
+    win_counts = np.bincount(trade_slots, weights=closed & (OUTCOME_TAKE_PROFIT == trades["outcome"]),
+                             minlength=slot_count)
+    both_triggered_counts = np.bincount(
+        trade_slots, weights=OUTCOME_BOTH_TRIGGERED == trades["outcome"], minlength=slot_count
+    )
+    return_sums = np.bincount(trade_slots, weights=returns, minlength=slot_count)
+    squared_return_sums = np.bincount(trade_slots, weights=returns ** 2, minlength=slot_count)
+    # A return of -100% or worse wipes the wallet. Clipping keeps the log finite.
+    log_returns = np.log(np.maximum(1 + returns, np.finfo(np.float64).tiny))
+    log_growth = np.bincount(trade_slots, weights=log_returns, minlength=slot_count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_returns = return_sums / trade_counts
+        return_deviations = np.sqrt(np.maximum(squared_return_sums / trade_counts - mean_returns ** 2, 0))
+        t_statistics = mean_returns / (return_deviations / np.sqrt(trade_counts))
+
+    slot_names = [seconds_of_day_to_string(slot * slot_seconds) for slot in range(slot_count)]
+
+    table = pd.DataFrame({
+        "time": slot_names,
+        "candles": candle_counts,
+        "dojis": doji_counts,
+        "doji_rate": np.divide(doji_counts, candle_counts, out=np.zeros(slot_count), where=candle_counts > 0),
+        "trades": trade_counts.astype(np.int64),
+        "both_triggered": both_triggered_counts.astype(np.int64),
+        "win_rate": np.nan_to_num(win_counts / np.maximum(trade_counts, 1)),
+        "mean_return": np.nan_to_num(mean_returns),
+        "t_statistic": np.nan_to_num(t_statistics, nan=0.0, posinf=0.0, neginf=0.0),
+        "log_growth": log_growth,
+        "is_current_target": np.isin(slot_names, TARGET_HOURS_ISRAEL),
+    })
+
+    return table.sort_values("t_statistic", ascending=False, ignore_index=True)
+
+
+def select_target_hours(table: pd.DataFrame, count: int = DEFAULT_CANDIDATE_COUNT,
+                        minimum_trades: int = DEFAULT_MINIMUM_TRADES) -> list:
+    """
+    The best `count` slots with enough trades and a positive mean return, sorted by time, ready for the constant.
+    """
+    candidates = table[(table["trades"] >= minimum_trades) & (table["mean_return"] > 0)]
+
+    return sorted(candidates["time"].head(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank times of day by the historical result of the doji bracket.")
+    parser.add_argument("--symbol", default="BTCUSDT", help="Symbol whose stored candles are used")
+    parser.add_argument("--interval", type=int, default=DEFAULT_CANDLE_MINUTES, help="Candle interval in minutes")
+    parser.add_argument("--directory", default=CANDLE_STORE_DIRECTORY, help="Candle store directory")
+    parser.add_argument("--fine-interval", type=int, default=None,
+                        help="Interval in minutes of stored finer candles used to settle trades inside a candle")
+    parser.add_argument("--tick-size", type=float, default=BTCUSDT_TICK_SIZE)
+    parser.add_argument("--taker-fee-rate", type=float, default=0.0)
+    parser.add_argument("--minimum-trades", type=int, default=DEFAULT_MINIMUM_TRADES)
+    parser.add_argument("--top", type=int, default=DEFAULT_CANDIDATE_COUNT, help="Number of target hours to select")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    candles = np.array(CandleStore(args.symbol, args.interval, args.directory).open())
+    # Only the few candles around ambiguous trades are ever read, so the fine candles stay memory-mapped.
+    fine_candles = None
+    if args.fine_interval:
+        fine_candles = CandleStore(args.symbol, args.fine_interval, args.directory).require_candles().open()
+    table = mine_target_hours(
+        candles, args.interval, args.tick_size, taker_fee_rate=args.taker_fee_rate, fine_candles=fine_candles
+    )
+
+    print(table.head(args.top * 2).to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    print()
+    print(f"TARGET_HOURS_ISRAEL = sorted({set(select_target_hours(table, args.top, args.minimum_trades))})")
+
+
+if __name__ == "__main__":
+    main()
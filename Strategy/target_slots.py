@@ -0,0 +1,94 @@
+"""
+Target hours resolved to UTC, so testing a candle is an integer lookup instead of a timezone conversion and strftime.
+Live scheduling, live trading and the research tools all go through `get_target_slots`, and so through the one UTC to
+wall-clock mapping in `local_seconds_of_day`.
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .constants import TARGET_HOURS_TIMEZONE
+
+MILLISECONDS_IN_MINUTE = 60 * 1000
+MINUTES_IN_DAY = 24 * 60
+MILLISECONDS_IN_DAY = MINUTES_IN_DAY * MILLISECONDS_IN_MINUTE
+SECONDS_IN_DAY = 24 * 60 * 60
+# Timezones only change their UTC offset on quarter-hour boundaries, so one lookup per bucket is exact.
+UTC_OFFSET_BUCKET_MILLISECONDS = 15 * 60 * 1000
+
+
+def local_seconds_of_day(start_times: np.ndarray, timezone_string: str = TARGET_HOURS_TIMEZONE) -> np.ndarray:
+    """
+    Returns the wall-clock time of day (in seconds) of every UTC millisecond timestamp, in the given timezone.
+    The UTC offset is resolved once per quarter-hour bucket instead of once per candle, which keeps DST exact.
+    """
+    zone = ZoneInfo(timezone_string)
+
+    buckets, inverse = np.unique(start_times // UTC_OFFSET_BUCKET_MILLISECONDS, return_inverse=True)
+
+    bucket_offsets = np.array([
+        datetime.fromtimestamp(
+            int(bucket) * UTC_OFFSET_BUCKET_MILLISECONDS / 1000, tz=timezone.utc
+        ).astimezone(zone).utcoffset().total_seconds()
+        for bucket in buckets
+    ], dtype=np.int64)
+
+    return (start_times // 1000 + bucket_offsets[inverse.reshape(-1)]) % SECONDS_IN_DAY
+
+
+class TargetSlots:
+    """
+    For every UTC date (counted in days since the epoch), the UTC minutes of the day at which a target candle starts.
+    Dates are resolved on first use, by taking the wall-clock time of every minute of the date. So wall-clock targets
+    that don't exist on a DST switch day are left out, and ones that happen twice are both included.
+    Candles start on whole minutes, so target hours are matched to the minute.
+    """
+
+    def __init__(self, target_hours: tuple, timezone_string: str = TARGET_HOURS_TIMEZONE):
+        target_times = [datetime.strptime(hour, "%H:%M:%S").time() for hour in target_hours]
+        self._target_minutes = np.array([target_time.hour * 60 + target_time.minute for target_time in target_times])
+        self._timezone_string = timezone_string
+        # Filling a missing day twice from two threads is harmless, both compute the same set.
+        self._minutes_by_day = {}
+
+    def minutes_of_day(self, day: int) -> frozenset:
+        minutes = self._minutes_by_day.get(day)
+        if minutes is None:
+            minutes = self._minutes_by_day[day] = self._resolve_day(day)
+
+        return minutes
+
+    def _resolve_day(self, day: int) -> frozenset:
+        minute_start_times = (day * MINUTES_IN_DAY + np.arange(MINUTES_IN_DAY, dtype=np.int64)) * MILLISECONDS_IN_MINUTE
+        local_minutes = local_seconds_of_day(minute_start_times, self._timezone_string) // 60
+
+        return frozenset(np.flatnonzero(np.isin(local_minutes, self._target_minutes)).tolist())
+
+    def start_times_of_day(self, day: int) -> list:
+        """
+        Sorted UTC start times (milliseconds) of the target candles on the UTC date.
+        """
+        return sorted(
+            day * MILLISECONDS_IN_DAY + minute * MILLISECONDS_IN_MINUTE for minute in self.minutes_of_day(day)
+        )
+
+    def contains(self, start_time: int) -> bool:
+        day, millisecond_of_day = divmod(start_time, MILLISECONDS_IN_DAY)
+
+        return millisecond_of_day // MILLISECONDS_IN_MINUTE in self.minutes_of_day(day)
+
+    def mask(self, start_times: np.ndarray) -> np.ndarray:
+        target_minutes = np.array([
+            day * MINUTES_IN_DAY + minute
+            for day in np.unique(start_times // MILLISECONDS_IN_DAY).tolist()
+            for minute in self.minutes_of_day(day)
+        ], dtype=np.int64)
+
+        return np.isin(start_times // MILLISECONDS_IN_MINUTE, target_minutes)
+
+
+@lru_cache(maxsize=None)
+def get_target_slots(target_hours: tuple, timezone_string: str = TARGET_HOURS_TIMEZONE) -> TargetSlots:
+    return TargetSlots(target_hours, timezone_string)
@@ -0,0 +1,36 @@
+"""
+Prices and quantities are kept as integer multiples of the instrument's tick size and quantity step, so comparing and
+offsetting them is exact. They only become floats for money math and strings at the API boundary.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def step_to_decimal(step) -> Decimal:
+    # `str` gives the shortest repr that round-trips, so 0.1 becomes exactly 0.1 and 1e-05 exactly 0.00001.
+    return Decimal(str(step))
+
+
+def value_to_steps(value, step) -> int:
+    """
+    Number of steps closest to `value`. Takes API strings as well as floats.
+    """
+    return int((Decimal(str(value)) / step_to_decimal(step)).to_integral_value(ROUND_HALF_EVEN))
+
+
+def steps_to_float(steps: int, step) -> float:
+    return float(steps * step_to_decimal(step))
+
+
+def format_steps(steps: int, step) -> str:
+    """
+    Exact decimal string of `steps` steps, never in scientific notation.
+    """
+    return format(steps * step_to_decimal(step), "f")
+
+
+def values_to_steps(values: np.ndarray, step: float) -> np.ndarray:
+    return np.rint(values / step).astype(np.int64)
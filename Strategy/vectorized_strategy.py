@@ -0,0 +1,180 @@
+"""
+Array versions of the functions in `live_strategy`, used to evaluate years of candles at once.
+Every function here must return the same values as its scalar counterpart. `verify_against_live_strategy` checks that.
+"""
+import logging
+
+import numpy as np
+
+from .constants import TARGET_HOURS_ISRAEL, TARGET_HOURS_TIMEZONE, WICK_PERCENTAGE_OF_BODY
+from .live_strategy import RISK_REWARD_RATIO, BYBIT_LEVERAGE_DECIMAL_LIMIT, BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE, \
+    STOP_LOSS_TICKS, unix_milliseconds_to_timestamp, is_candle_in_target_hours, is_candle_doji, \
+    calculate_long_order_data, calculate_short_order_data, calculate_order_leverage, calculate_order_quantity
+from .target_slots import get_target_slots
+from .ticks import steps_to_float, values_to_steps
+
+VERIFICATION_ABSOLUTE_TOLERANCE = 1e-9
+# The live ratio, and fractional ones like the parameter sweep uses, whose take-profits need rounding to whole ticks.
+VERIFICATION_RISK_REWARD_RATIOS = [RISK_REWARD_RATIO, 1.5, 2.5]
+ROUNDING_MIDPOINT_TOLERANCE = 1e-6
+
+
+def seconds_of_day_to_string(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def are_candles_in_target_hours(start_times: np.ndarray, target_hours: list = TARGET_HOURS_ISRAEL) -> np.ndarray:
+    return get_target_slots(tuple(target_hours)).mask(start_times)
+
+
+def are_candles_doji(open_prices: np.ndarray, high: np.ndarray, low: np.ndarray, close_prices: np.ndarray,
+                     wick_percentage_of_body: float = WICK_PERCENTAGE_OF_BODY) -> np.ndarray:
+    body = np.abs(open_prices - close_prices)
+    upper_wick = high - np.maximum(open_prices, close_prices)
+    lower_wick = np.minimum(open_prices, close_prices) - low
+
+    # Make sure the candle isn't flat.
+    is_flat = (0 == body) & (0 == upper_wick) & (0 == lower_wick)
+
+    return (
+            (upper_wick >= wick_percentage_of_body * body) &
+            (lower_wick >= wick_percentage_of_body * body) &
+            (upper_wick > 0) &
+            (lower_wick > 0) &
+            ~is_flat
+    )
+
+
+def calculate_long_orders_data(high: np.ndarray, low: np.ndarray, tick_size: float,
+                               stop_loss_ticks: int = STOP_LOSS_TICKS,
+                               risk_reward_ratio: float = RISK_REWARD_RATIO) -> dict:
+    entry = high
+    stop_loss = low - (tick_size * stop_loss_ticks)
+    # Whole ticks, rounded half to even like the builtin round() of the live code.
+    take_profit = entry + tick_size * np.rint(risk_reward_ratio * np.rint((entry - stop_loss) / tick_size))
+
+    return {"Entry": entry, "StopLoss": stop_loss, "TakeProfit": take_profit}
+
+
+def calculate_short_orders_data(high: np.ndarray, low: np.ndarray, tick_size: float,
+                                stop_loss_ticks: int = STOP_LOSS_TICKS,
+                                risk_reward_ratio: float = RISK_REWARD_RATIO) -> dict:
+    entry = low
+    stop_loss = high + (tick_size * stop_loss_ticks)
+    # Whole ticks, rounded half to even like the builtin round() of the live code.
+    take_profit = entry - tick_size * np.rint(risk_reward_ratio * np.rint((stop_loss - entry) / tick_size))
+
+    return {"Entry": entry, "StopLoss": stop_loss, "TakeProfit": take_profit}
+
+
+def calculate_orders_leverage(entry_prices: np.ndarray, stop_loss_prices: np.ndarray,
+                              maximum_loss_percentage: float) -> np.ndarray:
+    if np.any(entry_prices == stop_loss_prices):
+        logging.error("Entry price and stop loss price cannot be the same.")
+        raise ValueError("Entry price and stop loss price cannot be the same.")
+
+    # Price drop (in percentages) relative to the entry price.
+    relative_loss = np.abs(entry_prices - stop_loss_prices) / entry_prices
+
+    return np.minimum(round_orders_leverage(maximum_loss_percentage / relative_loss), BYBIT_MAXIMUM_LEVERAGE_PERCENTAGE)
+
+
+def round_orders_leverage(raw_leverage: np.ndarray) -> np.ndarray:
+    """
+    Rounds to the leverage decimals Bybit accepts, exactly like the builtin round() of the live code.
+    """
+    leverage = np.round(raw_leverage, BYBIT_LEVERAGE_DECIMAL_LIMIT)
+
+    # np.round scales by a power of ten first, so values sitting on a rounding midpoint can land on the other side
+    # compared to the builtin round(). Those few are rounded with the builtin to stay identical to the live code.
+    scaled_fraction = np.abs(raw_leverage * 10 ** BYBIT_LEVERAGE_DECIMAL_LIMIT % 1 - 0.5)
+    for index in np.flatnonzero(scaled_fraction < ROUNDING_MIDPOINT_TOLERANCE):
+        leverage[index] = round(float(raw_leverage[index]), BYBIT_LEVERAGE_DECIMAL_LIMIT)
+
+    return leverage
+
+
+def calculate_orders_quantity(entry_prices: np.ndarray, total_money_for_trade, leverage: np.ndarray) -> np.ndarray:
+    position_value = total_money_for_trade * leverage
+
+    return position_value / entry_prices
+
+
+def verify_against_live_strategy(candles: np.ndarray, tick_size: float, maximum_loss_percentage: float,
+                                 sample_size: int = 1000, seed: int = 0) -> None:
+    """
+    Runs the scalar live functions on a sample of candles (all signal candles first, then random ones) and makes sure
+    the array versions agree with them. Raises on the first mismatch.
+    Like the live code, both sides work on prices in ticks, where the order prices are exact integers.
+    """
+    open_ticks, high_ticks, low_ticks, close_ticks = (
+        values_to_steps(candles[field], tick_size) for field in ["open", "high", "low", "close"]
+    )
+
+    in_target_hours = are_candles_in_target_hours(candles["start_time"])
+    doji = are_candles_doji(open_ticks, high_ticks, low_ticks, close_ticks)
+
+    signal_indexes = np.flatnonzero(in_target_hours & doji)[:sample_size]
+    random_indexes = np.random.default_rng(seed).choice(len(candles), min(sample_size, len(candles)), replace=False)
+
+    orders_by_ratio = {
+        risk_reward_ratio: (
+            calculate_long_orders_data(high_ticks, low_ticks, 1, risk_reward_ratio=risk_reward_ratio),
+            calculate_short_orders_data(high_ticks, low_ticks, 1, risk_reward_ratio=risk_reward_ratio)
+        )
+        for risk_reward_ratio in VERIFICATION_RISK_REWARD_RATIOS
+    }
+    long_orders, short_orders = orders_by_ratio[RISK_REWARD_RATIO]
+
+    for index in np.concatenate([signal_indexes, random_indexes]):
+        candle = {
+            "start_time": unix_milliseconds_to_timestamp(int(candles["start_time"][index]), TARGET_HOURS_TIMEZONE),
+            "open": int(open_ticks[index]),
+            "high": int(high_ticks[index]),
+            "low": int(low_ticks[index]),
+            "close": int(close_ticks[index]),
+            "volume": float(candles["volume"][index])
+        }
+
+        if is_candle_in_target_hours(candle["start_time"]) != in_target_hours[index]:
+            _raise_mismatch("is_candle_in_target_hours", candle)
+
+        if is_candle_doji(candle) != doji[index]:
+            _raise_mismatch("is_candle_doji", candle)
+
+        if not doji[index]:
+            continue
+
+        for risk_reward_ratio, (ratio_long_orders, ratio_short_orders) in orders_by_ratio.items():
+            for scalar_order, vector_orders in [
+                (calculate_long_order_data(candle, risk_reward_ratio), ratio_long_orders),
+                (calculate_short_order_data(candle, risk_reward_ratio), ratio_short_orders)
+            ]:
+                for field in ["Entry", "StopLoss", "TakeProfit"]:
+                    if scalar_order[field] != vector_orders[field][index]:
+                        _raise_mismatch(f"calculate_*_order_data ({field}, risk/reward {risk_reward_ratio})", candle)
+
+        for scalar_order, vector_orders in [
+            (calculate_long_order_data(candle), long_orders),
+            (calculate_short_order_data(candle), short_orders)
+        ]:
+            scalar_leverage = calculate_order_leverage(
+                scalar_order["Entry"], scalar_order["StopLoss"], maximum_loss_percentage
+            )
+            vector_leverage = calculate_orders_leverage(
+                vector_orders["Entry"][index:index + 1], vector_orders["StopLoss"][index:index + 1],
+                maximum_loss_percentage
+            )[0]
+            if not np.isclose(scalar_leverage, vector_leverage, rtol=0, atol=VERIFICATION_ABSOLUTE_TOLERANCE):
+                _raise_mismatch("calculate_order_leverage", candle)
+
+            if not np.isclose(
+                    calculate_order_quantity(steps_to_float(scalar_order["Entry"], tick_size), 1.0, scalar_leverage),
+                    calculate_orders_quantity(vector_orders["Entry"][index] * tick_size, 1.0, vector_leverage)
+            ):
+                _raise_mismatch("calculate_order_quantity", candle)
+
+
+def _raise_mismatch(function_name: str, candle: dict) -> None:
+    logging.error(f"Vectorized {function_name} disagrees with the live strategy. Candle: {candle}")
+    raise RuntimeError(f"Vectorized {function_name} disagrees with the live strategy. Candle: {candle}")
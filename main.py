@@ -8,7 +8,9 @@ Whichever order enters first, cancel the other one.
 """
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 
 from Bybit.bot import start_bot
 
@@ -20,26 +22,37 @@ DAYS_TO_RUN = 2
 IS_BYBIT_TESTNET_MODE = True if os.environ.get("BYBIT_MODE", "testnet") == "testnet" else False
 IS_BYBIT_LOCAL_RUNNING = False if os.environ.get("BYBIT_MODE") else True
 
-def setup_logger():
+def setup_logger() -> QueueListener:
+    """
+    Trading threads only queue their records. The listener's thread writes them to `bot.log` and stdout.
+    Returns the started listener, which must be stopped to flush what's left.
+    """
     log_format = '%(asctime)s - %(levelname)s - %(message)s'
-    logging.basicConfig(
-        filename='bot.log',
-        filemode='a',
-        format=log_format,
-        # Setting to INFO and not DEBUG because the pybit package itself prints a lot of stuff in DEBUG mode.
-        level=logging.INFO
-    )
+    file_handler = logging.FileHandler('bot.log', mode='a')
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
 
-    console_handler.setFormatter(logging.Formatter(log_format))
+    for handler in [file_handler, console_handler]:
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(logging.Formatter(log_format))
 
-    logging.getLogger().addHandler(console_handler)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    # Setting to INFO and not DEBUG because the pybit package itself prints a lot of stuff in DEBUG mode.
+    root_logger.setLevel(logging.INFO)
+
+    return listener
 
 
 def main():
-    setup_logger()
-    start_bot(DAYS_TO_RUN, IS_BYBIT_TESTNET_MODE, IS_BYBIT_LOCAL_RUNNING)
+    listener = setup_logger()
+    try:
+        start_bot(DAYS_TO_RUN, IS_BYBIT_TESTNET_MODE, IS_BYBIT_LOCAL_RUNNING)
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+"""
+Minimal stand-in for Bybit's private WebSocket, served on localhost. It accepts any credentials, acknowledges
+subscriptions and pings like Bybit does, and lets a test push topic messages or drop the connections.
+"""
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+# pybit only records a subscription after sending it, so an instant acknowledgement can beat it.
+SUBSCRIBE_ACK_DELAY_SECONDS = 0.05
+
+
+class LocalWebSocketServer:
+    def __init__(self):
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self._listener.getsockname()[1]}/v5/private"
+
+        self._lock = threading.Lock()
+        # Responses and pushes come from different threads, and a frame must go out whole.
+        self._send_lock = threading.Lock()
+        self._connections = []
+        # Topics subscribed on every connection so far, in connection order.
+        self.subscriptions = []
+        self._is_accepting = True
+
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while self._is_accepting:
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                return
+
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: socket.socket) -> None:
+        reader = connection.makefile("rb")
+        try:
+            self._handshake(connection, reader)
+            with self._lock:
+                self._connections.append(connection)
+                self.subscriptions.append(set())
+                topics = self.subscriptions[-1]
+
+            while True:
+                opcode, payload = _read_frame(reader)
+                if OPCODE_CLOSE == opcode:
+                    self._send(connection, OPCODE_CLOSE, payload)
+                    return
+                if OPCODE_PING == opcode:
+                    self._send(connection, OPCODE_PONG, payload)
+                elif OPCODE_TEXT == opcode:
+                    self._handle_request(connection, json.loads(payload), topics)
+        except (OSError, ConnectionError, ValueError):
+            return
+        finally:
+            with self._lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            connection.close()
+
+    @staticmethod
+    def _handshake(connection: socket.socket, reader) -> None:
+        headers = {}
+        reader.readline()
+        for line in iter(reader.readline, b"\r\n"):
+            if not line:
+                raise ConnectionError("Client left during the handshake")
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()).digest())
+        connection.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+    def _handle_request(self, connection: socket.socket, request: dict, topics: set) -> None:
+        if "auth" == request.get("op"):
+            response = {"op": "auth", "success": True, "ret_msg": "", "conn_id": "local"}
+        elif "subscribe" == request.get("op"):
+            time.sleep(SUBSCRIBE_ACK_DELAY_SECONDS)
+            with self._lock:
+                topics.update(request["args"])
+            response = {"op": "subscribe", "success": True, "ret_msg": "", "req_id": request.get("req_id")}
+        elif "ping" == request.get("op"):
+            response = {"op": "pong", "success": True, "ret_msg": "pong"}
+        else:
+            return
+
+        self._send(connection, OPCODE_TEXT, json.dumps(response).encode())
+
+    def _send(self, connection: socket.socket, opcode: int, payload: bytes) -> None:
+        with self._send_lock:
+            _send_frame(connection, opcode, payload)
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def wait_for_subscriptions(self, connection_number: int, topics: set, timeout: float = 10) -> None:
+        """
+        Waits until the `connection_number`-th connection (1 is the first) subscribed to all of `topics`.
+        """
+        wait_until(
+            lambda: len(self.subscriptions) >= connection_number and
+            topics <= self.subscriptions[connection_number - 1],
+            timeout
+        )
+
+    def push(self, message: dict) -> None:
+        with self._lock:
+            connections = list(self._connections)
+
+        for connection in connections:
+            self._send(connection, OPCODE_TEXT, json.dumps(message).encode())
+
+    def drop_connections(self) -> None:
+        """
+        Cuts every connection without a close frame, like a network failure.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        """
+        Stops accepting connections and drops the open ones, so the client can't reconnect.
+        """
+        self._is_accepting = False
+        # Closing alone doesn't wake a blocked `accept`, which would still take one more connection.
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        self.drop_connections()
+
+
+def wait_until(condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition wasn't met in time")
+        time.sleep(0.01)
+
+
+def _read_frame(reader) -> tuple:
+    header = reader.read(2)
+    if len(header) < 2:
+        raise ConnectionError("Connection closed")
+
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if 126 == length:
+        length = struct.unpack("!H", reader.read(2))[0]
+    elif 127 == length:
+        length = struct.unpack("!Q", reader.read(8))[0]
+
+    # Client frames are always masked.
+    mask = reader.read(4) if header[1] & 0x80 else b"\0\0\0\0"
+    payload = reader.read(length)
+
+    return opcode, bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+
+def _send_frame(connection: socket.socket, opcode: int, payload: bytes) -> None:
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack("!Q", len(payload))
+
+    connection.sendall(header + payload)
@@ -0,0 +1,86 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Bybit.bot import download_candles_to_store, get_missing_candles_start_time, prepare_for_target, \
+    reconcile_order_journal
+from Bybit.clock import VirtualClock, get_clock, use_clock
+from Bybit.order_journal import OrderJournal
+from Bybit.order_reactor import OrderReactor
+from Bybit.rate_limited_session import RateLimitedSession
+from Simulator.exchange import SimulatedExchange
+from Strategy.candle_store import CandleStore
+
+from .test_order_reactor import SYMBOL, CANDLE_MILLISECONDS, create_exchange, place_pair
+from .test_vectorized_strategy import create_candles
+
+
+def test_reconcile_settles_resumes_and_reports_by_real_status(tmp_path, caplog):
+    exchange = create_exchange()
+    api = RateLimitedSession(exchange)
+    filled_pair = tuple(place_pair(api))
+    exchange.advance_to(3 * CANDLE_MILLISECONDS)
+    pending_pair = tuple(place_pair(api))
+    cancelled_pair = tuple(place_pair(api))
+    # Cancelled outside the bot while it was down.
+    api.cancel_order(category="linear", symbol=SYMBOL, orderId=cancelled_pair[0])
+
+    order_journal = OrderJournal(str(tmp_path / "orders.jsonl"))
+    for pair in [filled_pair, pending_pair, cancelled_pair]:
+        order_journal.record_pair(SYMBOL, *pair)
+
+    order_reactor = OrderReactor(api, "linear", "USDT", lambda *_: None)
+    try:
+        with caplog.at_level(logging.ERROR):
+            reconcile_order_journal(api, order_journal, order_reactor)
+
+        assert {pending_pair} == order_reactor.pending_pairs()
+        assert {pending_pair: SYMBOL} == order_journal.read_unsettled_pairs()
+        assert "Cancelled" in caplog.text
+        # The filled pair's other leg was cancelled, the cancelled pair's other leg was left alone.
+        open_orders = api.get_open_orders(category="linear", symbol=SYMBOL)["result"]["list"]
+        assert {*pending_pair, cancelled_pair[1]} == {order["orderId"] for order in open_orders}
+    finally:
+        order_journal.close()
+
+
+def test_downloads_fine_candles_from_the_seed_days(tmp_path):
+    candles = create_candles(30)
+    candles["start_time"] = candles["start_time"][0] + np.arange(30) * 60 * 1000
+    exchange = SimulatedExchange({SYMBOL: candles}, interval=1)
+    # Ten closed candles.
+    exchange.advance_to(int(candles["start_time"][10]))
+    clock = VirtualClock(candles["start_time"][10] / 1000)
+
+    previous_clock = get_clock()
+    use_clock(clock)
+    try:
+        candle_store = CandleStore(SYMBOL, 1, str(tmp_path))
+        download_candles_to_store(
+            RateLimitedSession(exchange), candle_store, get_missing_candles_start_time(candle_store, 1)
+        )
+    finally:
+        use_clock(previous_clock)
+
+    assert list(candles["start_time"][:10]) == list(candle_store.open()["start_time"])
+
+
+
+def test_prepare_leaves_the_leverage_of_an_open_position_alone(monkeypatch):
+    monkeypatch.setattr("Bybit.bot.get_forming_target_leverage", lambda *_: 5.0)
+    flat_exchange, positioned_exchange = create_exchange(), create_exchange()
+    accounts = [
+        {"Name": name, "Api": RateLimitedSession(exchange), "LeverageState": {}}
+        for name, exchange in [("Flat", flat_exchange), ("Positioned", positioned_exchange)]
+    ]
+    place_pair(accounts[1]["Api"])
+    # The long leg fills on the second candle.
+    for exchange in [flat_exchange, positioned_exchange]:
+        exchange.advance_to(3 * CANDLE_MILLISECONDS)
+
+    with ThreadPoolExecutor() as order_executor:
+        prepare_for_target(accounts[0]["Api"], 0, {SYMBOL: {}}, None, accounts, order_executor)
+
+    assert {SYMBOL: 5.0} == accounts[0]["LeverageState"]
+    assert {} == accounts[1]["LeverageState"]
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from Strategy.candle_resampler import CandleResampler, CandleRing
+from Strategy.candles import CANDLE_DTYPE
+
+from .test_vectorized_strategy import START_TIME, create_candles
+
+MILLISECONDS_IN_MINUTE = 60 * 1000
+INTERVALS = (3, 5, 15, 60)
+
+
+def create_minute_candles(count: int, start_time: int = START_TIME) -> np.ndarray:
+    candles = create_candles(count)
+    candles["start_time"] = start_time + np.arange(count) * MILLISECONDS_IN_MINUTE
+
+    return candles
+
+
+def feed(resampler: CandleResampler, minute_candles: np.ndarray) -> dict:
+    closed_by_interval = {interval: [] for interval in resampler.intervals}
+    for candle in minute_candles:
+        for interval, closed_candle in resampler.update(candle.tolist()):
+            closed_by_interval[interval].append(closed_candle)
+
+    return {interval: np.array(candles, dtype=CANDLE_DTYPE) for interval, candles in closed_by_interval.items()}
+
+
+def resample_with_pandas(minute_candles: np.ndarray, interval: int) -> np.ndarray:
+    frame = pd.DataFrame(minute_candles).set_index(pd.to_datetime(minute_candles["start_time"], unit="ms"))
+    resampled = frame.resample(f"{interval}min", origin="epoch").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum", "start_time": "count"
+    })
+    # Only buckets with every minute count as closed.
+    resampled = resampled[resampled["start_time"] == interval]
+
+    candles = np.zeros(len(resampled), dtype=CANDLE_DTYPE)
+    candles["start_time"] = resampled.index.as_unit("ms").asi8
+    for field in ["open", "high", "low", "close", "volume"]:
+        candles[field] = resampled[field]
+
+    return candles
+
+
+def assert_same_candles(expected: np.ndarray, actual: np.ndarray) -> None:
+    assert list(expected["start_time"]) == list(actual["start_time"])
+    for field in ["open", "high", "low", "close", "volume"]:
+        assert np.allclose(expected[field], actual[field])
+
+
+def test_matches_pandas_resampling():
+    minute_candles = create_minute_candles(3 * 24 * 60)
+
+    closed_by_interval = feed(CandleResampler(INTERVALS, capacity=len(minute_candles)), minute_candles)
+
+    for interval in INTERVALS:
+        assert_same_candles(resample_with_pandas(minute_candles, interval), closed_by_interval[interval])
+
+
+def test_drops_the_candle_a_stream_started_in():
+    # Starts 7 minutes into an hour, so the first 3, 5, 15 and 60-minute buckets are incomplete.
+    minute_candles = create_minute_candles(2 * 60, START_TIME + 7 * MILLISECONDS_IN_MINUTE)
+
+    closed_by_interval = feed(CandleResampler(INTERVALS), minute_candles)
+
+    assert START_TIME + 9 * MILLISECONDS_IN_MINUTE == closed_by_interval[3]["start_time"][0]
+    assert START_TIME + 10 * MILLISECONDS_IN_MINUTE == closed_by_interval[5]["start_time"][0]
+    assert START_TIME + 15 * MILLISECONDS_IN_MINUTE == closed_by_interval[15]["start_time"][0]
+    assert [START_TIME + 60 * MILLISECONDS_IN_MINUTE] == list(closed_by_interval[60]["start_time"])
+    for interval in INTERVALS:
+        assert_same_candles(resample_with_pandas(minute_candles, interval), closed_by_interval[interval])
+
+
+def test_drops_candles_with_missing_minutes():
+    minute_candles = create_minute_candles(60)
+    # A reconnect lost 4 minutes, from the 20th on.
+    minute_candles = np.concatenate([minute_candles[:20], minute_candles[24:]])
+
+    closed_by_interval = feed(CandleResampler(INTERVALS), minute_candles)
+
+    assert 60 // 3 - 2 == len(closed_by_interval[3])
+    assert START_TIME + 18 * MILLISECONDS_IN_MINUTE not in closed_by_interval[3]["start_time"]
+    assert START_TIME + 21 * MILLISECONDS_IN_MINUTE not in closed_by_interval[3]["start_time"]
+    assert START_TIME + 20 * MILLISECONDS_IN_MINUTE not in closed_by_interval[5]["start_time"]
+    assert START_TIME + 15 * MILLISECONDS_IN_MINUTE not in closed_by_interval[15]["start_time"]
+    assert 0 == len(closed_by_interval[60])
+    for interval in INTERVALS:
+        assert_same_candles(resample_with_pandas(minute_candles, interval), closed_by_interval[interval])
+
+
+def test_ignores_minutes_that_arent_newer():
+    minute_candles = create_minute_candles(6)
+    resampler = CandleResampler((3,))
+
+    feed(resampler, minute_candles[:4])
+    closed_by_interval = feed(resampler, minute_candles[2:])
+
+    assert [START_TIME + 3 * MILLISECONDS_IN_MINUTE] == list(closed_by_interval[3]["start_time"])
+    assert 2 == len(resampler.closed_candles(3))
+
+
+def test_ring_keeps_the_newest_candles():
+    ring = CandleRing(capacity=4)
+    candles = create_minute_candles(6)
+    for candle in candles:
+        ring.append(candle.tolist())
+
+    assert list(candles["start_time"][2:]) == list(ring.latest()["start_time"])
+    assert list(candles["start_time"][-2:]) == list(ring.latest(2)["start_time"])
+    assert candles["start_time"][3] == ring.find(int(candles["start_time"][3]))["start_time"][0]
+    assert ring.find(int(candles["start_time"][0])) is None
@@ -0,0 +1,17 @@
+import pytest
+
+from Strategy.candle_store import CandleStore
+
+from .test_vectorized_strategy import create_candles
+
+
+def test_require_candles_raises_on_an_empty_store(tmp_path):
+    with pytest.raises(RuntimeError, match="download_candles"):
+        CandleStore("SIMUSDT", 1, str(tmp_path)).require_candles()
+
+
+def test_require_candles_returns_a_filled_store(tmp_path):
+    candle_store = CandleStore("SIMUSDT", 3, str(tmp_path))
+    candle_store.append(create_candles(10))
+
+    assert candle_store is candle_store.require_candles()
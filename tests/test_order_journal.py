@@ -0,0 +1,19 @@
+import os
+
+from Bybit.order_journal import OrderJournal
+
+from .local_websocket_server import wait_until
+
+
+def test_syncs_candle_records_without_a_later_record(tmp_path, monkeypatch):
+    synced_fds = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced_fds.append(fd), real_fsync(fd)))
+
+    order_journal = OrderJournal(str(tmp_path / "orders.journal"))
+    try:
+        order_journal.record_candle("SIMUSDT", {"high": 2, "low": 1}, False)
+        wait_until(lambda: synced_fds, timeout=5)
+    finally:
+        order_journal.close()
+
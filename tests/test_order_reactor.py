@@ -0,0 +1,110 @@
+import logging
+import threading
+
+import numpy as np
+
+from Bybit.order_reactor import OrderReactor
+from Bybit.order_stream import OrderUpdateStream
+from Bybit.rate_limited_session import RateLimitedSession
+from Simulator.exchange import SimulatedExchange
+from Strategy.candles import CANDLE_DTYPE
+
+from .local_websocket_server import wait_until
+
+SYMBOL = "SIMUSDT"
+CANDLE_MILLISECONDS = 3 * 60 * 1000
+
+
+def create_exchange() -> SimulatedExchange:
+    candles = np.zeros(3, dtype=CANDLE_DTYPE)
+    candles["start_time"] = np.arange(3) * CANDLE_MILLISECONDS
+    candles["open"] = candles["high"] = candles["low"] = candles["close"] = 100.0
+    # The second candle crosses the long trigger only.
+    candles["high"][1] = 110.0
+
+    return SimulatedExchange({SYMBOL: candles})
+
+
+def place_pair(api: RateLimitedSession) -> list:
+    return [
+        api.place_order(
+            category="linear", symbol=SYMBOL, side=side, orderType="Market", qty="0.01", price=trigger_price,
+            triggerPrice=trigger_price, triggerDirection=trigger_direction
+        )["result"]["orderId"]
+        for side, trigger_price, trigger_direction in [("Buy", "105", 1), ("Sell", "90", 2)]
+    ]
+
+
+def start_reactor(api: RateLimitedSession, order_stream: OrderUpdateStream = None, drop_pair=None) -> tuple:
+    settled_pairs = []
+    settled_event = threading.Event()
+
+    def settle_pair(long_order_id, short_order_id, long_order_filled, short_order_filled, symbol):
+        settled_pairs.append((long_order_id, short_order_id, long_order_filled, short_order_filled, symbol))
+        settled_event.set()
+
+    order_reactor = OrderReactor(api, "linear", "USDT", settle_pair, order_stream, drop_pair)
+    order_reactor.start()
+
+    return order_reactor, settled_pairs, settled_event
+
+
+def test_settles_the_pair_of_a_filled_leg():
+    exchange = create_exchange()
+    api = RateLimitedSession(exchange)
+    long_order_id, short_order_id = place_pair(api)
+
+    order_reactor, settled_pairs, settled_event = start_reactor(api)
+    try:
+        order_reactor.add_pair(long_order_id, short_order_id, SYMBOL)
+        exchange.advance_to(3 * CANDLE_MILLISECONDS)
+
+        assert settled_event.wait(10)
+    finally:
+        order_reactor.stop()
+
+    assert [(long_order_id, short_order_id, True, False, SYMBOL)] == settled_pairs
+
+
+def test_records_the_fill_detection_lag_of_a_polled_fill(monkeypatch):
+    observed_latencies = []
+    monkeypatch.setattr("Bybit.order_reactor.observe_latency",
+                        lambda stage, seconds: observed_latencies.append((stage, seconds)))
+    exchange = create_exchange()
+    api = RateLimitedSession(exchange)
+    long_order_id, short_order_id = place_pair(api)
+
+    order_reactor, _, settled_event = start_reactor(api)
+    try:
+        order_reactor.add_pair(long_order_id, short_order_id, SYMBOL)
+        exchange.advance_to(3 * CANDLE_MILLISECONDS)
+
+        assert settled_event.wait(10)
+    finally:
+        order_reactor.stop()
+
+    assert ["fill_detection_lag"] == [stage for stage, _ in observed_latencies]
+
+
+def test_drops_a_pair_whose_leg_left_the_book_unfilled(caplog):
+    exchange = create_exchange()
+    api = RateLimitedSession(exchange)
+    long_order_id, short_order_id = place_pair(api)
+    # Cancelled outside the bot, by hand say.
+    api.cancel_order(category="linear", symbol=SYMBOL, orderId=long_order_id)
+
+    dropped_pairs = []
+    order_reactor, settled_pairs, _ = start_reactor(api, drop_pair=lambda *pair: dropped_pairs.append(pair))
+    try:
+        with caplog.at_level(logging.ERROR):
+            order_reactor.add_pair(long_order_id, short_order_id, SYMBOL)
+            wait_until(lambda: not order_reactor.pending_pairs())
+    finally:
+        order_reactor.stop()
+
+    assert [] == settled_pairs
+    assert [(long_order_id, short_order_id)] == dropped_pairs
+    assert "Cancelled" in caplog.text
+    # The other leg is left alone.
+    open_orders = api.get_open_orders(category="linear", symbol=SYMBOL)["result"]["list"]
+    assert [short_order_id] == [order["orderId"] for order in open_orders]
@@ -0,0 +1,115 @@
+import pybit.unified_trading
+import pytest
+
+from Bybit.order_stream import OrderUpdateStream, MAXIMUM_UNWATCHED_FILLS
+from Bybit.rate_limited_session import RateLimitedSession
+
+from .local_websocket_server import LocalWebSocketServer, wait_until
+from .test_order_reactor import SYMBOL, CANDLE_MILLISECONDS, create_exchange, place_pair, start_reactor
+
+TOPICS = {"order", "execution"}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = LocalWebSocketServer()
+    monkeypatch.setattr(pybit.unified_trading, "PRIVATE_WSS", server.url)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def order_stream(server):
+    order_stream = OrderUpdateStream.connect(True, "key", "secret")
+    server.wait_for_subscriptions(1, TOPICS)
+    yield order_stream
+    order_stream.close()
+
+
+def order_message(order_id: str, status: str) -> dict:
+    return {
+        "topic": "order", "id": order_id, "creationTime": 0,
+        "data": [{"orderId": order_id, "orderStatus": status, "updatedTime": "0"}],
+    }
+
+
+def watch(order_stream: OrderUpdateStream, order_ids: list) -> list:
+    reported = []
+    order_stream.watch(order_ids, reported.append)
+
+    return reported
+
+
+def test_reports_fills_of_watched_orders(server, order_stream):
+    reported = watch(order_stream, ["long", "short"])
+
+    server.push(order_message("long", "New"))
+    server.push(order_message("long", "PartiallyFilled"))
+    server.push(order_message("long", "Filled"))
+    wait_until(lambda: order_stream.is_filled("long"))
+
+    assert ["long"] == reported
+    assert not order_stream.is_filled("short")
+
+    order_stream.forget(["long", "short"])
+    assert not order_stream.is_filled("long")
+
+
+def push_and_wait(server: LocalWebSocketServer, order_stream: OrderUpdateStream, messages: list) -> None:
+    """
+    Messages of one connection arrive in order, so once a fill pushed after them is reported, they were all handled.
+    """
+    reported = watch(order_stream, ["marker"])
+    for message in messages + [order_message("marker", "Filled")]:
+        server.push(message)
+    wait_until(lambda: reported == ["marker"])
+
+
+def test_reports_fills_that_arrive_before_watching(server, order_stream):
+    push_and_wait(server, order_stream, [
+        order_message("early", "Filled"),
+        {"topic": "execution", "data": [{"orderId": "early-execution", "execTime": "0"}]},
+    ])
+
+    assert ["early", "early-execution"] == watch(order_stream, ["early", "early-execution"])
+
+
+def test_keeps_only_the_newest_unwatched_fills(server, order_stream):
+    order_ids = [f"other-{index}" for index in range(MAXIMUM_UNWATCHED_FILLS + 1)]
+    push_and_wait(server, order_stream, [order_message(order_id, "Filled") for order_id in order_ids])
+
+    # The oldest fill was pushed out by the newer ones. The reactor's REST reconcile still finds such fills.
+    assert [] == watch(order_stream, [order_ids[0]])
+    assert [order_ids[-1]] == watch(order_stream, [order_ids[-1]])
+
+
+def test_resubscribes_after_reconnecting(server, order_stream):
+    reported = watch(order_stream, ["long"])
+
+    server.drop_connections()
+    server.wait_for_subscriptions(2, TOPICS)
+    wait_until(order_stream.is_connected)
+
+    server.push(order_message("long", "Filled"))
+    wait_until(lambda: reported == ["long"])
+
+
+def test_reactor_polls_rest_once_the_stream_is_gone(server, order_stream):
+    exchange = create_exchange()
+    api = RateLimitedSession(exchange)
+    long_order_id, short_order_id = place_pair(api)
+
+    order_reactor, settled_pairs, settled_event = start_reactor(api, order_stream)
+    try:
+        order_reactor.add_pair(long_order_id, short_order_id, SYMBOL)
+        # Nothing is pushed about this fill, and the stream can't reconnect.
+        server.stop()
+        wait_until(lambda: not order_stream.is_connected())
+        exchange.advance_to(3 * CANDLE_MILLISECONDS)
+
+        assert settled_event.wait(10)
+    finally:
+        order_reactor.stop()
+
+    assert [(long_order_id, short_order_id, True, False, SYMBOL)] == settled_pairs
+    assert not order_reactor.pending_pairs()
@@ -0,0 +1,53 @@
+import numpy as np
+
+from Bybit.bot import CHART_INTERVAL, SYMBOL_TO_TRADE, SYMBOLS_TO_TRADE
+from Simulator.replay import run_replay
+from Strategy.candle_store import CandleStore
+
+from .test_vectorized_strategy import START_TIME, create_candles
+
+MILLISECONDS_IN_SECOND = 1000
+
+
+def test_replay_records_contiguous_candles(tmp_path):
+    candles = create_candles(3 * 480)
+    start_time = START_TIME / MILLISECONDS_IN_SECOND + 60 * 60
+
+    run_replay({SYMBOL_TO_TRADE: candles}, start_time, 2, candle_directory=str(tmp_path))
+
+    stored_candles = CandleStore(SYMBOL_TO_TRADE, CHART_INTERVAL, str(tmp_path)).open()
+    # Seeded from the first candle, and every candle since is stored, not only those of the targets.
+    assert START_TIME == stored_candles["start_time"][0]
+    assert np.all(CHART_INTERVAL * 60 * MILLISECONDS_IN_SECOND == np.diff(stored_candles["start_time"]))
+    assert len(stored_candles) > 2 * 480 - 10
+
+
+def test_a_failing_symbol_doesnt_stop_the_others(caplog):
+    candles = create_candles(3 * 480)
+    start_time = START_TIME / MILLISECONDS_IN_SECOND + 60 * 60
+    symbols_to_trade = {
+        SYMBOL_TO_TRADE: SYMBOLS_TO_TRADE[SYMBOL_TO_TRADE],
+        # The exchange doesn't list it, so every request about it fails.
+        "MISSINGUSDT": SYMBOLS_TO_TRADE[SYMBOL_TO_TRADE],
+    }
+
+    result = run_replay({SYMBOL_TO_TRADE: candles}, start_time, 2, symbols_to_trade=symbols_to_trade)
+    only_traded = run_replay({SYMBOL_TO_TRADE: candles}, start_time, 2)
+
+    assert "Failed to trade MISSINGUSDT" in caplog.text
+    assert only_traded["wallet_balance"] == result["wallet_balance"]
+
+
+def test_a_failing_account_doesnt_stop_the_others(caplog):
+    candles = create_candles(3 * 480)
+    start_time = START_TIME / MILLISECONDS_IN_SECOND + 60 * 60
+
+    # Too small a wallet for the minimum order quantity.
+    result = run_replay(
+        {SYMBOL_TO_TRADE: candles}, start_time, 2, sub_account_wallet_balances={"Small": 1.0, "Other": 10000.0}
+    )
+    only_traded = run_replay({SYMBOL_TO_TRADE: candles}, start_time, 2)
+
+    assert f"Failed to place {SYMBOL_TO_TRADE} orders on the Small account" in caplog.text
+    assert only_traded["wallet_balance"] == result["wallet_balance"]
+    assert only_traded["wallet_balance"] == result["sub_account_wallet_balances"]["Other"]
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from Strategy.backtest import SIDE_NONE, run_backtest
+from Strategy.risk_of_ruin import calculate_sized_returns, verify_sized_returns
+
+from .test_vectorized_strategy import TICK_SIZE, create_candles
+
+
+@pytest.mark.parametrize("risk_per_position", [0.04, 0.12])
+def test_backtest_sizing_gives_back_its_summary(risk_per_position):
+    candles = create_candles(30 * 480, seed=5)
+    backtest = run_backtest(candles, TICK_SIZE, risk_per_position=risk_per_position, verify=False)
+
+    verify_sized_returns(candles, backtest, risk_per_position)
+
+
+def test_sizing_with_another_risk_matches_a_backtest_with_it():
+    candles = create_candles(30 * 480, seed=5)
+    trades = run_backtest(candles, TICK_SIZE, verify=False)["trades"]
+    other_trades = run_backtest(candles, TICK_SIZE, risk_per_position=0.04, verify=False)["trades"]
+
+    closed = SIDE_NONE != trades["side"]
+    assert np.count_nonzero(closed)
+    assert np.allclose(other_trades["return"][closed], calculate_sized_returns(trades, 0.04))
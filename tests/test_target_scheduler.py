@@ -0,0 +1,70 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from Bybit.target_scheduler import TargetScheduler
+
+CANDLE_MINUTES = 3
+ISRAEL_TIMEZONE = "Asia/Jerusalem"
+
+
+def utc_milliseconds(*fields) -> int:
+    return int(datetime(*fields, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def upcoming_targets(scheduler: TargetScheduler, now_milliseconds: int, count: int) -> list:
+    targets = []
+    for _ in range(count):
+        target = scheduler.next_target(now_milliseconds)
+        targets.append(target)
+        now_milliseconds = scheduler.wake_up_time(target)
+
+    return targets
+
+
+def test_skips_a_target_inside_the_dst_gap():
+    # Israel skipped from 02:00 to 03:00 local time on 2024-03-29, so 02:30 didn't happen that day.
+    scheduler = TargetScheduler(["02:30:00", "03:30:00"], CANDLE_MINUTES, 0, ISRAEL_TIMEZONE)
+
+    assert [
+        # 2024-03-28 02:30 and 03:30 in winter time (UTC+2).
+        utc_milliseconds(2024, 3, 28, 0, 30), utc_milliseconds(2024, 3, 28, 1, 30),
+        # 2024-03-29 03:30 in summer time (UTC+3), then both on the next day.
+        utc_milliseconds(2024, 3, 29, 0, 30),
+        utc_milliseconds(2024, 3, 29, 23, 30), utc_milliseconds(2024, 3, 30, 0, 30),
+    ] == upcoming_targets(scheduler, utc_milliseconds(2024, 3, 28, 0, 0), 5)
+
+
+def test_schedules_a_repeated_fall_back_hour_twice():
+    # Israel went back from 02:00 to 01:00 local time on 2024-10-27, so 01:30 happened twice.
+    scheduler = TargetScheduler(["01:30:00"], CANDLE_MINUTES, 0, ISRAEL_TIMEZONE)
+
+    assert [
+        # In summer time (UTC+3), then again in winter time (UTC+2), then once the next day.
+        utc_milliseconds(2024, 10, 26, 22, 30), utc_milliseconds(2024, 10, 26, 23, 30),
+        utc_milliseconds(2024, 10, 27, 23, 30),
+    ] == upcoming_targets(scheduler, utc_milliseconds(2024, 10, 26, 12, 0), 3)
+
+
+@pytest.mark.parametrize("host_timezone", ["UTC", "America/New_York", "Australia/Lord_Howe"])
+def test_doesnt_depend_on_the_host_timezone(monkeypatch, host_timezone):
+    monkeypatch.setenv("TZ", host_timezone)
+    time.tzset()
+    try:
+        scheduler = TargetScheduler(["01:30:00", "09:00:00", "23:57:00"], CANDLE_MINUTES, 0, ISRAEL_TIMEZONE)
+        targets = upcoming_targets(scheduler, utc_milliseconds(2024, 10, 26, 12, 0), 8)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert [
+        # Summer time (UTC+3) up to the first 01:30, winter time (UTC+2) from the second one.
+        utc_milliseconds(2024, 10, 26, 20, 57), utc_milliseconds(2024, 10, 26, 22, 30),
+        utc_milliseconds(2024, 10, 26, 23, 30), utc_milliseconds(2024, 10, 27, 7, 0),
+        utc_milliseconds(2024, 10, 27, 21, 57), utc_milliseconds(2024, 10, 27, 23, 30),
+        utc_milliseconds(2024, 10, 28, 7, 0), utc_milliseconds(2024, 10, 28, 21, 57),
+    ] == targets
+    assert ["23:57:00", "01:30:00", "01:30:00", "09:00:00"] == [
+        scheduler.to_local_time(target).strftime("%H:%M:%S") for target in targets[:4]
+    ]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from Strategy.ticks import format_steps, steps_to_float, value_to_steps, values_to_steps
+
+
+def test_value_to_steps_ignores_float_artifacts():
+    # 0.1 + 0.2 is 0.30000000000000004, and 0.3 / 0.1 is 2.9999999999999996 in floats.
+    assert 3 == value_to_steps(0.1 + 0.2, 0.1)
+    assert 3 == value_to_steps(0.3, 0.1)
+    assert 600005 == value_to_steps(60000.5, 0.1)
+    assert 7 == value_to_steps(0.07, 0.01)
+
+
+def test_value_to_steps_takes_scientific_notation_steps():
+    # Python writes this step in scientific notation.
+    assert "1e-05" == str(1e-05)
+    assert 123456 == value_to_steps("1.23456", 1e-05)
+    assert 123456 == value_to_steps(1.23456, "0.00001")
+    assert 1 == value_to_steps("0.00001", 1e-05)
+
+
+def test_value_to_steps_rounds_half_to_even():
+    assert 2 == value_to_steps("0.25", 0.1)
+    assert 4 == value_to_steps("0.35", 0.1)
+
+
+def test_format_steps_is_exact_and_never_scientific():
+    assert "0.00001" == format_steps(1, 1e-05)
+    assert "1.23456" == format_steps(123456, 1e-05)
+    assert "0.3" == format_steps(3, 0.1)
+    assert "60000.5" == format_steps(600005, 0.1)
+    assert "0.001" == format_steps(1, "0.001")
+    assert "120" == format_steps(12, 10)
+
+
+def test_steps_to_float_round_trips():
+    assert 0.3 == steps_to_float(3, 0.1)
+    assert 1.23456 == steps_to_float(123456, 1e-05)
+
+
+def test_values_to_steps_matches_value_to_steps():
+    values = np.array([0.1 + 0.2, 60000.5, 59999.9, 0.30000000000000004])
+
+    assert [value_to_steps(value, 0.1) for value in values] == list(values_to_steps(values, 0.1))
+    assert [123456, 1] == list(values_to_steps(np.array([1.23456, 0.00001]), 1e-05))
@@ -0,0 +1,51 @@
+import numpy as np
+
+from Strategy.backtest import run_backtest
+from Strategy.candles import CANDLE_DTYPE
+from Strategy.constants import RISK_PER_POSITION_PERCENTAGE
+from Strategy.vectorized_strategy import (
+    calculate_long_orders_data, calculate_short_orders_data, verify_against_live_strategy
+)
+
+TICK_SIZE = 0.1
+CANDLE_MILLISECONDS = 3 * 60 * 1000
+# Monday 2024-01-01 00:00 UTC.
+START_TIME = 1704067200000
+
+
+def create_candles(count: int, seed: int = 1) -> np.ndarray:
+    """
+    Random walk on a 0.1 tick, with small bodies often enough to give doji candles.
+    """
+    rng = np.random.default_rng(seed)
+    close = np.round(60000 * np.exp(np.cumsum(rng.normal(0, 0.0015, count))), 1)
+    open_price = np.concatenate([[60000.0], close[:-1]])
+
+    candles = np.empty(count, dtype=CANDLE_DTYPE)
+    candles["start_time"] = START_TIME + np.arange(count) * CANDLE_MILLISECONDS
+    candles["open"] = open_price
+    candles["close"] = close
+    candles["high"] = np.round(np.maximum(open_price, close) + np.abs(rng.normal(0, 40, count)), 1)
+    candles["low"] = np.round(np.minimum(open_price, close) - np.abs(rng.normal(0, 40, count)), 1)
+    candles["volume"] = rng.random(count) * 100
+
+    return candles
+
+
+def test_take_profits_are_whole_ticks_for_fractional_ratios():
+    # A 3 tick risk at 1.5 is 4.5 ticks, which live rounds half to even.
+    high = np.array([100.0])
+    low = np.array([99.8])
+
+    long_orders = calculate_long_orders_data(high, low, TICK_SIZE, stop_loss_ticks=1, risk_reward_ratio=1.5)
+    short_orders = calculate_short_orders_data(high, low, TICK_SIZE, stop_loss_ticks=1, risk_reward_ratio=1.5)
+
+    assert np.isclose(100.4, long_orders["TakeProfit"][0])
+    assert np.isclose(99.4, short_orders["TakeProfit"][0])
+
+
+def test_agrees_with_the_live_strategy():
+    candles = create_candles(5 * 480)
+
+    verify_against_live_strategy(candles, TICK_SIZE, RISK_PER_POSITION_PERCENTAGE)
+    run_backtest(candles, TICK_SIZE, risk_reward_ratio=2.5)